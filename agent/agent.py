@@ -1,89 +1,120 @@
-import streamlit as st
-import sys, os
+import functools
+import os
 from langchain_openai import ChatOpenAI
-from langchain.agents import create_openai_tools_agent, AgentExecutor
+from langchain.agents import create_openai_tools_agent
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.tools import tool
-from langchain_experimental.tools.python.tool import PythonREPLTool
 from . import utils
+from .sandbox import SandboxPool
+from .executor import ParallelAgentExecutor
 
-GEMINI_API_KEY = os.environ["GEMINI_API_KEY"]
+try:
+    import streamlit as st
+except ImportError:  # headless use (agent/batch.py) does not need the UI
+    st = None
 
+GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
 
 
-python_repl = PythonREPLTool(python_path=sys.executable)
+
+# Sandboxed worker processes with the ledger preloaded (see agent/sandbox.py)
+python_repl = SandboxPool()
+
+
+def _report_errors(func):
+    """
+    Hand a ValueError (unknown entity, bad month, ...) back to the model as the
+    tool observation so it can retry, instead of ending the whole turn.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        except ValueError as e:
+            return f"Error: {e}. Fix the arguments and call the tool again."
+    return wrapper
 
 @tool
 def code_analysis(code: str) -> str:
-    """Takes python code, run it using 'PythonREPLTool' and gives back the output"""
+    """Takes python code, runs it in a sandboxed Python process where pandas as pd, numpy as np, matplotlib.pyplot as plt and the DataFrames actuals, budget, cash and fx are already loaded, and gives back the printed output"""
     return python_repl.run(code)
 
 @tool
-def get_revenue_variance(start_month: str, end_month: str) -> float:
+@_report_errors
+def get_revenue_variance(start_month: str, end_month: str, entity: str | None = None) -> float:
     """
     Calculate revenue variance (revenue vs budget) in USD over a date range.
 
     Parameters:
       start_month (str): Inclusive start period in "YYYY-MM" format.
       end_month   (str): Inclusive end period in "YYYY-MM" format.
+      entity      (str): Optional entity (subsidiary) name, e.g. "EMEA"; omit for all entities consolidated.
 
     Returns:
       float: Actual minus budget revenue in USD summed between start_month and end_month.
       float: Actual revenue in USD summed between start_month and end_month.
       float: Budget revenue in USD summed between start_month and end_month.
     """
-    return utils.revenue_variance(start_month, end_month)
+    return utils.revenue_variance(start_month, end_month, entity)
 
 @tool
-def get_gross_margin_pct(start_month: str, end_month: str) -> float:
+@_report_errors
+def get_gross_margin_pct(start_month: str, end_month: str, entity: str | None = None) -> float:
     """"
     Calculate month on month gross margin percentage over a date range..
 
     Parameters:
       start_month (str): Inclusive start period in "YYYY-MM" format.
       end_month   (str): Inclusive end period in "YYYY-MM" format.
+      entity      (str): Optional entity (subsidiary) name, e.g. "EMEA"; omit for all entities consolidated.
 
     Returns:
       dict: Gross margin % = (sum_revenue_usd – sum_cogs_usd) / sum_revenue_usd * 100 each month.
     """
-    return utils.gross_margin_pct(start_month, end_month)
+    return utils.gross_margin_pct(start_month, end_month, entity)
 
 @tool
-def get_opex_breakdown(start_month: str, end_month: str) -> dict:
+@_report_errors
+def get_opex_breakdown(start_month: str, end_month: str, entity: str | None = None) -> dict:
     """
         Break down operating expenses by category in USD over a date range.
 
         Parameters:
           start_month (str): Inclusive start period in "YYYY-MM" format.
           end_month   (str): Inclusive end period in "YYYY-MM" format.
+          entity      (str): Optional entity (subsidiary) name, e.g. "EMEA"; omit for all entities consolidated.
 
         Returns:
           dict: Mapping of Opex category names to total USD amounts for the period.
         """
-    return utils.opex_breakdown(start_month, end_month)
+    return utils.opex_breakdown(start_month, end_month, entity)
 
 @tool
-def get_ebitda_proxy(start_month: str, end_month: str) -> float:
+@_report_errors
+def get_ebitda_proxy(start_month: str, end_month: str, entity: str | None = None) -> float:
     """
     Calculate proxy EBITDA over a date range.
 
     Parameters:
       start_month (str): Inclusive start period in "YYYY-MM" format.
       end_month   (str): Inclusive end period in "YYYY-MM" format.
+      entity      (str): Optional entity (subsidiary) name, e.g. "EMEA"; omit for all entities consolidated.
 
     Returns:
       float: EBITDA proxy = sum_revenue_usd – sum_cogs_usd – sum_opex_usd for the period.
     """
-    return utils.ebitda_proxy(start_month, end_month)
+    return utils.ebitda_proxy(start_month, end_month, entity)
 
 @tool
-def get_cash_runway(as_of_month: str = None, last_n_months: int = 3) -> float:
+@_report_errors
+def get_cash_runway(as_of_month: str = None, last_n_months: int = 3, entity: str | None = None) -> float:
     """
     Calculate cash runway in months based on historical or current burn rate.
 
     Parameters:
       as_of_month (str): Reference month "YYYY-MM" to calculate runway from. If None, uses most recent month.
       last_n_months (int): Number of months prior to as_of_month to average net burn (default is 3).
+      entity (str): Optional entity name; needs a cash balance for that entity in the cash sheet. Omit for consolidated.
 
     Returns:
       float: Cash runway = cash_usd_at_date / average monthly net burn.
@@ -91,47 +122,140 @@ def get_cash_runway(as_of_month: str = None, last_n_months: int = 3) -> float:
      float: Average Burn
      float: Cash runway
     """
-    return utils.cash_runway(as_of_month, last_n_months)
+    return utils.cash_runway(as_of_month, last_n_months, entity)
+
+@tool
+@_report_errors
+def get_runway_scenarios(
+    revenue_growth: list[float] | None = None,
+    opex_change: list[float] | None = None,
+    fx_shock: list[float] | None = None,
+    samples: int = 0,
+    as_of_month: str = None,
+    last_n_months: int = 3,
+    entity: str | None = None,
+) -> dict:
+    """
+    Cash runway under many what-if scenarios in one call (sensitivity tables, runway distributions).
+
+    Parameters:
+      revenue_growth (list): Monthly revenue growth values in percent, e.g. [-2, 0, 2]. COGS moves with revenue.
+      opex_change (list): Changes of the monthly opex level in percent, e.g. [-10, 0].
+      fx_shock (list): Moves in the USD value of non-USD currencies in percent, e.g. [-10, 10].
+      samples (int): 0 to evaluate every combination of the listed values (a sensitivity table);
+                     N (up to 100000) to draw N random scenarios, each driver uniform between its min and max.
+      as_of_month (str): Starting month "YYYY-MM"; defaults to the latest cash balance.
+      last_n_months (int): Trailing months averaged for the baseline revenue, COGS and opex.
+      entity (str): Optional entity (subsidiary) name; omit for consolidated figures.
+
+    Returns:
+      dict: baseline (cash and monthly lines in USD, non-USD shares), number of scenarios,
+            runway percentiles (months; Infinity = beyond the 120-month horizon), share of scenarios
+            below 6/12/18/24 months, and for small grids a table with the runway of each scenario.
+    """
+    return utils.runway_scenarios(
+        revenue_growth or 0.0, opex_change or 0.0, fx_shock or 0.0, samples, as_of_month, last_n_months, entity,
+    )
 
 @tool
-def plot_chart(chart_type: str, x: list, y: list, title: str, x_label: str, y_label: str, output_path: str = "chart.png", legends: list[str] | None = None) -> str:
+@_report_errors
+def get_metrics_table(
+    start_month: str | None = None,
+    end_month: str | None = None,
+    granularity: str | None = None,
+    ranges: list[list[str]] | None = None,
+    metrics: list[str] | None = None,
+    entity: str | None = None,
+) -> list[dict]:
     """
-    Generate and save a chart with the specified data and formatting.
+    Compute several metrics for several periods in one call (e.g. Q1 vs Q2, monthly trend for a year).
+
+    Parameters:
+      start_month (str): Inclusive start period in "YYYY-MM" format (used with granularity).
+      end_month   (str): Inclusive end period in "YYYY-MM" format (used with granularity).
+      granularity (str): "month", "quarter" or "year" to split start_month..end_month; None for one row.
+      ranges (list): Explicit periods instead, as [["YYYY-MM", "YYYY-MM"], ...] (inclusive start, end).
+      metrics (list): Any of revenue, budget_revenue, revenue_variance, cogs, gross_margin_pct,
+                      opex, ebitda, cash_runway, avg_burn. Defaults to all of them.
+      entity (str): Optional entity (subsidiary) name; omit for all entities consolidated.
+
+    Returns:
+      list[dict]: One row per period with "period", "start_month", "end_month" and one USD value per metric.
+                  gross_margin_pct is over the whole period; cash_runway and avg_burn are as of the period's last month.
+    """
+    return utils.metrics_table(start_month, end_month, granularity, ranges, metrics, entity)
+
+@tool
+@_report_errors
+def get_variance_matrix(
+    start_month: str | None = None,
+    end_month: str | None = None,
+    granularity: str | None = None,
+    ranges: list[list[str]] | None = None,
+    categories: list[str] | None = None,
+    entity: str | None = None,
+) -> list[dict]:
+    """
+    Budget vs actual variance for every account category (Revenue, COGS, each Opex:* line) and entity, per period, in one call.
+
+    Parameters:
+      start_month (str): Inclusive start period in "YYYY-MM" format (used with granularity).
+      end_month   (str): Inclusive end period in "YYYY-MM" format (used with granularity).
+      granularity (str): "month", "quarter" or "year" to split start_month..end_month; None for one period.
+      ranges (list): Explicit periods instead, as [["YYYY-MM", "YYYY-MM"], ...] (inclusive start, end).
+      categories (list): Optional account categories to include; defaults to all of them.
+      entity (str): Optional entity (subsidiary) name; omit for every entity plus a "Consolidated" row.
+
+    Returns:
+      list[dict]: One row per period × entity × category with actual, budget, variance (actual - budget, USD),
+                  variance_pct (of budget, None without budget) and favorable (above budget for Revenue, below for costs).
+    """
+    return utils.variance_matrix(start_month, end_month, granularity, ranges, categories, entity)
+
+@tool
+def plot_chart(chart_type: str, x: list, y: list, title: str, x_label: str, y_label: str, legends: list[str] | None = None, interactive: bool = False):
+    """
+    Generate a chart with the specified data and formatting and display it to the user.
 
     Parameters:
         chart_type (str): "line", "bar", "scatter", or "pie"
-        x (list): X-axis data or categories
-        y (list): Y-axis numeric values
+        x (list): X-axis data or categories. For multi-series data use [[categories]]
+        y (list): Y-axis numeric values. For multi-series data use [[series1], [series2], ...]
         title (str): Chart title
         x_label (str): X-axis label
         y_label (str): Y-axis label
-        output_path (str): File path to save chart (default: "chart.png")
+        legends (list[str]): Optional legend labels, one per series
+        interactive (bool): Render an interactive (zoom / hover) chart instead of a static image
 
     Returns:
-        str: Path to the saved chart file
+        Confirmation that the chart is displayed, or an error message
     """
-    return utils.plot_chart(chart_type, x, y, title, x_label, y_label, output_path, legends)
+    return utils.plot_chart(chart_type, x, y, title, x_label, y_label, None, legends, interactive)
 
 
-@st.cache_resource
-def initialize_agent():
-    """
-    Initializes and returns the LangChain agent executor.
-    This function is now self-contained and handles all agent logic.
-    """
+def make_llm(temperature: float = 0.2) -> ChatOpenAI:
+    """Gemini chat model behind the OpenAI-compatible endpoint."""
+    if not GEMINI_API_KEY:
+        raise KeyError("GEMINI_API_KEY")
+    return ChatOpenAI(
+        api_key=GEMINI_API_KEY,
+        base_url="https://generativelanguage.googleapis.com/v1beta/openai/",
+        model="gemini-2.5-flash",
+        temperature=temperature,
+        # The app streams; without this, streamed turns carry no token usage for tracing
+        stream_usage=True,
+    )
 
-    try:
-        gemini_client = ChatOpenAI(
-            api_key=GEMINI_API_KEY,
-            base_url="https://generativelanguage.googleapis.com/v1beta/openai/",
-            model="gemini-2.5-flash",
-            temperature=0.2
-        )
-    except (KeyError, FileNotFoundError):
-        st.error("GOOGLE_API_KEY not found.")
-        st.stop()
 
-    # --- Tool Definitions ---
+def build_agent(llm=None, start_sandbox: bool = True) -> ParallelAgentExecutor:
+    """
+    Build the agent executor (prompt, tools, executor) without any UI.
+
+    `llm` defaults to `make_llm()`; `start_sandbox` spawns the code_analysis
+    workers up front. The Streamlit app goes through `initialize_agent`,
+    jobs and services (agent/batch.py) call this directly.
+    """
+    gemini_client = make_llm() if llm is None else llm
 
     # --- System Prompt ---
     ma_prompt = ChatPromptTemplate.from_messages([
@@ -148,6 +272,7 @@ def initialize_agent():
     - Always verify currencies. Default to USD; if EUR, convert using the fx sheet.
     - Months may appear as “YYYY-MM”, “June 2025”, “Jun’25”, etc. Treat them as equivalent.
     - account_category has values: Revenuem, COGS, Opex:Marketing, Opex:Sales, Opex:R&D, Opex:Admin
+    - Every metric tool takes an optional entity (e.g. ParentCo, EMEA); leave it empty for consolidated figures.
 
     Metric definitions:
     -Revenue (USD): actual vs budget.
@@ -165,18 +290,21 @@ def initialize_agent():
 
     ONLY and ONLY follow this rule for user inquiries that cannot be served by an existing tool (e.g., parameter mismatch or unsupported operation):
     - Never respond with a denial.
-    - Instead, write custom clean Python code to solve the problem and pass it to code_analysis which use 'PythonREPLTool', load data.xlsx directly. Do not use custom or dummy data.
+    - Instead, write custom clean Python code to solve the problem and pass it to code_analysis. The DataFrames actuals, budget, cash and fx (month as pandas Period) plus pd, np and plt are already loaded there; use them instead of reading data.xlsx, and print the results. Do not use custom or dummy data.
     - If your code errors, retry once with a corrected implementation.
     - If it still fails, deliver a concise, graceful explanation of the limitation and suggest a manual alternative.
 
     Instructions:
     1. If the user’s request matches a tool, call it. 
         - Sometime a request needs to call more than one tool, you can call multiple tools multiple times if needed.
+        - For comparisons or trends across several periods (Q1 vs Q2, month by month, year over year), call get_metrics_table once instead of repeating the single-period tools.
+        - For budget vs actual reviews of COGS, Opex lines or the full variance grid by category and entity, call get_variance_matrix once instead of writing code.
+        - For what-if, sensitivity or stress questions about runway (revenue growth, opex cuts, FX moves), call get_runway_scenarios once with lists of values instead of repeating get_cash_runway.
     2. Only call the 'code_analysis' tool as a last resort if no other tool is suitable.
     3. After a tool call:
        - Lead with the direct answer/figures.
        - Give a short interpretation (context, implications).
-       - If a chart is generated, confirm that the chart is now displayed (put the chart path also in the response).
+       - If a chart is generated, confirm that the chart is now displayed; plot_chart charts are shown automatically, so do not mention file paths for them.
     4. Keep answers concise, actionable, and financially relevant, remember you are answer directly to the CFO of the company.
     """),
         MessagesPlaceholder("chat_history", optional=True),
@@ -185,8 +313,31 @@ def initialize_agent():
     ])
 
     # --- Agent and Executor Creation ---
-    tools = [code_analysis, get_cash_runway, get_ebitda_proxy, get_opex_breakdown, get_revenue_variance, get_gross_margin_pct, plot_chart]
+    tools = [code_analysis, get_cash_runway, get_runway_scenarios, get_ebitda_proxy, get_opex_breakdown, get_revenue_variance, get_gross_margin_pct, get_metrics_table, get_variance_matrix, plot_chart]
     main_agent = create_openai_tools_agent(llm=gemini_client, tools=tools, prompt=ma_prompt)
-    agent_executor = AgentExecutor(agent=main_agent, tools=tools, verbose=True, return_intermediate_steps=True)
+    # Independent tool calls from one step run concurrently (FINAI_TOOL_WORKERS / FINAI_TOOL_TIMEOUT)
+    agent_executor = ParallelAgentExecutor(agent=main_agent, tools=tools, verbose=True, return_intermediate_steps=True)
+
+    # Spawn the code_analysis workers now so the first fallback query does not pay for it
+    if start_sandbox:
+        python_repl.start()
 
     return agent_executor
+
+
+# One executor per process: st.cache_resource in the app, a plain memo elsewhere
+_cache_resource = st.cache_resource if st is not None else functools.lru_cache(maxsize=None)
+
+
+@_cache_resource
+def initialize_agent():
+    """
+    Initializes and returns the LangChain agent executor, once per process.
+    """
+    try:
+        return build_agent()
+    except (KeyError, FileNotFoundError):
+        if st is None:
+            raise
+        st.error("GEMINI_API_KEY not found.")
+        st.stop()
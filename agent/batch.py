@@ -0,0 +1,297 @@
+"""
+Headless batch / API mode: answer a file of questions without Streamlit.
+
+    python -m agent.batch questions.txt --output answers.jsonl --workers 8
+    python -m agent.batch questions.jsonl --charts-dir packs/2025-06/charts
+    python -m agent.batch --serve --port 8080
+
+Questions are a text file (one per line, `#` comments), a JSON list or JSON
+lines; JSON entries are strings or objects with `question` and optional `id`
+and `tenant`. Every answer is one JSON line: id, question, tenant, route
+(cache / fast_path / agent), answer, charts, timings and the trace id.
+
+With --serve, a small HTTP API takes the same records:
+
+    POST /ask     {"question": ..., "tenant": ...}      -> one answer
+    POST /batch   {"questions": [...]}                  -> {"answers": [...]}
+    GET  /health
+"""
+import argparse
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from . import charts, data, router, sandbox, tracing
+from .agent import build_agent, make_llm
+from .streaming import astream_cached, astream_turn, run_coroutine
+
+# Questions answered at once; each runs its own agent loop and event loop
+BATCH_WORKERS = int(os.environ.get("FINAI_BATCH_WORKERS", "8"))
+
+
+def load_questions(path: Path | str) -> list[dict]:
+    """Questions from a .txt, .json or .jsonl file as dicts of id, question and tenant."""
+    path = Path(path)
+    text = path.read_text(encoding="utf-8")
+    if path.suffix == ".jsonl":
+        entries = [json.loads(line) for line in text.splitlines() if line.strip()]
+    elif path.suffix == ".json":
+        entries = json.loads(text)
+    else:
+        entries = [line.strip() for line in text.splitlines() if line.strip() and not line.lstrip().startswith("#")]
+    return normalize(entries)
+
+
+def normalize(entries) -> list[dict]:
+    """Question strings or dicts -> dicts with an id (q001, q002, ... by default), question and tenant."""
+    questions = []
+    for n, entry in enumerate(entries, 1):
+        if isinstance(entry, str):
+            entry = {"question": entry}
+        if not isinstance(entry, dict) or not str(entry.get("question") or "").strip():
+            raise ValueError(f"Entry {n} has no question: {entry!r}")
+        questions.append({
+            "id": str(entry.get("id") or f"q{n:03d}"),
+            "question": str(entry["question"]).strip(),
+            "tenant": entry.get("tenant"),
+        })
+    return questions
+
+
+class BatchRunner:
+    """
+    Answers questions with one shared agent executor, answer model and data
+    store, at most `workers` at a time.
+
+    Each question runs in its own copy of the context with its tenant set
+    and its dataset pinned (see `data.pin`), so concurrent answers never
+    mix companies or dataset versions. Routing is the app's: answer cache,
+    then fast path, then the agent loop; every answer gets a trace.
+    """
+
+    def __init__(self, agent_executor, answer_llm, workers: int = BATCH_WORKERS, charts_dir: Path | str | None = None):
+        self.agent_executor = agent_executor
+        self.answer_llm = answer_llm
+        self.workers = max(1, workers)
+        self.charts_dir = Path(charts_dir) if charts_dir else None
+        self.run_id = uuid.uuid4().hex[:8]
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="finai-batch")
+
+    def submit(self, question: dict):
+        context = contextvars.copy_context()
+        return self._pool.submit(context.run, self.answer, question)
+
+    def ask(self, question: str, tenant: str | None = None, id: str | None = None) -> dict:
+        """Answer one question on the pool and wait for it."""
+        return self.submit(normalize([{"question": question, "tenant": tenant, "id": id}])[0]).result()
+
+    def run(self, questions: list[dict], output=None) -> list[dict]:
+        """
+        Answer `questions` concurrently. Answers are written to `output`
+        (a text file) as JSON lines as they finish; the returned list is in
+        question order.
+        """
+        # Load each company's data once, up front, instead of in the first few workers at once
+        for name in {q["tenant"] or data.tenant.get() for q in questions}:
+            try:
+                data.registry.get(name)
+            except KeyError:
+                pass   # reported on each of its questions
+        futures = {self.submit(q): i for i, q in enumerate(questions)}
+        records = [None] * len(questions)
+        for future in as_completed(futures):
+            record = future.result()
+            records[futures[future]] = record
+            if output is not None:
+                output.write(json.dumps(record, default=str, ensure_ascii=False) + "\n")
+                output.flush()
+        return records
+
+    def answer(self, question: dict) -> dict:
+        """Answer one normalized question in the current context; errors are reported in the record."""
+        if question["tenant"]:
+            data.tenant.set(question["tenant"])
+        tenant = data.tenant.get()
+        sandbox.session_id.set(f"batch-{self.run_id}-{question['id']}")
+        prompt = question["question"]
+        record = {"id": question["id"], "question": prompt, "tenant": tenant, "route": None, "answer": None,
+                  "charts": [], "timings": {}, "dataset_version": None, "trace_id": None, "error": None}
+
+        trace = tracing.start_trace(prompt, tenant=tenant, session=sandbox.session_id.get(), batch=self.run_id)
+        record["trace_id"] = trace.id
+        try:
+            with data.pin() as dataset:
+                record["dataset_version"] = dataset.version
+                route, response, result = self._turn(prompt, [tracing.TracingCallbackHandler(trace)])
+            record.update(route=route, answer=response["output"],
+                          charts=self._charts(charts.collect_charts(response.get("intermediate_steps", []))))
+            record["timings"] = {"ttft": result["ttft"], "elapsed": result["elapsed"]}
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+        finally:
+            finished = tracing.finish_trace(trace, route=record["route"], error=record["error"],
+                                            answer_chars=len(record["answer"] or ""))
+            record["timings"]["total"] = finished["elapsed"]
+        return record
+
+    def _turn(self, prompt: str, callbacks: list) -> tuple[str, dict, dict]:
+        cached = router.response_cache.lookup(prompt)
+        fast_path = router.resolve(prompt) if cached is None else None
+        if cached is not None:
+            route, events = "cache", astream_cached(cached)
+        elif fast_path is not None:
+            route, events = "fast_path", router.astream_answer(*fast_path, prompt, self.answer_llm, callbacks)
+        else:
+            # Questions in a pack are independent: no chat history
+            route, events = "agent", astream_turn(self.agent_executor, {"input": prompt, "chat_history": []},
+                                                  {"callbacks": callbacks})
+
+        async def final() -> dict:
+            result = {}
+            async for event in events:
+                if event["type"] == "final":
+                    result = event
+            return result
+
+        result = run_coroutine(final())
+        response = result["output"]
+        if cached is None and response["output"]:
+            router.response_cache.store(prompt, {
+                "output": response["output"],
+                "intermediate_steps": response.get("intermediate_steps", []),
+            })
+        return route, response, result
+
+    def _charts(self, collected: list[dict]) -> list[dict]:
+        """JSON-ready charts: id, title and spec, the Vega-Lite spec, and a PNG written to `charts_dir`."""
+        out = []
+        for chart in collected:
+            if "path" in chart:
+                out.append({"path": chart["path"]})
+                continue
+            entry = {"id": chart["id"], "title": chart["spec"].get("title"), "spec": chart["spec"]}
+            if chart["vega_lite"] is not None:
+                entry["vega_lite"] = chart["vega_lite"]
+            if chart["png"] is not None and self.charts_dir is not None:
+                path = self.charts_dir / f"{chart['id']}.png"
+                if not path.exists():
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    tmp = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+                    tmp.write_bytes(chart["png"])
+                    os.replace(tmp, path)   # the same chart from two answers never exposes a partial file
+                entry["path"] = str(path)
+            out.append(entry)
+        return out
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=True)
+
+
+def summary(records: list[dict], elapsed: float) -> dict:
+    """Counts per route, errors and latency percentiles of a finished batch."""
+    totals = [r["timings"]["total"] for r in records if r["timings"].get("total") is not None]
+    return {
+        "questions": len(records),
+        "errors": sum(r["error"] is not None for r in records),
+        "routes": dict(Counter(r["route"] or "error" for r in records)),
+        "elapsed": round(elapsed, 3),
+        "p50": tracing.percentile(totals, 0.5),
+        "p95": tracing.percentile(totals, 0.95),
+    }
+
+
+def make_handler(runner: BatchRunner):
+    """HTTP handler class answering through `runner` (all requests share its worker pool)."""
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def _send(self, status: int, body) -> None:
+            payload = json.dumps(body, default=str, ensure_ascii=False).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._send(200, {"status": "ok", "tenants": data.registry.names(), "workers": runner.workers})
+            else:
+                self._send(404, {"error": f"Unknown path {self.path}"})
+
+        def do_POST(self):
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if self.path == "/ask":
+                    self._send(200, runner.ask(body.get("question"), body.get("tenant"), body.get("id")))
+                elif self.path == "/batch":
+                    entries = body["questions"] if isinstance(body, dict) else body
+                    self._send(200, {"answers": runner.run(normalize(entries))})
+                else:
+                    self._send(404, {"error": f"Unknown path {self.path}"})
+            except (ValueError, KeyError, TypeError) as e:
+                self._send(400, {"error": f"{type(e).__name__}: {e}"})
+
+        def log_message(self, format, *args):
+            pass   # every answer is already traced
+
+    return Handler
+
+
+def serve(runner: BatchRunner, host: str = "127.0.0.1", port: int = 8080) -> ThreadingHTTPServer:
+    """An HTTP server for `runner`; call `serve_forever()` on it."""
+    return ThreadingHTTPServer((host, port), make_handler(runner))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("questions", nargs="?", help="question file (.txt, .json or .jsonl)")
+    parser.add_argument("--output", help="answers JSON lines file (default: stdout)")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS)
+    parser.add_argument("--tenant", help="company for questions that do not name one")
+    parser.add_argument("--charts-dir", help="write chart PNGs here")
+    parser.add_argument("--serve", action="store_true", help="run the HTTP API instead of a file")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args(argv)
+    if not args.serve and not args.questions:
+        parser.error("a question file is required unless --serve is given")
+
+    if args.tenant:
+        data.tenant.set(args.tenant)
+    runner = BatchRunner(build_agent(), make_llm(temperature=0), args.workers, args.charts_dir)
+    try:
+        if args.serve:
+            server = serve(runner, args.host, args.port)
+            print(f"Serving on http://{args.host}:{server.server_port} ({runner.workers} workers)", file=sys.stderr)
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                server.server_close()
+            return 0
+
+        questions = load_questions(args.questions)
+        started = time.perf_counter()
+        if args.output:
+            Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+            with open(args.output, "w", encoding="utf-8") as output:
+                records = runner.run(questions, output)
+        else:
+            records = runner.run(questions, sys.stdout)
+        report = summary(records, time.perf_counter() - started)
+        print(json.dumps(report), file=sys.stderr)
+        return 1 if report["errors"] else 0
+    finally:
+        runner.shutdown()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+import contextlib
+import copy
+import functools
+import inspect
+import threading
+import time
+from collections import OrderedDict
+
+from . import tracing
+
+
+class MetricCache:
+    """
+    Thread-safe LRU cache with a TTL for metric results.
+
+    Keys combine the function name, its normalized arguments (defaults filled
+    in) and the dataset version returned by `version()`, so a reload never
+    serves numbers computed from older data. `pin()` is entered around each
+    memoized call so the key and the result come from the same dataset
+    (see `data.pin`). Hit/miss counters are exposed through `stats()` for
+    monitoring.
+    """
+
+    def __init__(self, version, maxsize: int = 512, ttl: float | None = 3600.0, clock=time.monotonic,
+                 name: str = "metric_cache", pin=contextlib.nullcontext):
+        self.version = version
+        self.pin = pin
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return `(True, value)` for a live entry, `(False, None)` otherwise."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (self.ttl is None or self.clock() - entry[0] < self.ttl):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                tracing.count(f"{self.name}.hit")
+                return True, _copy(entry[1])
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            tracing.count(f"{self.name}.miss")
+            return False, None
+
+    def put(self, key, value) -> None:
+        with self._lock:
+            self._entries[key] = (self.clock(), _copy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def memoize(self, **normalizers):
+        """
+        Decorator caching a function's results. Keyword arguments map parameter
+        names to normalizers, e.g. `start_month=normalize_month`, so that
+        equivalent spellings of the same argument share one entry.
+        """
+        def decorator(func):
+            signature = inspect.signature(func)
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                # A reload between reading the version and computing must not
+                # file one version's result under the other's key
+                with self.pin():
+                    try:
+                        bound = signature.bind(*args, **kwargs)
+                        bound.apply_defaults()
+                        params = tuple(
+                            (name, normalizers[name](value) if name in normalizers and value is not None else value)
+                            for name, value in bound.arguments.items()
+                        )
+                        key = (func.__qualname__, params, self.version())
+                        hash(key)
+                    except Exception:
+                        # Arguments we cannot normalize: let the function report the problem
+                        return func(*args, **kwargs)
+
+                    found, value = self.get(key)
+                    if found:
+                        return value
+                    value = func(*args, **kwargs)
+                    self.put(key, value)
+                    return value
+
+            wrapper.cache = self
+            return wrapper
+        return decorator
+
+
+class ResponseCache(MetricCache):
+    """
+    Cache of whole agent answers, keyed on `key(question)` plus the dataset
+    version. `key` maps equivalent phrasings ("EBITDA this year", "what's
+    2025 EBITDA") to one canonical tuple, or returns None for questions
+    that must not be cached (e.g. follow-ups that depend on the conversation).
+    """
+
+    def __init__(self, version, key, maxsize: int = 256, ttl: float | None = 3600.0, clock=time.monotonic,
+                 name: str = "response_cache"):
+        super().__init__(version, maxsize, ttl, clock, name)
+        self.key = key
+
+    def _key(self, question: str):
+        try:
+            key = self.key(question)
+        except Exception:
+            return None
+        return None if key is None else (key, self.version())
+
+    def lookup(self, question: str):
+        """Stored answer for `question`, or None."""
+        key = self._key(question)
+        if key is None:
+            return None
+        found, value = self.get(key)
+        return value if found else None
+
+    def store(self, question: str, answer: dict) -> None:
+        key = self._key(question)
+        if key is not None:
+            self.put(key, answer)
+
+
+def _copy(value):
+    # Callers may mutate returned dicts/lists; never hand out the cached object
+    return copy.deepcopy(value) if isinstance(value, (dict, list)) else value
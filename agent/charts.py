@@ -0,0 +1,280 @@
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from . import tracing
+
+# Rendered charts are content-addressed: identical specs share one file
+CHART_DIR = Path(os.environ.get("FINAI_CHART_DIR", "charts"))
+COLORS = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd']
+PNG_CACHE_SIZE = 128
+
+
+@dataclass(frozen=True)
+class ChartArtifact:
+    """
+    A rendered chart carried through the agent's intermediate steps.
+
+    `png` holds the image bytes (static mode) and `vega_lite` a Vega-Lite spec
+    rendered client-side (interactive mode). `str()` is what the model sees
+    as the tool observation.
+    """
+
+    id: str
+    spec: dict
+    png: bytes | None = field(default=None, repr=False)
+    vega_lite: dict | None = field(default=None, repr=False)
+
+    def __str__(self) -> str:
+        kind = "interactive " if self.vega_lite is not None else ""
+        return (f"{kind}{self.spec['chart_type']} chart '{self.spec['title']}' was rendered "
+                f"and is displayed to the user below the answer (chart id {self.id}).")
+
+
+def chart_spec(chart_type: str, x, y, title: str, x_label: str, y_label: str, legends: list[str] | None = None) -> dict:
+    """Plain, JSON-serializable description of a chart."""
+    return {
+        "chart_type": chart_type,
+        "x": _to_list(x),
+        "y": _to_list(y),
+        "title": title,
+        "x_label": x_label,
+        "y_label": y_label,
+        "legends": list(legends) if legends else None,
+    }
+
+
+def spec_hash(spec: dict) -> str:
+    payload = json.dumps(spec, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+
+def chart_path(spec: dict, name_hint: str | None = None) -> Path:
+    """Content-addressed output path, keeping a sanitized `name_hint` stem for readability."""
+    stem = re.sub(r"[^A-Za-z0-9_\-]+", "_", Path(name_hint).stem) if name_hint else "chart"
+    return CHART_DIR / f"{stem or 'chart'}-{spec_hash(spec)}.png"
+
+
+def draw(spec: dict) -> Figure:
+    """
+    Draw a chart spec on a standalone Figure (no pyplot global state, so it is
+    safe to call from worker threads). Supports single-series and
+    multi-series bar, line, scatter and pie charts; for multi-series data use
+    y = [[series1], [series2], …] and x = [[categories]].
+    """
+    chart_type, x, y, legends = spec["chart_type"], spec["x"], spec["y"], spec["legends"]
+    fig = Figure(figsize=(7, 4))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+
+    # ── MULTI-SERIES ────────────────────────────────────────────────
+    if isinstance(y[0], list) and len(y) > 1:
+        categories = x[0]  # shared x-axis
+        n_groups = len(categories)
+        n_series = len(y)
+
+        if chart_type == "bar":
+            bar_width = 0.8 / n_series
+            x_pos = np.arange(n_groups)
+
+            for i, series in enumerate(y):
+                offset = (i - n_series / 2 + 0.5) * bar_width
+                ax.bar(
+                    x_pos + offset,
+                    series,
+                    bar_width,
+                    color=COLORS[i % len(COLORS)],
+                    label=(legends[i] if legends and i < len(legends)
+                           else f"Series {i + 1}")
+                )
+
+            ax.set_xticks(x_pos, categories, rotation=45)
+            ax.legend()
+
+        elif chart_type == "line":
+            for i, series in enumerate(y):
+                ax.plot(
+                    categories,
+                    series,
+                    marker="o",
+                    label=(legends[i] if legends and i < len(legends)
+                           else f"Series {i + 1}")
+                )
+            ax.legend()
+            ax.tick_params(axis="x", labelrotation=45)
+
+    # ── SINGLE-SERIES ───────────────────────────────────────────────
+    else:
+        # flatten if wrapped
+        if isinstance(y[0], list): y = y[0]
+        if isinstance(x[0], list): x = x[0]
+
+        if chart_type == "line":
+            ax.plot(x, y, marker="o", linewidth=2, markersize=6,
+                    label=legends[0] if legends else None)
+        elif chart_type == "bar":
+            ax.bar(x, y, color="skyblue", edgecolor="navy", alpha=0.7,
+                   label=legends[0] if legends else None)
+            ax.tick_params(axis="x", labelrotation=45)
+            ax.set_ylim(bottom=0)
+        elif chart_type == "scatter":
+            ax.scatter(x, y, s=60, alpha=0.7,
+                       label=legends[0] if legends else None)
+        elif chart_type == "pie":
+            ax.pie(y, labels=x, autopct="%1.1f%%", startangle=90)
+            ax.axis("equal")
+
+        if legends and chart_type != "pie":
+            ax.legend()
+
+    # ── COMMON FORMATTING ──────────────────────────────────────────
+    ax.set_title(spec["title"], fontsize=14, fontweight="bold")
+
+    if chart_type != "pie":
+        ax.set_xlabel(spec["x_label"], fontsize=12)
+        ax.set_ylabel(spec["y_label"], fontsize=12)
+        ax.grid(True, alpha=0.3)
+
+    fig.tight_layout()
+    return fig
+
+
+_png_cache: OrderedDict = OrderedDict()
+_png_lock = threading.Lock()
+
+
+def render_png_bytes(spec: dict) -> bytes:
+    """PNG bytes for `spec`, memoized in memory by spec hash."""
+    key = spec_hash(spec)
+    with _png_lock:
+        if key in _png_cache:
+            _png_cache.move_to_end(key)
+            tracing.count("chart_cache.hit")
+            return _png_cache[key]
+
+    buffer = io.BytesIO()
+    draw(spec).savefig(buffer, format="png", dpi=100, bbox_inches="tight")
+    png = buffer.getvalue()
+
+    with _png_lock:
+        _png_cache[key] = png
+        while len(_png_cache) > PNG_CACHE_SIZE:
+            _png_cache.popitem(last=False)
+    return png
+
+
+def vega_lite_spec(spec: dict) -> dict:
+    """Equivalent Vega-Lite spec with inline data, for client-side rendering."""
+    chart_type, x, y, legends = spec["chart_type"], spec["x"], spec["y"], spec["legends"]
+    multi = isinstance(y[0], list) and len(y) > 1
+    if multi:
+        categories = x[0]
+        names = [legends[i] if legends and i < len(legends) else f"Series {i + 1}" for i in range(len(y))]
+        values = [
+            {"x": c, "y": v, "series": names[i]}
+            for i, series in enumerate(y)
+            for c, v in zip(categories, series)
+        ]
+    else:
+        xs = x[0] if isinstance(x[0], list) else x
+        ys = y[0] if isinstance(y[0], list) else y
+        name = legends[0] if legends else None
+        values = [{"x": c, "y": v, "series": name} for c, v in zip(xs, ys)]
+
+    vega = {
+        "$schema": "https://vega.github.io/schema/vega-lite/v5.json",
+        "title": spec["title"],
+        "data": {"values": values},
+    }
+    if chart_type == "pie":
+        vega["mark"] = {"type": "arc", "tooltip": True}
+        vega["encoding"] = {
+            "theta": {"field": "y", "type": "quantitative"},
+            "color": {"field": "x", "type": "nominal", "sort": None},
+        }
+        return vega
+
+    vega["mark"] = {
+        "bar": {"type": "bar", "tooltip": True},
+        "line": {"type": "line", "point": True, "tooltip": True},
+        "scatter": {"type": "point", "filled": True, "size": 60, "tooltip": True},
+    }.get(chart_type, {"type": chart_type, "tooltip": True})
+    vega["encoding"] = {
+        "x": {"field": "x", "type": "nominal", "sort": None, "title": spec["x_label"]},
+        "y": {"field": "y", "type": "quantitative", "title": spec["y_label"]},
+    }
+    if multi or legends:
+        vega["encoding"]["color"] = {"field": "series", "type": "nominal", "title": None}
+    if multi and chart_type == "bar":
+        vega["encoding"]["xOffset"] = {"field": "series"}
+    return vega
+
+
+def render(spec: dict, interactive: bool = False) -> ChartArtifact:
+    """Render a spec in memory: PNG bytes, or a Vega-Lite spec when `interactive`."""
+    with tracing.span("chart.render", "chart", chart_type=spec["chart_type"], interactive=interactive):
+        if interactive:
+            return ChartArtifact(id=spec_hash(spec), spec=spec, vega_lite=vega_lite_spec(spec))
+        return ChartArtifact(id=spec_hash(spec), spec=spec, png=render_png_bytes(spec))
+
+
+def render_png(spec: dict, path: Path) -> Path:
+    """Render `spec` to `path`, skipping the work if that content-addressed file already exists."""
+    path = Path(path)
+    if path.exists():
+        return path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{id(spec)}.tmp")
+    draw(spec).savefig(tmp, format="png", dpi=100, bbox_inches="tight")
+    os.replace(tmp, path)   # concurrent renders of the same spec never expose a partial file
+    return path
+
+
+def extract_image_paths(text: str) -> list[str]:
+    """
+    Finds all image filenames (png/jpeg) in a block of text,
+    whether in quotes or bare.
+    """
+    return re.findall(r"['\"]?([A-Za-z0-9_\-./]*[A-Za-z0-9_\-]+\.(?:png|jpg|jpeg))['\"]?", text)
+
+
+def collect_charts(intermediate_steps) -> list[dict]:
+    """
+    Charts produced during a turn, in order: in-memory artifacts from
+    plot_chart (id, spec, png / vega_lite), plus image files that
+    code_analysis snippets saved to disk (path).
+    """
+    collected, seen = [], set()
+    for action, observation in intermediate_steps:
+        if isinstance(observation, ChartArtifact):
+            found = [(observation.id, {"id": observation.id, "spec": observation.spec,
+                                       "png": observation.png, "vega_lite": observation.vega_lite})]
+        elif action.tool == "code_analysis" and isinstance(observation, str):
+            found = [(path, {"path": path}) for path in extract_image_paths(observation)]
+        else:
+            continue
+        for key, chart in found:
+            if key not in seen:
+                seen.add(key)
+                collected.append(chart)
+    return collected
+
+
+def _to_list(values):
+    if isinstance(values, np.ndarray):
+        return values.tolist()
+    if isinstance(values, (list, tuple)):
+        return [_to_list(v) for v in values]
+    if isinstance(values, np.generic):
+        return values.item()
+    return values
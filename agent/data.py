@@ -0,0 +1,581 @@
+import contextvars
+import glob
+from contextlib import contextmanager
+import hashlib
+import os
+import re
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, fields
+from pathlib import Path
+from types import MappingProxyType
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from . import ingest, tracing
+from .fx import FxTable, fallback_report
+from .ledger import LedgerCube, build_usd_ledger
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # snapshots are only an optimization; fall back to parsing Excel
+    feather = None
+
+# Workbook location (module-relative, not CWD-relative) and snapshot cache
+DATA_PATH = Path(os.environ.get("FINAI_DATA_PATH", Path(__file__).resolve().parent.parent / "data.xlsx"))
+CACHE_DIR = os.environ.get("FINAI_CACHE_DIR")
+WATCH_INTERVAL = float(os.environ.get("FINAI_WATCH_INTERVAL", "5"))
+SHEETS = ("actuals", "budget", "cash", "fx")
+
+# Extra tenants as "name=path.xlsx,name=path.xlsx"; "default" is DATA_PATH.
+# Any path may also be a directory of CSV / Parquet ledger exports
+TENANTS = os.environ.get("FINAI_TENANTS", "")
+DEFAULT_TENANT = "default"
+MEMORY_BUDGET_MB = float(os.environ.get("FINAI_MEMORY_BUDGET_MB", "1024"))
+
+# Which tenant's dataset the current request reads (set by the app per session)
+tenant = contextvars.ContextVar("finai_tenant", default=DEFAULT_TENANT)
+
+# (tenant, Dataset) every read in the current request is served from (see `pin`)
+pinned = contextvars.ContextVar("finai_pinned", default=None)
+
+
+def workbook_key(path: Path) -> str:
+    """Snapshot key for a workbook: its mtime and size plus a hash of its bytes."""
+    if path.is_dir():
+        return ingest.source_key(path)
+    stat = path.stat()
+    digest = hashlib.sha1(f"{stat.st_mtime_ns}:{stat.st_size}".encode())
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def _snapshot_root(path: Path) -> Path:
+    return Path(CACHE_DIR) if CACHE_DIR else path.parent / ".finai_cache"
+
+
+def _read_snapshot(snapshot: Path) -> dict[str, pd.DataFrame] | None:
+    if feather is None or not snapshot.is_dir():
+        return None
+    try:
+        # Uncompressed Feather files are memory-mapped rather than copied into memory
+        return {
+            name: feather.read_table(snapshot / f"{name}.feather", memory_map=True).to_pandas()
+            for name in SHEETS
+        }
+    except Exception:
+        return None
+
+
+def _write_snapshot(snapshot: Path, sheets: dict[str, pd.DataFrame]) -> None:
+    if feather is None:
+        return
+    tmp = snapshot.with_name(f"{snapshot.name}.tmp-{os.getpid()}-{threading.get_ident()}")
+    try:
+        tmp.mkdir(parents=True, exist_ok=True)
+        for name in SHEETS:
+            feather.write_feather(sheets[name], tmp / f"{name}.feather", compression="uncompressed")
+        os.replace(tmp, snapshot)
+    except Exception:
+        # Read-only filesystems, a concurrent writer, unsupported dtypes: keep the Excel path
+        shutil.rmtree(tmp, ignore_errors=True)
+        return
+
+    # Drop snapshots of older versions of the same workbook: same stem, another
+    # key (not "data-emea-<key>" when saving "data-<key>")
+    stem = snapshot.name.rsplit("-", 1)[0]
+    same_workbook = re.compile(re.escape(stem) + r"-[0-9a-f]+")
+    for old in snapshot.parent.glob(f"{glob.escape(stem)}-*"):
+        if old != snapshot and old.is_dir() and same_workbook.fullmatch(old.name):
+            shutil.rmtree(old, ignore_errors=True)
+
+
+def read_sheets(path: Path | str | None = None, key: str | None = None) -> dict[str, pd.DataFrame]:
+    """
+    Read the actuals / budget / cash / fx sheets of a workbook.
+
+    The first read parses the Excel file and writes a Feather snapshot next to
+    it (or under $FINAI_CACHE_DIR); later reads of an unchanged workbook
+    memory-map the snapshot instead of re-parsing the workbook. `path` may
+    also be a directory of CSV / Parquet exports (see `ingest.read_export`),
+    which are streamed and aggregated before being snapshotted the same way.
+    """
+    path = Path(path or DATA_PATH)
+    snapshot = _snapshot_root(path) / f"{path.stem}-{key or workbook_key(path)}"
+
+    sheets = _read_snapshot(snapshot)
+    if sheets is None:
+        sheets = ingest.read_export(path) if path.is_dir() else pd.read_excel(path, sheet_name=list(SHEETS))
+        _write_snapshot(snapshot, sheets)
+    return sheets
+
+
+def _readonly(array) -> None:
+    # ndarrays, and the ndarrays behind Categorical / Period / Datetime arrays
+    for values in (array, getattr(array, "_ndarray", None), getattr(array, "_codes", None)):
+        if isinstance(values, np.ndarray):
+            values.setflags(write=False)
+
+
+def freeze(value):
+    """
+    Make the arrays behind `value` read-only, in place, and return it.
+
+    Handles ndarrays, DataFrames / Series (their column blocks: in-place
+    writes such as `df.loc[...] = x` raise instead of changing shared data),
+    dicts, and objects such as `LedgerCube` whose attributes hold them; the
+    list attributes of those objects (entities, categories, month labels)
+    become tuples.
+    """
+    if isinstance(value, pd.DataFrame):
+        for array in value._mgr.arrays:   # the frame's own blocks, not copies
+            _readonly(array)
+    elif isinstance(value, (pd.Series, pd.Index)):
+        _readonly(value.array)
+        _readonly(value.to_numpy())
+        if isinstance(value, pd.Series):
+            freeze(value.index)
+    elif isinstance(value, np.ndarray):
+        _readonly(value)
+    elif isinstance(value, (dict, MappingProxyType)):
+        for item in value.values():
+            freeze(item)
+    elif isinstance(value, (LedgerCube, FxTable)):
+        for name, item in vars(value).items():
+            if isinstance(item, list):
+                setattr(value, name, tuple(item))
+            else:
+                freeze(item)
+    return value
+
+
+@dataclass(frozen=True)
+class Dataset:
+    """
+    Prepared sheets plus the derived USD ledgers and month × category cube.
+
+    `fx_fallbacks` lists the ledger rows converted without a rate for their
+    own month (see `fx.fallback_report`); it is empty for a complete fx sheet.
+
+    A dataset is shared by every session and thread that reads it, so it is
+    read-only all the way down: its arrays and frames are frozen (see
+    `freeze`) when it is created. Changes always produce a new dataset.
+    """
+
+    actuals: pd.DataFrame
+    budget: pd.DataFrame
+    cash: pd.DataFrame
+    fx: pd.DataFrame
+    actuals_usd: pd.DataFrame
+    budget_usd: pd.DataFrame
+    cube: LedgerCube
+    cash_by_month: pd.Series
+    cash_by_entity: dict
+    fx_table: FxTable
+    fx_fallbacks: pd.DataFrame
+    version: int = 0
+    key: str = ""
+    nbytes: int = 0
+
+    def __post_init__(self):
+        object.__setattr__(self, "cash_by_entity", MappingProxyType(dict(self.cash_by_entity)))
+        for field in fields(self):
+            freeze(getattr(self, field.name))
+
+
+def _normalize_months(df: pd.DataFrame) -> pd.DataFrame:
+    if not isinstance(df["month"].dtype, pd.PeriodDtype):
+        df["month"] = pd.to_datetime(df["month"]).dt.to_period("M")
+    return df
+
+
+def _cash_balances(cash: pd.DataFrame) -> tuple[pd.Series, dict]:
+    """Cash by month ordinal, consolidated and per lowercased entity name."""
+    by_month = cash.groupby(cash["month"].array.asi8)["cash_usd"].sum()
+    by_entity = {
+        str(entity).lower(): rows.groupby(rows["month"].array.asi8)["cash_usd"].sum()
+        for entity, rows in cash.groupby(cash["entity"].astype(str))
+    } if "entity" in cash else {}
+    return by_month, by_entity
+
+
+def _cube_nbytes(cube: LedgerCube) -> int:
+    return sum(a.nbytes for a in vars(cube).values() if isinstance(a, np.ndarray))
+
+
+def build_dataset(sheets: dict[str, pd.DataFrame], version: int = 0, key: str = "") -> Dataset:
+    actuals, budget, cash, fx = (_normalize_months(sheets[name].copy()) for name in SHEETS)
+
+    fx_table = FxTable(fx)
+    actuals_usd = build_usd_ledger(actuals, fx_table)
+    budget_usd = build_usd_ledger(budget, fx_table)
+    cube = LedgerCube(actuals_usd, budget_usd)
+    frames = (actuals, budget, cash, fx, actuals_usd, budget_usd)
+    nbytes = sum(int(df.memory_usage(deep=True).sum()) for df in frames) + _cube_nbytes(cube)
+    cash_by_month, cash_by_entity = _cash_balances(cash)
+    return Dataset(
+        actuals=actuals,
+        budget=budget,
+        cash=cash,
+        fx=fx,
+        actuals_usd=actuals_usd,
+        budget_usd=budget_usd,
+        cube=cube,
+        cash_by_month=cash_by_month,
+        cash_by_entity=cash_by_entity,
+        fx_table=fx_table,
+        fx_fallbacks=fallback_report({"actuals": actuals_usd, "budget": budget_usd}),
+        version=version,
+        key=key,
+        nbytes=nbytes,
+    )
+
+
+def _concat(frames: list[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenate frames with the same columns, keeping categorical columns categorical."""
+    frames = [f for f in frames if len(f)] or frames[:1]
+    combined = pd.concat(frames, ignore_index=True)
+    for column in frames[0].columns:
+        if isinstance(frames[0][column].dtype, pd.CategoricalDtype) and len(frames) > 1:
+            combined[column] = union_categoricals([f[column].array for f in frames])
+    return combined
+
+
+def _replace_rows(sheet: pd.DataFrame, delta: pd.DataFrame, keys: list[str]) -> pd.DataFrame:
+    """`sheet` with the rows sharing a `keys` tuple with `delta` replaced by `delta`'s."""
+    replaced = pd.MultiIndex.from_frame(sheet[keys].astype(str)).isin(pd.MultiIndex.from_frame(delta[keys].astype(str)))
+    return pd.concat([sheet[~replaced], delta[sheet.columns]], ignore_index=True)
+
+
+def apply_delta(dataset: Dataset, delta: dict[str, pd.DataFrame], restate: bool = False,
+                version: int | None = None, key: str | None = None) -> Dataset:
+    """
+    A new dataset with `delta` sheets (any of actuals / budget / cash / fx, in
+    the workbook layout) applied to `dataset`, which is left as is.
+
+    Ledger rows are appended; with `restate`, each month present in a ledger
+    delta replaces that ledger's existing rows for the month. Cash balances
+    and fx rates replace those for the same (month, entity) / (month,
+    currency). Only the delta rows are converted and aggregated into the cube
+    (see `LedgerCube.apply_delta`), plus the existing rows whose fx rate the
+    delta changed. Use it for month-end closes instead of `build_dataset`.
+    """
+    delta = {name: _normalize_months(df.copy()) for name, df in delta.items() if df is not None and len(df)}
+
+    fx, fx_table = dataset.fx, dataset.fx_table
+    if "fx" in delta:
+        fx = _replace_rows(dataset.fx, delta["fx"], ["month", "currency"])
+        fx_table = FxTable(fx)
+
+    sheets, ledgers, added, removed = {}, {}, [], []
+    for name in ("actuals", "budget"):
+        sheet, usd = getattr(dataset, name), getattr(dataset, f"{name}_usd")
+        rows = delta.get(name, sheet.iloc[:0])
+        keep = np.ones(len(sheet), dtype=bool)
+        if restate and len(rows):
+            keep = ~sheet["month"].isin(rows["month"].unique()).to_numpy()
+
+        # New rates only matter from the first changed month on (later months may carry them)
+        reconvert = np.zeros(len(sheet), dtype=bool)
+        if "fx" in delta:
+            candidates = np.flatnonzero(keep & (usd["month"].to_numpy() >= delta["fx"]["month"].array.asi8.min()))
+            old_rate, old_source = dataset.fx_table.lookup(usd["month"].to_numpy()[candidates], usd["currency"].iloc[candidates])
+            new_rate, new_source = fx_table.lookup(usd["month"].to_numpy()[candidates], usd["currency"].iloc[candidates])
+            changed = ~((old_rate == new_rate) | (np.isnan(old_rate) & np.isnan(new_rate))) | (old_source != new_source)
+            reconvert[candidates[changed]] = True
+
+        converted = build_usd_ledger(rows, fx_table)
+        reconverted = build_usd_ledger(sheet[reconvert], fx_table)
+        kept_usd = usd[keep & ~reconvert]
+        sheets[name] = _concat([sheet[keep & ~reconvert], sheet[reconvert], rows[sheet.columns]])
+        ledgers[name] = _concat([kept_usd, reconverted, converted])
+        added.append(_concat([reconverted, converted]))
+        removed.append(usd[~keep | reconvert])
+
+    cube = dataset.cube.apply_delta(tuple(added), tuple(removed))
+    cash = _replace_rows(dataset.cash, delta["cash"], ["month", "entity"]) if "cash" in delta else dataset.cash
+    cash_by_month, cash_by_entity = _cash_balances(cash) if "cash" in delta else (dataset.cash_by_month, dataset.cash_by_entity)
+
+    delta_frames = [*delta.values(), *added]
+    nbytes = (dataset.nbytes - _cube_nbytes(dataset.cube) + _cube_nbytes(cube)
+              + sum(int(df.memory_usage(deep=True).sum()) for df in delta_frames))
+    return Dataset(
+        actuals=sheets["actuals"],
+        budget=sheets["budget"],
+        cash=cash,
+        fx=fx,
+        actuals_usd=ledgers["actuals"],
+        budget_usd=ledgers["budget"],
+        cube=cube,
+        cash_by_month=cash_by_month,
+        cash_by_entity=cash_by_entity,
+        fx_table=fx_table,
+        fx_fallbacks=fallback_report({"actuals": ledgers["actuals"], "budget": ledgers["budget"]}),
+        version=dataset.version + 1 if version is None else version,
+        key=dataset.key if key is None else key,
+        nbytes=nbytes,
+    )
+
+
+class DataStore:
+    """
+    Versioned holder of the current `Dataset` for one workbook.
+
+    Datasets are never mutated: `reload()` builds a complete new one and then
+    swaps the reference, so a reader that grabbed `current()` keeps a
+    consistent view for the whole call. With a watch interval, `current()`
+    also checks the workbook's mtime/size at most that often and reloads when
+    it changed. Callbacks registered with `on_reload` run after every swap, so
+    derived caches can be invalidated. `append()` and new parts in an export
+    directory apply just the delta (see `apply_delta`) rather than rebuilding.
+    """
+
+    def __init__(self, path: Path | str | None = None, watch_interval: float | None = WATCH_INTERVAL):
+        self.path = Path(path or DATA_PATH)
+        self.watch_interval = watch_interval if watch_interval and watch_interval > 0 else None
+        self._dataset: Dataset | None = None
+        self._version = 0
+        self._last_key = None
+        self._stat = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._listeners = []
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    @property
+    def loaded(self) -> bool:
+        return self._dataset is not None
+
+    def _file_stat(self):
+        if self.path.is_dir():
+            # Any part of an export directory changing counts as a change
+            return ingest.export_stats(self.path)
+        stat = self.path.stat()
+        return stat.st_mtime_ns, stat.st_size
+
+    def current(self) -> Dataset:
+        dataset = self._dataset
+        if dataset is None:
+            return self.reload()
+        if self.watch_interval is not None and time.monotonic() - self._checked_at >= self.watch_interval:
+            self._checked_at = time.monotonic()
+            try:
+                if self._file_stat() != self._stat:
+                    return self.reload()
+            except Exception:
+                # Workbook missing or half-written mid-save: keep serving the
+                # loaded version and retry on the next check
+                pass
+        return dataset
+
+    def reload(self, force: bool = False) -> Dataset:
+        """Rebuild the dataset if the workbook changed (or always, with `force`)."""
+        with self._lock:
+            stat = self._file_stat()
+            key = workbook_key(self.path)
+            current = self._dataset
+            if current is not None and not force and key == current.key:
+                self._stat = stat
+                return current
+            if current is None and not force and key == self._last_key:
+                # Reloading after `unload()`: same content, so keep the version
+                version = self._version
+            else:
+                version = self._version + 1
+
+            # New export parts alone (a month-end close) are folded into the
+            # loaded dataset instead of re-reading the whole export
+            added = None
+            if current is not None and not force and self.path.is_dir() and self._stat is not None:
+                added = ingest.added_files(self.path, self._stat, stat)
+            with tracing.span("data.load", "data", workbook=self.path.name, incremental=bool(added)):
+                if added:
+                    dataset = apply_delta(current, ingest.read_export(self.path, files=added), version=version, key=key)
+                else:
+                    dataset = build_dataset(read_sheets(self.path, key), version=version, key=key)
+            # Listeners only hear about new versions, not a re-load of evicted data
+            listeners = list(self._listeners) if version != self._version else []
+            self._dataset, self._stat = dataset, stat
+            self._version, self._last_key = version, key
+            self._checked_at = time.monotonic()
+
+        for callback in listeners:
+            callback(dataset)
+        return dataset
+
+    def append(self, delta: dict[str, pd.DataFrame], restate: bool = False) -> Dataset:
+        """
+        Swap in a new version with `delta` sheets applied (see `apply_delta`)
+        instead of rebuilding from the source. The appended rows stay until
+        the workbook itself changes and is reloaded.
+        """
+        current = self.current()
+        with self._lock:
+            current = self._dataset or current
+            with tracing.span("data.delta", "data", workbook=self.path.name):
+                dataset = apply_delta(current, delta, restate=restate, version=self._version + 1)
+            listeners = list(self._listeners)
+            self._dataset, self._version = dataset, dataset.version
+        for callback in listeners:
+            callback(dataset)
+        return dataset
+
+    def on_reload(self, callback) -> None:
+        """Register `callback(dataset)` to run after each new dataset is swapped in."""
+        self._listeners.append(callback)
+
+    def unload(self) -> None:
+        """Drop the loaded dataset to free memory; the next `current()` loads it again."""
+        with self._lock:
+            self._dataset = None
+
+
+class DatasetRegistry:
+    """
+    Named `DataStore`s, one per tenant (company / subsidiary workbook).
+
+    Datasets load on first use. When the loaded datasets together exceed
+    `memory_budget_mb`, the least recently used ones are unloaded (the one
+    just requested always stays). Reload callbacks registered with
+    `on_reload` apply to every store, current and future, and receive
+    `(name, dataset)`.
+    """
+
+    def __init__(self, paths: dict | None = None, memory_budget_mb: float = MEMORY_BUDGET_MB,
+                 watch_interval: float | None = WATCH_INTERVAL):
+        self.memory_budget = memory_budget_mb * (1 << 20)
+        self.watch_interval = watch_interval
+        self._stores: dict[str, DataStore] = {}
+        self._used = OrderedDict()   # tenant names, least recently used first
+        self._lock = threading.Lock()
+        self._listeners = []
+        for name, path in (paths or {}).items():
+            self.register(name, path)
+
+    def register(self, name: str, path: Path | str | None = None) -> DataStore:
+        store = DataStore(path, watch_interval=self.watch_interval)
+        store.on_reload(lambda dataset: self._reloaded(name, dataset))
+        with self._lock:
+            self._stores[name] = store
+        return store
+
+    def names(self) -> list[str]:
+        return list(self._stores)
+
+    def store(self, name: str | None = None) -> DataStore:
+        name = name or DEFAULT_TENANT
+        try:
+            return self._stores[name]
+        except KeyError:
+            raise KeyError(f"Unknown tenant {name!r}; registered: {self.names()}") from None
+
+    def get(self, name: str | None = None) -> Dataset:
+        name = name or DEFAULT_TENANT
+        dataset = self.store(name).current()
+        with self._lock:
+            self._used[name] = True
+            self._used.move_to_end(name)
+        self._evict(keep=name)
+        return dataset
+
+    def loaded_bytes(self) -> int:
+        with self._lock:
+            return self._loaded_bytes()
+
+    def _loaded_bytes(self) -> int:
+        # Read each store's dataset once: a reload or unload in another thread may swap it
+        datasets = [store._dataset for store in self._stores.values()]
+        return sum(dataset.nbytes for dataset in datasets if dataset is not None)
+
+    def _evict(self, keep: str) -> None:
+        with self._lock:
+            for name in list(self._used):
+                if self._loaded_bytes() <= self.memory_budget:
+                    break
+                if name != keep:
+                    self._stores[name].unload()
+                    del self._used[name]
+
+    def _reloaded(self, name: str, dataset: Dataset) -> None:
+        for callback in list(self._listeners):
+            callback(name, dataset)
+
+    def on_reload(self, callback) -> None:
+        """Register `callback(name, dataset)` to run after any tenant's dataset is swapped in."""
+        self._listeners.append(callback)
+
+
+def _configured_tenants() -> dict:
+    paths = {DEFAULT_TENANT: DATA_PATH}
+    for item in filter(None, (part.strip() for part in TENANTS.split(","))):
+        name, _, path = item.partition("=")
+        paths[name.strip()] = Path(path.strip())
+    return paths
+
+
+registry = DatasetRegistry(_configured_tenants())
+store = registry.store(DEFAULT_TENANT)
+
+
+def current_store() -> DataStore:
+    """The store of the tenant bound to the current context."""
+    return registry.store(tenant.get())
+
+
+def get_dataset() -> Dataset:
+    """The current tenant's dataset: the pinned one (see `pin`), else the latest, loaded on first use."""
+    name = tenant.get()
+    held = pinned.get()
+    if held is not None and held[0] == name:
+        return held[1]
+    return registry.get(name)
+
+
+def current_version() -> tuple[str, int]:
+    """Cache-key version of the current tenant's data: (tenant, dataset version)."""
+    return tenant.get(), get_dataset().version
+
+
+def pin_dataset(name: str | None = None) -> Dataset:
+    """
+    Pin the current tenant's latest dataset (or `name`'s) for the rest of
+    this context; see `pin`. Returns the pinned dataset.
+    """
+    name = name or tenant.get()
+    dataset = registry.get(name)
+    pinned.set((name, dataset))
+    return dataset
+
+
+@contextmanager
+def pin(name: str | None = None):
+    """
+    Serve every `get_dataset()` in this context from one dataset.
+
+    Readers never lock: datasets are immutable and reloads publish a new one
+    by swapping a reference (writers are serialized by the store), so a
+    reader only has to hold on to the dataset it started with. Pinning does
+    that for a whole request, including its tool threads, which copy the
+    context: every metric, cache key and chart of one answer comes from the
+    same version even if a reload lands halfway through, and the previous
+    version is freed once its last reader finishes.
+    """
+    name = name or tenant.get()
+    held = pinned.get()
+    if held is not None and held[0] == name:
+        yield held[1]
+        return
+    token = pinned.set((name, registry.get(name)))
+    try:
+        yield pinned.get()[1]
+    finally:
+        pinned.reset(token)
@@ -0,0 +1,112 @@
+import asyncio
+import contextvars
+import os
+import threading
+import time
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from langchain.agents import AgentExecutor
+from langchain_core.agents import AgentStep
+from pydantic import PrivateAttr
+
+TOOL_WORKERS = int(os.environ.get("FINAI_TOOL_WORKERS", "4"))
+TOOL_TIMEOUT = float(os.environ.get("FINAI_TOOL_TIMEOUT", "60"))
+
+
+class ParallelAgentExecutor(AgentExecutor):
+    """
+    AgentExecutor that runs the tool calls of one agent step concurrently.
+
+    Sync runs (`invoke`) submit every action of a step to a shared thread
+    pool of `max_workers` threads; async runs (`ainvoke`, `astream_events`)
+    keep LangChain's `asyncio.gather` but cap concurrency at `max_workers`.
+    Each tool call gets `tool_timeout` seconds once it starts; a call that
+    overruns is reported back to the model as a timeout observation (the
+    thread itself cannot be killed and finishes in the background).
+    Observations are returned in the order the model requested them.
+    """
+
+    max_workers: int = TOOL_WORKERS
+    tool_timeout: float | None = TOOL_TIMEOUT
+
+    _pool: ThreadPoolExecutor | None = PrivateAttr(default=None)
+    _pool_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _semaphores: weakref.WeakKeyDictionary = PrivateAttr(default_factory=weakref.WeakKeyDictionary)
+
+    def _timeout_step(self, agent_action) -> AgentStep:
+        return AgentStep(
+            action=agent_action,
+            observation=f"Tool '{agent_action.tool}' did not finish within {self.tool_timeout:g}s. "
+                        f"Try a narrower request or a different tool.",
+        )
+
+    # ── sync path ──────────────────────────────────────────────────────
+    def _submit(self, func, *args) -> tuple[Future, dict]:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="agent-tool")
+        job = {"started": threading.Event(), "start": None}
+        context = contextvars.copy_context()   # keep session/tenant context vars in the worker
+
+        def run():
+            job["start"] = time.monotonic()
+            job["started"].set()
+            return context.run(func, *args)
+
+        return self._pool.submit(run), job
+
+    def _perform_agent_action(self, name_to_tool_map, color_mapping, agent_action, run_manager=None):
+        # Called by the base _iter_next_step once per action, before any result is
+        # consumed: hand back a pending job so all actions of the step run together
+        future, job = self._submit(
+            super()._perform_agent_action, name_to_tool_map, color_mapping, agent_action, run_manager,
+        )
+        return _PendingStep(agent_action, future, job)
+
+    def _resolve(self, pending: "_PendingStep") -> AgentStep:
+        if self.tool_timeout is None:
+            return pending.future.result()
+        # Time spent queued behind other calls does not count against the timeout
+        if not pending.job["started"].wait(self.tool_timeout):
+            pending.future.cancel()
+            return self._timeout_step(pending.action)
+        remaining = self.tool_timeout - (time.monotonic() - pending.job["start"])
+        try:
+            return pending.future.result(timeout=max(remaining, 0))
+        except FutureTimeoutError:
+            return self._timeout_step(pending.action)
+
+    def _iter_next_step(self, name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager=None):
+        pending = []
+        for item in super()._iter_next_step(name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager):
+            if isinstance(item, _PendingStep):
+                pending.append(item)
+            else:
+                yield item
+        for item in pending:
+            yield self._resolve(item)
+
+    # ── async path ─────────────────────────────────────────────────────
+    async def _aperform_agent_action(self, name_to_tool_map, color_mapping, agent_action, run_manager=None):
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_workers)
+
+        async with semaphore:
+            try:
+                return await asyncio.wait_for(
+                    super()._aperform_agent_action(name_to_tool_map, color_mapping, agent_action, run_manager),
+                    timeout=self.tool_timeout,
+                )
+            except asyncio.TimeoutError:
+                return self._timeout_step(agent_action)
+
+
+class _PendingStep:
+    __slots__ = ("action", "future", "job")
+
+    def __init__(self, action, future, job):
+        self.action, self.future, self.job = action, future, job
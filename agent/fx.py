@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+
+BASE_CURRENCY = "USD"
+
+# How each converted row got its rate
+EXACT = "exact"        # a rate for that month and currency
+CARRIED = "carried"    # the nearest earlier month's rate (or the first one, before the fx sheet starts)
+MISSING = "missing"    # no rate for the currency at all: amount_usd is NaN
+SOURCES = (EXACT, CARRIED, MISSING)
+
+
+def month_ordinals(months) -> np.ndarray:
+    """Period ordinals (int64) of a month column: Periods, timestamps or "YYYY-MM" strings."""
+    months = pd.Series(months)
+    if not isinstance(months.dtype, pd.PeriodDtype):
+        months = pd.to_datetime(months).dt.to_period("M")
+    return months.array.asi8
+
+
+class FxTable:
+    """
+    Dense currency × month matrix of USD rates, built once from the fx sheet.
+
+    Lookups are NumPy indexing into the matrix rather than a merge. Gaps are
+    filled as-of: a month without a rate uses the latest earlier month's
+    rate, months before the first rate use the first one, and months after
+    the sheet ends use the last one. Every lookup also returns the source of
+    each rate (`EXACT`, `CARRIED` or `MISSING`), so callers can report
+    conversions that did not use a rate for their own month.
+    """
+
+    def __init__(self, fx: pd.DataFrame, base: str = BASE_CURRENCY):
+        self.base = base
+        months = month_ordinals(fx["month"])
+        currencies = fx["currency"].astype(str).to_numpy()
+        self.currencies = sorted(set(currencies) | {base})
+        self.first_month = int(months.min()) if len(months) else 0
+        self.n_months = int(months.max()) - self.first_month + 1 if len(months) else 0
+
+        shape = (len(self.currencies), self.n_months)
+        observed_rates = np.full(shape, np.nan)
+        c = pd.Index(self.currencies).get_indexer(currencies)
+        observed_rates[c, months - self.first_month] = fx["rate_to_usd"].to_numpy(dtype="float64")
+        observed_rates[self.currencies.index(base)] = 1.0
+        observed = ~np.isnan(observed_rates)
+
+        has_rate = observed.any(axis=1)
+        self.source = np.where(observed, 0, np.where(has_rate[:, None], 1, 2)).astype(np.int8)
+        if not self.n_months:
+            self.rates = observed_rates
+            return
+
+        # Column of the latest observed month at or before each month, else the first observed one
+        latest = np.maximum.accumulate(np.where(observed, np.arange(self.n_months), -1), axis=1)
+        latest = np.where(latest < 0, observed.argmax(axis=1)[:, None], latest)
+        self.rates = np.take_along_axis(observed_rates, latest, axis=1)
+        self.rates[~has_rate] = np.nan
+
+    def lookup(self, months, currencies) -> tuple[np.ndarray, np.ndarray]:
+        """Rates and source codes (indices into `SOURCES`) for parallel month / currency arrays."""
+        months = np.asarray(months, dtype=np.int64)
+        currencies = pd.Series(currencies)
+        if isinstance(currencies.dtype, pd.CategoricalDtype):
+            # Match each distinct currency once, then index by the codes
+            matched = pd.Index(self.currencies).get_indexer(currencies.cat.categories.astype(str))
+            codes = currencies.cat.codes.to_numpy()
+            c = np.where(codes >= 0, matched[codes], -1)
+        else:
+            c = pd.Index(self.currencies).get_indexer(currencies.astype(str))
+        known = c >= 0
+        rate = np.full(len(months), np.nan)
+        source = np.full(len(months), 2, dtype=np.int8)
+        if self.n_months:
+            offset = months - self.first_month
+            m = np.clip(offset, 0, self.n_months - 1)
+            rate[known] = self.rates[c[known], m[known]]
+            source[known] = self.source[c[known], m[known]]
+            # Outside the sheet's months a rate is always borrowed from its edge
+            source[known & ((offset < 0) | (offset >= self.n_months)) & (source == 0)] = 1
+        base = c == self.currencies.index(self.base)
+        rate[base], source[base] = 1.0, 0
+        return rate, source
+
+    def convert(self, amounts, months, currencies) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(amount_usd, rate, source) for parallel amount / month ordinal / currency arrays."""
+        rate, source = self.lookup(months, currencies)
+        return np.asarray(amounts, dtype="float64") * rate, rate, source
+
+
+def fallback_report(ledgers: dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    Rows converted without an exact rate, per USD ledger (see `build_usd_ledger`):
+    one row per (ledger, month, currency, source) with the row count and the
+    original amount.
+    """
+    frames = []
+    for name, ledger in ledgers.items():
+        rows = ledger[ledger["fx_source"] != EXACT]
+        if len(rows):
+            grouped = rows.groupby(["month", "currency", "fx_source"], observed=True)["amount"].agg(["size", "sum"])
+            frames.append(grouped.reset_index().assign(ledger=name))
+    if not frames:
+        return pd.DataFrame(columns=["ledger", "month", "currency", "source", "rows", "amount"])
+    report = pd.concat(frames, ignore_index=True).rename(columns={"fx_source": "source", "size": "rows", "sum": "amount"})
+    report["month"] = [str(pd.Period(ordinal=int(m), freq="M")) for m in report["month"]]
+    report["currency"] = report["currency"].astype(str)
+    report["source"] = report["source"].astype(str)
+    return report[["ledger", "month", "currency", "source", "rows", "amount"]]
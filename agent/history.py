@@ -0,0 +1,94 @@
+import os
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+HISTORY_TURNS = int(os.environ.get("FINAI_HISTORY_TURNS", "6"))
+HISTORY_TOKENS = int(os.environ.get("FINAI_HISTORY_TOKENS", "3000"))
+SUMMARY_CHARS = 2000
+
+SUMMARY_PROMPT = """You maintain the running summary of a conversation between a CFO and a financial analytics assistant.
+Update the summary with the new exchanges below. Keep every figure, period, entity and metric that was discussed,
+plus any open question or stated preference. Reply with the summary only, in at most 150 words.
+
+Current summary:
+{summary}
+
+New exchanges:
+{exchanges}"""
+
+
+def count_tokens(text: str) -> int:
+    """Rough token estimate (about 4 characters per token); good enough for budgeting."""
+    return len(text) // 4 + 1
+
+
+def _transcript(turns) -> str:
+    return "\n".join(f"User: {question}\nAssistant: {answer}" for question, answer, _ in turns)
+
+
+def extractive_summarizer(summary: str, turns) -> str:
+    """Model-free fallback: append the folded exchanges and keep the most recent SUMMARY_CHARS."""
+    text = "\n".join(filter(None, [summary, _transcript(turns)]))
+    return text[-SUMMARY_CHARS:]
+
+
+def llm_summarizer(llm):
+    """Summarizer that asks `llm` to fold older exchanges into the running summary."""
+    def summarize(summary: str, turns) -> str:
+        try:
+            message = llm.invoke(SUMMARY_PROMPT.format(summary=summary or "(none)", exchanges=_transcript(turns)))
+            return message.content.strip() or extractive_summarizer(summary, turns)
+        except Exception:
+            return extractive_summarizer(summary, turns)
+    return summarize
+
+
+class ChatHistory:
+    """
+    Token-budgeted conversation memory for the agent prompt.
+
+    The last `max_turns` question/answer pairs are kept verbatim as long as
+    they fit in `max_tokens`; older turns are folded into a running summary
+    by `summarize(summary, turns)`. The message objects are built once per
+    turn and reused, so a turn costs O(window) rather than O(session).
+    """
+
+    def __init__(self, max_turns: int = HISTORY_TURNS, max_tokens: int = HISTORY_TOKENS, summarize=None):
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+        self.summarize = summarize or extractive_summarizer
+        self.summary = ""
+        self.turns: list[tuple[str, str, int]] = []   # (question, answer, tokens)
+        self._messages: list[BaseMessage] | None = None
+
+    def add_turn(self, question: str, answer: str) -> None:
+        self.turns.append((question, answer, count_tokens(question) + count_tokens(answer)))
+        self._compact()
+
+    def _compact(self) -> None:
+        keep = len(self.turns)
+        tokens = sum(t[2] for t in self.turns)
+        # Always keep the latest turn verbatim, however long it is
+        while keep > 1 and (keep > self.max_turns or tokens > self.max_tokens):
+            tokens -= self.turns[len(self.turns) - keep][2]
+            keep -= 1
+
+        evicted = self.turns[:len(self.turns) - keep]
+        if evicted:
+            self.summary = self.summarize(self.summary, evicted)
+            self.turns = self.turns[len(evicted):]
+        self._messages = None
+
+    def messages(self) -> list[BaseMessage]:
+        """Messages for the `chat_history` prompt slot: summary first, then the recent turns."""
+        if self._messages is None:
+            messages = []
+            if self.summary:
+                messages.append(SystemMessage(content=f"Summary of the earlier conversation:\n{self.summary}"))
+            for question, answer, _ in self.turns:
+                messages += [HumanMessage(content=question), AIMessage(content=answer)]
+            self._messages = messages
+        return list(self._messages)
+
+    def tokens(self) -> int:
+        return count_tokens(self.summary) + sum(t[2] for t in self.turns)
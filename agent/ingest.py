@@ -0,0 +1,158 @@
+import hashlib
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow.parquet as parquet
+except ImportError:  # CSV exports still work without pyarrow
+    parquet = None
+
+# Rows read per chunk: peak memory scales with this, not with the ledger size
+CHUNK_ROWS = int(os.environ.get("FINAI_CHUNK_ROWS", "250000"))
+
+LEDGER_KEYS = ["month", "entity", "account_category", "currency"]
+COLUMNS = {
+    "actuals": ["month", "entity", "account_category", "amount", "currency"],
+    "budget": ["month", "entity", "account_category", "amount", "currency"],
+    "cash": ["month", "entity", "cash_usd"],
+    "fx": ["month", "currency", "rate_to_usd"],
+}
+SUFFIXES = (".csv", ".csv.gz", ".parquet")
+
+
+def _is_export(path: Path) -> bool:
+    return path.is_file() and path.name.lower().endswith(SUFFIXES)
+
+
+def export_files(root: Path | str, sheet: str) -> list[Path]:
+    """
+    Files holding one sheet of a ledger export directory, in name order.
+
+    A sheet is either a single file (`actuals.csv`, `actuals.parquet`), a set
+    of parts (`actuals-0001.csv`, `actuals_2025.parquet`, ...) or a
+    subdirectory of parts (`actuals/*.parquet`).
+    """
+    root = Path(root)
+    files = [p for p in root.glob(f"{sheet}*") if _is_export(p)]
+    if (root / sheet).is_dir():
+        files += [p for p in (root / sheet).iterdir() if _is_export(p)]
+    return sorted(files)
+
+
+def export_stats(root: Path | str) -> tuple:
+    """(relative path, mtime, size) of every export file, in a stable order."""
+    root = Path(root)
+    stats = []
+    for sheet in COLUMNS:
+        for path in export_files(root, sheet):
+            stat = path.stat()
+            stats.append((str(path.relative_to(root)), stat.st_mtime_ns, stat.st_size))
+    return tuple(stats)
+
+
+def source_key(root: Path | str) -> str:
+    """
+    Snapshot key for an export directory: the name, mtime and size of every
+    file in it. Raw exports can be gigabytes, so unlike `workbook_key` the
+    bytes themselves are not hashed.
+    """
+    digest = hashlib.sha1()
+    for name, mtime, size in export_stats(root):
+        digest.update(f"{name}:{mtime}:{size}\n".encode())
+    return digest.hexdigest()[:16]
+
+
+def added_files(root: Path | str, before: tuple, after: tuple) -> list[Path] | None:
+    """
+    Export files in `after` but not in `before` (both from `export_stats`),
+    or None when any earlier file changed or went away, i.e. when the new
+    files are not a pure append.
+    """
+    known = set(before)
+    if not known <= set(after):
+        return None
+    return [Path(root) / entry[0] for entry in after if entry not in known]
+
+
+def iter_chunks(path: Path, columns: list[str], chunksize: int = CHUNK_ROWS):
+    """Yield DataFrames of at most `chunksize` rows with `columns` from a CSV or Parquet file."""
+    if path.name.lower().endswith(".parquet"):
+        if parquet is None:
+            raise ImportError(f"Reading {path.name} requires pyarrow")
+        for batch in parquet.ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    else:
+        # Text columns stay strings; only the numeric ones are parsed
+        dtypes = {c: "string" for c in columns if c in LEDGER_KEYS}
+        yield from pd.read_csv(path, usecols=columns, dtype=dtypes, chunksize=chunksize)
+
+
+def month_start(values: pd.Series) -> pd.Series:
+    """
+    Month of each value (dates, "YYYY-MM" strings, timestamps) as the
+    first-of-month timestamp. Each distinct value is parsed once: a chunk of
+    posting dates has far fewer distinct values than rows.
+    """
+    codes, uniques = pd.factorize(values)
+    months = pd.to_datetime(pd.Series(uniques)).dt.to_period("M").dt.to_timestamp()
+    return pd.Series(months.to_numpy()[codes], index=values.index, name=values.name)
+
+
+def aggregate_ledger(chunks, columns: list[str] = COLUMNS["actuals"]) -> pd.DataFrame:
+    """
+    Sum `amount` over (month, entity, account_category, currency) across `chunks`.
+
+    Each chunk is reduced as soon as it is read and folded into a running
+    total, so only one chunk and the aggregate are in memory at a time. The
+    result has the workbook sheet layout, one row per key. Currency stays in
+    the key: USD conversion is per (month, currency), so converting the
+    aggregate gives the same totals as converting every row.
+    """
+    total = None
+    for chunk in chunks:
+        chunk = chunk.assign(month=month_start(chunk["month"]))
+        partial = chunk.groupby(LEDGER_KEYS, sort=False, observed=True)["amount"].sum()
+        total = partial if total is None else total.add(partial, fill_value=0)
+    if total is None:
+        return pd.DataFrame({c: pd.Series(dtype="float64" if c == "amount" else object) for c in columns})
+    return total.sort_index().reset_index()[columns]
+
+
+def read_export(root: Path | str, chunksize: int = CHUNK_ROWS, files: list[Path] | None = None) -> dict[str, pd.DataFrame]:
+    """
+    Read a ledger export directory into the actuals / budget / cash / fx sheets.
+
+    The actuals and budget ledgers are streamed in chunks and aggregated to
+    the month × entity × account_category × currency level the metrics use;
+    the cash and fx sheets are small and read as they are. With `files`,
+    only those files are read (a delta, see `added_files`), and sheets
+    without any of them come back empty.
+    """
+    root = Path(root)
+    sheets = {}
+    for sheet, columns in COLUMNS.items():
+        paths = export_files(root, sheet)
+        if files is not None:
+            paths = [p for p in paths if p in files]
+            if not paths:
+                sheets[sheet] = aggregate_ledger([], columns)
+                continue
+        if not paths:
+            raise FileNotFoundError(f"No {sheet} files ({', '.join(SUFFIXES)}) in {root}")
+        chunks = (chunk for path in paths for chunk in iter_chunks(path, columns, chunksize))
+        if sheet in ("actuals", "budget"):
+            sheets[sheet] = aggregate_ledger(chunks, columns)
+        else:
+            frame = pd.concat(list(chunks), ignore_index=True)[columns]
+            sheets[sheet] = frame.assign(month=month_start(frame["month"]))
+    # Feather snapshots want plain column types
+    for frame in sheets.values():
+        for column in frame.columns:
+            if isinstance(frame[column].dtype, pd.StringDtype):
+                frame[column] = frame[column].astype(object)
+        if "amount" in frame:
+            frame["amount"] = frame["amount"].astype(np.float64)
+    return sheets
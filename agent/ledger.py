@@ -0,0 +1,246 @@
+import copy
+
+import numpy as np
+import pandas as pd
+
+from .fx import SOURCES, FxTable, month_ordinals
+
+# Entity names meaning "all entities" (the cash sheet reports a Consolidated balance)
+CONSOLIDATED = frozenset({"consolidated", "all", "total", "group"})
+
+
+def month_ordinal(month) -> int:
+    """Integer period ordinal of a "YYYY-MM" string (or Period/Timestamp)."""
+    return pd.Period(month, freq="M").ordinal
+
+
+def normalize_entity(entity) -> str | None:
+    """Canonical spelling of an entity filter: stripped, None for consolidated."""
+    if entity is None or str(entity).strip().lower() in CONSOLIDATED:
+        return None
+    return str(entity).strip()
+
+
+def normalize_month(month) -> str:
+    """Canonical "YYYY-MM" spelling of a month ("2025-1", "2025-01-15", ... -> "2025-01")."""
+    return str(pd.Period(month, freq="M"))
+
+
+def ordinal_to_month(ordinal: int) -> str:
+    """Inverse of `month_ordinal`, formatted as "YYYY-MM"."""
+    return str(pd.Period(ordinal=int(ordinal), freq="M"))
+
+
+def build_usd_ledger(df: pd.DataFrame, fx) -> pd.DataFrame:
+    """
+    Convert a ledger sheet (actuals / budget) to USD once, at load time.
+
+    `fx` is an `FxTable` (or the fx sheet, to build one). The result keeps
+    one row per input row with:
+      month            int64 period ordinal (see `month_ordinal`)
+      entity           categorical
+      account_category categorical
+      currency         categorical
+      amount           original amount
+      amount_usd       amount converted at the month's rate, as-of the latest
+                       earlier rate when it has none (NaN if the currency has no rate)
+      fx_source        categorical "exact" / "carried" / "missing" (see `fx.SOURCES`)
+      is_opex          True for "Opex:*" categories
+    """
+    if not isinstance(fx, FxTable):
+        fx = FxTable(fx)
+    months = month_ordinals(df["month"])
+    currency = df["currency"].astype("category")
+    amount_usd, _, source = fx.convert(df["amount"].to_numpy(dtype="float64"), months, currency)
+
+    ledger = pd.DataFrame({
+        "month": months,
+        "entity": df["entity"].astype("category").array,
+        "account_category": df["account_category"].astype("category").array,
+        "currency": currency.array,
+        "amount": df["amount"].to_numpy(dtype="float64"),
+        "amount_usd": amount_usd,
+        "fx_source": pd.Categorical.from_codes(source, categories=list(SOURCES)),
+    })
+    # Resolve the Opex prefix once per category instead of once per row
+    categories = ledger["account_category"].cat.categories
+    opex_codes = [i for i, c in enumerate(categories) if str(c).startswith("Opex")]
+    ledger["is_opex"] = ledger["account_category"].cat.codes.isin(opex_codes).to_numpy()
+    return ledger
+
+
+class LedgerCube:
+    """
+    Pre-aggregated entity × account_category × month USD totals for the
+    actuals and budget ledgers, with prefix sums along the month axis.
+
+    Both ledgers share the same axes, so any inclusive month range total is
+    `cum[..., hi + 1] - cum[..., lo]` for either of them.
+    """
+
+    def __init__(self, actuals_usd: pd.DataFrame, budget_usd: pd.DataFrame):
+        ledgers = (actuals_usd, budget_usd)
+        self.entities = sorted(set().union(*(l["entity"].astype(str) for l in ledgers)))
+        self.categories = sorted(set().union(*(l["account_category"].astype(str) for l in ledgers)))
+        months = np.concatenate([l["month"].to_numpy() for l in ledgers])
+        self.first_month = int(months.min()) if len(months) else 0
+        self.n_months = int(months.max()) - self.first_month + 1 if len(months) else 0
+
+        self.revenue = self.categories.index("Revenue") if "Revenue" in self.categories else None
+        self.cogs = self.categories.index("COGS") if "COGS" in self.categories else None
+        self.opex = np.array([i for i, c in enumerate(self.categories) if c.startswith("Opex")], dtype=int)
+
+        self.actual, self.actual_count = self._aggregate(actuals_usd)
+        self.budget, self.budget_count = self._aggregate(budget_usd)
+        self.actual_cum = self._prefix(self.actual)
+        self.budget_cum = self._prefix(self.budget)
+        self.actual_count_cum = self._prefix(self.actual_count)
+
+        # Consolidated monthly P&L lines (one pivot over the cube, no per-month filtering)
+        (self.month_revenue, self.month_cogs, self.month_opex,
+         self.month_has_actuals) = self._monthly_lines(self.actual.sum(axis=0), self.actual_count.sum(axis=0))
+        self.month_labels = [ordinal_to_month(self.first_month + i) for i in range(self.n_months)]
+
+    def _aggregate(self, ledger: pd.DataFrame) -> tuple[np.ndarray, np.ndarray]:
+        shape = (len(self.entities), len(self.categories), self.n_months)
+        values = np.zeros(shape)
+        counts = np.zeros(shape, dtype=np.int64)
+        self._accumulate(values, counts, ledger)
+        return values, counts
+
+    def _accumulate(self, values: np.ndarray, counts: np.ndarray, ledger: pd.DataFrame, sign: int = 1) -> None:
+        # Rows in a currency without any fx rate (amount_usd NaN) are left out
+        # rather than counted as USD; `fx.fallback_report` lists them
+        ledger = ledger[ledger["amount_usd"].notna().to_numpy()]
+        e = pd.Index(self.entities).get_indexer(ledger["entity"].astype(str))
+        c = pd.Index(self.categories).get_indexer(ledger["account_category"].astype(str))
+        m = ledger["month"].to_numpy() - self.first_month
+        np.add.at(values, (e, c, m), sign * ledger["amount_usd"].to_numpy())
+        np.add.at(counts, (e, c, m), sign)
+
+    def apply_delta(self, added: tuple[pd.DataFrame, pd.DataFrame],
+                    removed: tuple[pd.DataFrame, pd.DataFrame] | None = None) -> "LedgerCube":
+        """
+        A new cube with `added` (actuals_usd, budget_usd) rows counted in and
+        `removed` rows (previously counted, e.g. a restated month) taken out.
+
+        Only the delta rows are aggregated, and prefix sums and monthly lines
+        are redone from the first touched month on; axes grow when the delta
+        brings new entities, categories or months. This cube is left as is.
+        """
+        removed = removed or tuple(l.iloc[:0] for l in added)
+        delta = [l for l in (*added, *removed) if len(l)]
+        cube = copy.copy(self)
+        if not delta:
+            return cube
+
+        entities = sorted(set(self.entities).union(*(l["entity"].astype(str) for l in delta)))
+        categories = sorted(set(self.categories).union(*(l["account_category"].astype(str) for l in delta)))
+        months = np.concatenate([l["month"].to_numpy() for l in delta])
+        first = min(int(months.min()), self.first_month) if self.n_months else int(months.min())
+        last = max(int(months.max()), self.first_month + self.n_months - 1)
+        cube.entities, cube.categories = entities, categories
+        cube.first_month, cube.n_months = first, last - first + 1
+        cube.revenue = categories.index("Revenue") if "Revenue" in categories else None
+        cube.cogs = categories.index("COGS") if "COGS" in categories else None
+        cube.opex = np.array([i for i, c in enumerate(categories) if c.startswith("Opex")], dtype=int)
+
+        # Existing totals placed on the (possibly wider) new axes
+        e = pd.Index(entities).get_indexer(self.entities)
+        c = pd.Index(categories).get_indexer(self.categories)
+        m = self.first_month - first
+        # The axes of a frozen cube are tuples (see `data.freeze`)
+        same_axes = entities == list(self.entities) and categories == list(self.categories)
+        resized = not same_axes or cube.n_months != self.n_months
+        # New entities / categories / earlier months shift existing cells; later months only append
+        shifted = not same_axes or first != self.first_month
+
+        def expand(old: np.ndarray) -> np.ndarray:
+            if not resized:
+                return old.copy()
+            new = np.zeros((len(entities), len(categories), cube.n_months), dtype=old.dtype)
+            new[e[:, None], c[None, :], m:m + self.n_months] = old
+            return new
+
+        cube.actual, cube.actual_count = expand(self.actual), expand(self.actual_count)
+        cube.budget, cube.budget_count = expand(self.budget), expand(self.budget_count)
+        for (values, counts), rows, sign in (
+            ((cube.actual, cube.actual_count), added[0], 1), ((cube.budget, cube.budget_count), added[1], 1),
+            ((cube.actual, cube.actual_count), removed[0], -1), ((cube.budget, cube.budget_count), removed[1], -1),
+        ):
+            if len(rows):
+                cube._accumulate(values, counts, rows, sign)
+
+        # Prefix sums and monthly lines before the first touched month are unchanged
+        lo = 0 if shifted else min(int(months.min()) - first, self.n_months)
+        cube.actual_cum = cube._extend_prefix(self.actual_cum, cube.actual, lo)
+        cube.budget_cum = cube._extend_prefix(self.budget_cum, cube.budget, lo)
+        cube.actual_count_cum = cube._extend_prefix(self.actual_count_cum, cube.actual_count, lo)
+
+        lines = cube._monthly_lines(cube.actual[:, :, lo:].sum(axis=0), cube.actual_count[:, :, lo:].sum(axis=0))
+        previous = (self.month_revenue, self.month_cogs, self.month_opex, self.month_has_actuals)
+        (cube.month_revenue, cube.month_cogs, cube.month_opex, cube.month_has_actuals) = (
+            np.concatenate([old[:lo], new]) for old, new in zip(previous, lines)
+        )
+        cube.month_labels = list(self.month_labels[:lo]) + [ordinal_to_month(first + i) for i in range(lo, cube.n_months)]
+        return cube
+
+    def _extend_prefix(self, old_cum: np.ndarray, values: np.ndarray, lo: int) -> np.ndarray:
+        if lo == 0:
+            return self._prefix(values)
+        cum = np.empty(values.shape[:-1] + (values.shape[-1] + 1,), dtype=values.dtype)
+        cum[..., :lo + 1] = old_cum[..., :lo + 1]
+        np.cumsum(values[..., lo:], axis=-1, out=cum[..., lo + 1:])
+        cum[..., lo + 1:] += cum[..., lo:lo + 1]
+        return cum
+
+    def _monthly_lines(self, monthly: np.ndarray, counts: np.ndarray) -> tuple[np.ndarray, ...]:
+        revenue = monthly[self.revenue] if self.revenue is not None else np.zeros(self.n_months)
+        cogs = monthly[self.cogs] if self.cogs is not None else np.zeros(self.n_months)
+        return revenue, cogs, monthly[self.opex].sum(axis=0), counts.sum(axis=0) > 0
+
+    def entity_index(self, entity: str | None) -> int | None:
+        """Index of `entity` (case-insensitive); None for all entities."""
+        entity = normalize_entity(entity)
+        if entity is None:
+            return None
+        for i, name in enumerate(self.entities):
+            if name.lower() == entity.lower():
+                return i
+        raise ValueError(f"Unknown entity {entity!r}; use one of {list(self.entities)}")
+
+    def monthly_lines(self, entity: str | None = None) -> tuple[np.ndarray, ...]:
+        """Monthly (revenue, cogs, opex, has_actuals) for one entity, or consolidated."""
+        e = self.entity_index(entity)
+        if e is None:
+            return self.month_revenue, self.month_cogs, self.month_opex, self.month_has_actuals
+        return self._monthly_lines(self.actual[e], self.actual_count[e])
+
+    @staticmethod
+    def _prefix(values: np.ndarray) -> np.ndarray:
+        cum = np.zeros(values.shape[:-1] + (values.shape[-1] + 1,), dtype=values.dtype)
+        np.cumsum(values, axis=-1, out=cum[..., 1:])
+        return cum
+
+    def month_slice(self, start_month, end_month) -> tuple[int, int]:
+        """Clip an inclusive month range to cube indices, as a half-open [lo, hi)."""
+        lo = month_ordinal(start_month) - self.first_month
+        hi = month_ordinal(end_month) - self.first_month + 1
+        lo = min(max(lo, 0), self.n_months)
+        hi = min(max(hi, lo), self.n_months)
+        return lo, hi
+
+    def range_total(self, cum: np.ndarray, start_month, end_month) -> np.ndarray:
+        """Entity × category totals over an inclusive month range."""
+        lo, hi = self.month_slice(start_month, end_month)
+        return cum[..., hi] - cum[..., lo]
+
+    def category_totals(self, cum: np.ndarray, start_month, end_month, entity: str | None = None) -> np.ndarray:
+        """Per-category totals over an inclusive month range for one entity, or summed across entities."""
+        totals = self.range_total(cum, start_month, end_month)
+        e = self.entity_index(entity)
+        return totals.sum(axis=0) if e is None else totals[e]
+
+    def category_total(self, totals: np.ndarray, index) -> float:
+        """Total for one category index (None when the category is absent)."""
+        return float(totals[index]) if index is not None else 0.0
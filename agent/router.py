@@ -0,0 +1,301 @@
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterator
+
+import pandas as pd
+from langchain_core.agents import AgentAction
+from langchain_core.prompts import ChatPromptTemplate
+
+from . import data, tracing, utils
+from .cache import ResponseCache
+
+FAST_PATH = os.environ.get("FINAI_FAST_PATH", "1") != "0"
+
+# utils function -> (pattern on the lowercased question, tool name reported to the UI)
+INTENTS = {
+    "revenue_variance": (re.compile(r"revenue\s+variance|budget\s+variance|revenue\s+(?:vs\.?|versus|against)\s+budget"),
+                         "get_revenue_variance"),
+    "gross_margin_pct": (re.compile(r"gross\s+margin"), "get_gross_margin_pct"),
+    "opex_breakdown": (re.compile(r"\bopex\b|operating\s+expenses?"), "get_opex_breakdown"),
+    "ebitda_proxy": (re.compile(r"\bebitda\b"), "get_ebitda_proxy"),
+    "cash_runway": (re.compile(r"\brunway\b"), "get_cash_runway"),
+}
+
+# Anything that asks for more than a single metric over a single period goes to the agent
+AGENT_ONLY = re.compile(
+    r"\b(?:chart|plot|graph|visuali[sz]e|draw|compare|comparison|trend|monthly|quarterly|month\s+by\s+month|"
+    r"by\s+(?:month|quarter|year|entity)|each|per|why|explain|forecast|scenario|what\s+if|code|python)\b"
+)
+# Follow-ups whose meaning depends on the conversation so far
+REFERENCES = re.compile(
+    r"\b(?:that|same|those|these|it|its|previous|above|again|instead)\b|^\s*(?:and|also|what\s+about|how\s+about)\b"
+)
+# Words that change what the routed call would compute (exclusions, ratios, other
+# scenarios or currencies, parts of a period): the agent handles those
+MODIFIERS = re.compile(
+    r"\b(?:not|no|non|without|excluding|excludes?|except|minus|less|other\s+than|"
+    r"margin|projected|projections?|target|"
+    r"eur|euros?|gbp|pounds?|sterling|jpy|yen|inr|rupees?|cad|aud|chf|cny|currenc(?:y|ies)|"
+    r"h[12]|halfs?|halves|semesters?|first|second|partial|mid|early|late|beginning|start|end|weeks?|days?|quarter)\b"
+    r"|[€£¥]"
+)
+# Budget figures instead of actuals; only revenue_variance compares against the budget
+BUDGET = re.compile(r"\b(?:budget(?:s|ed)?|plan(?:s|ned)?)\b")
+
+MONTHS = {
+    name: number
+    for number, names in enumerate([
+        ("january", "jan"), ("february", "feb"), ("march", "mar"), ("april", "apr"), ("may",),
+        ("june", "jun"), ("july", "jul"), ("august", "aug"), ("september", "sept", "sep"),
+        ("october", "oct"), ("november", "nov"), ("december", "dec"),
+    ], start=1)
+    for name in names
+}
+_MONTH = "|".join(sorted(MONTHS, key=len, reverse=True))
+_FULL_MONTH = "|".join(name for name in MONTHS if len(name) > 3 and name != "sept")
+_NUMBERS = {"one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "nine": 9, "twelve": 12}
+
+# (pattern, kind) in priority order; each match is masked before the next pattern runs
+PERIOD_PATTERNS = [
+    (re.compile(r"\b(20\d\d)-(0[1-9]|1[0-2])\b"), "iso"),
+    (re.compile(rf"\b({_MONTH})\.?\s*['’]\s*(\d\d)\b"), "month_short_year"),
+    (re.compile(rf"\b({_MONTH})\.?,?\s+(20\d\d)\b"), "month_year"),
+    (re.compile(r"\bq([1-4])\s*['’]?\s*(20\d\d|\d\d)\b"), "quarter"),
+    (re.compile(r"\b(20\d\d)\s*q([1-4])\b"), "year_quarter"),
+    (re.compile(r"\b(?:this|current)\s+year\b|\bytd\b|\byear[\s-]+to[\s-]+date\b"), "this_year"),
+    (re.compile(r"\blast\s+(\d+|" + "|".join(_NUMBERS) + r")\s+months?\b"), "last_n_months"),
+    (re.compile(r"\blast\s+month\b"), "last_month"),
+    (re.compile(r"\b(?:fy\s*)?(20\d\d)\b"), "year"),
+    (re.compile(rf"\b({_FULL_MONTH})\b"), "month"),
+]
+RANGE_JOINER = re.compile(r"\s*(?:to|through|thru|until|till|-|–)\s*")
+# Period-like text left over once the patterns above are masked out: a month
+# name (e.g. "may", which is not a bare-month pattern), a malformed "2025-13",
+# or a range joiner right next to a period whose other end was not understood
+UNPARSED = re.compile(rf"\b(?:{_MONTH})\b|\b\d{{4}}\s*[-/]\s*\d{{1,2}}\b")
+_JOINER_AFTER = re.compile(r"\s*(?:(?:to|through|thru|until|till)\b|[-–])")
+_JOINER_BEFORE = re.compile(r"(?:\b(?:to|through|thru|until|till)|[-–])\s*$")
+
+PHRASE_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """You are the Smart Financial Analytics Agent answering the CFO of the company.
+    A finance tool was already called for the question; phrase its result.
+    - Lead with the direct answer/figures (USD, thousands separators, percentages with one decimal).
+    - Give a short interpretation (context, implications).
+    - Keep it concise and do not invent figures that are not in the result."""),
+    ("human", "Question: {question}\nTool: {tool}({args})\nResult: {result}"),
+])
+
+
+@dataclass(frozen=True)
+class Route:
+    """A question the router can answer with one direct `utils` call."""
+
+    intent: str
+    tool: str
+    args: dict = field(default_factory=dict)
+
+    def call(self):
+        return getattr(utils, self.intent)(**self.args)
+
+
+def _latest_month() -> pd.Period:
+    cube = data.get_dataset().cube
+    months = [m for m, has in zip(cube.month_labels, cube.month_has_actuals) if has]
+    return pd.Period(months[-1] if months else cube.month_labels[-1], freq="M")
+
+
+def _year(text: str) -> int:
+    return int(text) if len(text) == 4 else 2000 + int(text)
+
+
+def parse_periods(question: str, latest: pd.Period | None = None) -> list[tuple[pd.Period, pd.Period]]:
+    """
+    Inclusive (start, end) month periods mentioned in `question`, in order of appearance.
+
+    Understands "2025-06", "June 2025", "Jun'25", "Q2 2025", "2025", "this year",
+    "last 3 months", "last month" and bare month names (mapped to the latest
+    year); "June to August 2025" style ranges are merged into one period.
+    """
+    return [(start, end) for _, _, start, end, _ in _find_periods(question, latest or _latest_month())]
+
+
+def _find_periods(question: str, latest: pd.Period) -> list[tuple]:
+    text = question.lower()
+    found = []   # (position, end position, start, end, has_year)
+
+    for pattern, kind in PERIOD_PATTERNS:
+        for match in pattern.finditer(text):
+            groups = match.groups()
+            if kind == "iso":
+                start = end = pd.Period(year=int(groups[0]), month=int(groups[1]), freq="M")
+            elif kind in ("month_short_year", "month_year"):
+                start = end = pd.Period(year=_year(groups[1]), month=MONTHS[groups[0]], freq="M")
+            elif kind in ("quarter", "year_quarter"):
+                quarter, year = (groups[0], groups[1]) if kind == "quarter" else (groups[1], groups[0])
+                start = pd.Period(year=_year(year), month=3 * int(quarter) - 2, freq="M")
+                end = start + 2
+            elif kind == "this_year":
+                start, end = pd.Period(year=latest.year, month=1, freq="M"), latest
+            elif kind == "last_n_months":
+                n = int(groups[0]) if groups[0].isdigit() else _NUMBERS[groups[0]]
+                start, end = latest - (n - 1), latest
+            elif kind == "last_month":
+                start = end = latest
+            elif kind == "year":
+                start = pd.Period(year=int(groups[0]), month=1, freq="M")
+                end = start + 11
+            else:
+                start = end = pd.Period(year=latest.year, month=MONTHS[groups[0]], freq="M")
+            found.append((match.start(), match.end(), start, end, kind != "month"))
+            text = text[:match.start()] + " " * (match.end() - match.start()) + text[match.end():]
+
+    found.sort(key=lambda item: item[0])
+    periods = []
+    for item in found:
+        joiner = question[periods[-1][1]:item[0]].lower() if periods else None
+        if joiner is not None and (
+            RANGE_JOINER.fullmatch(joiner)
+            # "between X and Y" is a range, "X and Y" on its own is two periods
+            or (joiner.strip() == "and" and question[:periods[-1][0]].lower().rstrip().endswith("between"))
+        ):
+            # "June to August 2025": the bare first month takes the year of the second
+            previous = periods.pop()
+            start = previous[2] if previous[4] else pd.Period(year=item[3].year, month=previous[2].month, freq="M")
+            item = (previous[0], item[1], start, item[3], True)
+        periods.append(item)
+    return periods
+
+
+def _mask_periods(text: str, periods: list[tuple]) -> str:
+    for position, end_position, *_ in periods:
+        text = text[:position] + " " * (end_position - position) + text[end_position:]
+    return text
+
+
+def _has_unparsed_period(question: str, periods: list[tuple]) -> bool:
+    """True when `question` mentions a period (or half a range) that `_find_periods` did not understand."""
+    text = _mask_periods(question.lower(), periods)
+    if UNPARSED.search(text):
+        return True
+    return any(
+        _JOINER_BEFORE.search(text[:position]) or _JOINER_AFTER.match(text, end_position)
+        for position, end_position, *_ in periods
+    )
+
+
+def route(question: str, latest: pd.Period | None = None) -> Route | None:
+    """
+    Map a question onto a single tool call, or return None when the agent
+    should handle it (several or no metrics, several periods or entities,
+    periods it cannot fully parse, exclusions and other modifiers the call
+    cannot express, charts, follow-ups that refer back to the conversation,
+    ...).
+    """
+    text = question.lower()
+    intents = [name for name, (pattern, _) in INTENTS.items() if pattern.search(text)]
+    if len(intents) != 1 or AGENT_ONLY.search(text) or REFERENCES.search(text):
+        return None
+    entities = [e for e in data.get_dataset().cube.entities if re.search(rf"\b{re.escape(e.lower())}\b", text)]
+    if len(entities) > 1:
+        return None
+
+    latest = latest or _latest_month()
+    found = _find_periods(question, latest)
+    # A confident answer for half a range or a misread month is worse than asking the agent
+    if len(found) > 1 or _has_unparsed_period(question, found):
+        return None
+    intent = intents[0]
+    rest = INTENTS[intent][0].sub(" ", _mask_periods(text, found))
+    if MODIFIERS.search(rest) or (intent != "revenue_variance" and BUDGET.search(rest)):
+        return None
+    start, end = found[0][2:4] if found else (None, None)
+    if start is not None:
+        labels = data.get_dataset().cube.month_labels
+        # Out-of-range periods need a clarification, which is the agent's job
+        if end < pd.Period(labels[0], freq="M") or start > pd.Period(labels[-1], freq="M"):
+            return None
+
+    tool = INTENTS[intent][1]
+    if intent == "cash_runway":
+        match = re.search(r"\blast\s+(\d+|" + "|".join(_NUMBERS) + r")\s+months?\b", text)
+        if match:   # "runway on the last 6 months' burn": the averaging window, as of the latest month
+            n = match.group(1)
+            args = {"last_n_months": int(n) if n.isdigit() else _NUMBERS[n]}
+        else:
+            args = {"as_of_month": str(min(end, latest))} if end is not None else {}
+    elif start is None:
+        return None
+    else:
+        args = {"start_month": str(start), "end_month": str(end)}
+    if entities:
+        args["entity"] = entities[0]
+    return Route(intent, tool, args)
+
+
+def question_key(question: str) -> tuple | None:
+    """
+    Canonical form of a question for the response cache: the routed call,
+    so equivalent phrasings share an entry. None for anything the router
+    does not fully understand (see `route`), since two such questions can
+    extract the same arguments and still mean different things.
+    """
+    if REFERENCES.search(question.lower()):
+        return None
+    routed = route(question)
+    if routed is None:
+        return None
+    return ("route", routed.intent, tuple(sorted(routed.args.items())))
+
+
+# Whole answers (text plus intermediate steps, including chart artifacts) for repeated questions
+response_cache = ResponseCache(
+    version=data.current_version,
+    key=question_key,
+    maxsize=int(os.environ.get("FINAI_RESPONSE_CACHE_SIZE", "256")),
+    ttl=float(os.environ.get("FINAI_RESPONSE_CACHE_TTL", "3600")),
+)
+data.registry.on_reload(lambda name, dataset: response_cache.clear())
+
+
+def resolve(question: str):
+    """`(route, result)` for a question the fast path can answer, else None."""
+    if not FAST_PATH:
+        return None
+    try:
+        routed = route(question)
+        if routed is None:
+            return None
+        with tracing.span(f"tool:{routed.tool}", "tool", fast_path=True):
+            return routed, routed.call()
+    except Exception:
+        return None   # the agent gets a chance to do better
+
+
+async def astream_answer(routed: Route, result, question: str, llm, callbacks=None) -> AsyncIterator[dict]:
+    """
+    Phrase a fast-path result with one model call, yielding the same events
+    as `streaming.astream_turn` so the UI handles both paths alike.
+    """
+    started = time.perf_counter()
+    first_token_at = None
+    yield {"type": "tool_start", "name": routed.tool, "input": routed.args, "run_id": routed.tool}
+    yield {"type": "tool_end", "name": routed.tool, "output": result, "run_id": routed.tool}
+
+    text = ""
+    messages = PHRASE_PROMPT.format_messages(question=question, tool=routed.tool, args=routed.args, result=result)
+    async for chunk in llm.astream(messages, config={"callbacks": callbacks} if callbacks else None):
+        if isinstance(chunk.content, str) and chunk.content:
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+            text += chunk.content
+            yield {"type": "token", "text": chunk.content}
+
+    action = AgentAction(tool=routed.tool, tool_input=routed.args, log="fast path")
+    yield {
+        "type": "final",
+        "output": {"input": question, "output": text, "intermediate_steps": [(action, result)]},
+        "ttft": first_token_at - started if first_token_at is not None else None,
+        "elapsed": time.perf_counter() - started,
+    }
@@ -0,0 +1,209 @@
+import contextvars
+import io
+import math
+import multiprocessing
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import redirect_stderr, redirect_stdout
+
+try:
+    import resource
+except ImportError:  # not available on Windows: run without CPU/memory limits
+    resource = None
+
+from . import data
+
+SANDBOX_WORKERS = int(os.environ.get("FINAI_SANDBOX_WORKERS", "2"))
+SANDBOX_TIMEOUT = float(os.environ.get("FINAI_SANDBOX_TIMEOUT", "30"))
+SANDBOX_CPU_SECONDS = int(os.environ.get("FINAI_SANDBOX_CPU_SECONDS", "20"))
+SANDBOX_MEMORY_MB = int(os.environ.get("FINAI_SANDBOX_MEMORY_MB", "2048"))
+SESSION_NAMESPACES = 32
+
+# Which chat session a code_analysis call belongs to (set by the app per session)
+session_id = contextvars.ContextVar("finai_session_id", default="default")
+
+
+def _sanitize(code: str) -> str:
+    # Same clean-up PythonREPLTool applies: drop surrounding whitespace and ``` fences
+    code = code.strip().removeprefix("```python").removeprefix("```py").removeprefix("```")
+    return code.removesuffix("```").strip()
+
+
+class SandboxPool:
+    """
+    Pre-warmed worker processes for `code_analysis` snippets.
+
+    Each worker imports pandas / numpy / matplotlib (Agg) once and keeps the
+    ledger sheets of the dataset versions it has been sent, keyed on
+    (tenant, version), so snippets find `actuals`, `budget`, `cash`, `fx`,
+    `pd`, `np` and `plt` ready to use and see appended months as soon as the
+    store publishes them. A session is pinned to one worker and keeps its own
+    namespace there between calls. A worker runs one snippet at a time under
+    a wall-clock timeout that starts when the snippet starts, plus CPU and
+    address-space limits; a worker that overruns or dies is killed and
+    replaced without affecting others.
+    """
+
+    def __init__(self, workers: int = SANDBOX_WORKERS, timeout: float = SANDBOX_TIMEOUT,
+                 cpu_seconds: int = SANDBOX_CPU_SECONDS, memory_mb: int = SANDBOX_MEMORY_MB, store=None):
+        self.workers = workers
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.store = store
+        self._executors: list[ProcessPoolExecutor | None] = [None] * workers
+        self._warming: list[Future | None] = [None] * workers
+        self._slots = [threading.Lock() for _ in range(workers)]
+        self._lock = threading.Lock()
+
+    def _executor(self, index: int) -> ProcessPoolExecutor:
+        with self._lock:
+            executor = self._executors[index]
+            if executor is None:
+                # spawn, not fork: the app process is multi-threaded
+                executor = ProcessPoolExecutor(
+                    max_workers=1,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.memory_mb,),
+                )
+                self._executors[index] = executor
+            return executor
+
+    def _discard(self, index: int, executor: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._executors[index] is executor:
+                self._executors[index] = None
+                self._warming[index] = None
+        # A stuck worker will not exit on request; terminate its process directly
+        for process in list(getattr(executor, "_processes", {}).values()):
+            process.kill()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _dataset(self):
+        """(cache key, dataset) of the current request: the worker cache is keyed on (tenant, version)."""
+        dataset = self.store.current() if self.store else data.get_dataset()
+        return (data.tenant.get(), dataset.version), dataset
+
+    def start(self) -> None:
+        """Spawn every worker and send it the current ledger, in the background."""
+        version, dataset = self._dataset()
+        sheets = _sheets(dataset)
+        for index in range(self.workers):
+            self._warming[index] = self._executor(index).submit(_load, version, sheets)
+
+    def run(self, code: str) -> str:
+        """Execute a snippet for the current `session_id` and return its printed output."""
+        session = session_id.get()
+        version, dataset = self._dataset()
+        code = _sanitize(code)
+        index = zlib.crc32(session.encode()) % self.workers
+
+        # One snippet per worker at a time: waiting for another session's snippet
+        # does not count against this one's timeout, and a timeout only ever
+        # stops the snippet that overran
+        with self._slots[index]:
+            executor = self._executor(index)
+            warming, self._warming[index] = self._warming[index], None
+            if warming is not None:
+                wait([warming])
+            try:
+                output = executor.submit(_execute, session, code, version, None, self.cpu_seconds).result(
+                    timeout=self.timeout)
+                if output is None:   # the worker does not have this version yet
+                    output = executor.submit(_execute, session, code, version, _sheets(dataset),
+                                             self.cpu_seconds).result(timeout=self.timeout)
+                return output
+            except FutureTimeoutError:
+                self._discard(index, executor)
+                return f"TimeoutError: code did not finish within {self.timeout:g}s and was stopped."
+            except BrokenProcessPool:
+                self._discard(index, executor)
+                return "ResourceLimitExceeded: the code exceeded the sandbox CPU or memory limits and was stopped."
+
+    def shutdown(self) -> None:
+        for index, executor in enumerate(self._executors):
+            if executor is not None:
+                self._discard(index, executor)
+
+
+def _sheets(dataset) -> dict:
+    return {sheet: getattr(dataset, sheet) for sheet in data.SHEETS}
+
+
+# ── worker process side ───────────────────────────────────────────────
+_worker = {}
+WORKER_DATASETS = 2   # dataset versions kept per worker (e.g. two tenants, or a version and its successor)
+
+
+def _init_worker(memory_mb: int) -> None:
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import numpy as np
+    import pandas as pd
+
+    if resource is not None and memory_mb:
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        resource.setrlimit(resource.RLIMIT_AS, (memory_mb << 20, hard))
+    _worker.update(modules={"pd": pd, "np": np, "plt": plt}, datasets=OrderedDict(), namespaces=OrderedDict())
+
+
+def _load(version: tuple, sheets: dict) -> None:
+    datasets = _worker["datasets"]
+    datasets[version] = sheets
+    datasets.move_to_end(version)
+    while len(datasets) > WORKER_DATASETS:
+        old, _ = datasets.popitem(last=False)
+        for name in [n for n, (v, _) in _worker["namespaces"].items() if v == old]:
+            del _worker["namespaces"][name]
+
+
+def _namespace(session: str, version: tuple, sheets: dict) -> dict:
+    namespaces = _worker["namespaces"]
+    name = (version[0], session)
+    entry = namespaces.get(name)
+    if entry is None or entry[0] != version:
+        # A new version of the tenant's data starts the session over on it
+        namespaces[name] = entry = (version, {
+            "__name__": "__main__",
+            **_worker["modules"],
+            # copies: one session's edits must not leak into another's
+            **{sheet: frame.copy() for sheet, frame in sheets.items()},
+        })
+        while len(namespaces) > SESSION_NAMESPACES:
+            namespaces.popitem(last=False)
+    namespaces.move_to_end(name)
+    return entry[1]
+
+
+def _execute(session: str, code: str, version: tuple, sheets: dict | None, cpu_seconds: int) -> str | None:
+    if sheets is not None:
+        _load(version, sheets)
+    sheets = _worker["datasets"].get(version)
+    if sheets is None:
+        return None   # the pool resends the call with the sheets of this version
+    _worker["datasets"].move_to_end(version)
+    namespace = _namespace(session, version, sheets)
+
+    if resource is not None and cpu_seconds:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        resource.setrlimit(resource.RLIMIT_CPU, (math.ceil(usage.ru_utime + usage.ru_stime) + cpu_seconds, hard))
+
+    buffer = io.StringIO()
+    try:
+        with redirect_stdout(buffer), redirect_stderr(buffer):
+            exec(code, namespace)
+        return buffer.getvalue()
+    except (Exception, SystemExit) as e:
+        return buffer.getvalue() + repr(e)
+    finally:
+        _worker["modules"]["plt"].close("all")
+        if resource is not None and cpu_seconds:
+            resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
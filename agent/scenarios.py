@@ -0,0 +1,99 @@
+import math
+from dataclasses import dataclass
+
+import numpy as np
+
+# What-if drivers, all in percent:
+#   revenue_growth  monthly revenue growth (COGS moves with it)
+#   opex_change     one-off change of the monthly opex level
+#   fx_shock        change in the USD value of non-USD currencies (-10: they lose 10%)
+DRIVERS = ("revenue_growth", "opex_change", "fx_shock")
+PERCENTILES = (5, 25, 50, 75, 95)
+MAX_SCENARIOS = 100_000
+BLOCK = 4096   # scenarios projected at a time, bounding the (block × horizon) arrays
+
+
+@dataclass(frozen=True)
+class Baseline:
+    """Starting cash and average monthly P&L lines (USD) that scenarios are applied to."""
+
+    cash: float
+    revenue: float
+    cogs: float
+    opex: float
+    fx_share_revenue: float = 0.0   # share of each line booked in non-USD currencies
+    fx_share_cogs: float = 0.0
+    fx_share_opex: float = 0.0
+
+    @property
+    def burn(self) -> float:
+        return self.cogs + self.opex - self.revenue
+
+
+def scenario_grid(**drivers) -> dict[str, np.ndarray]:
+    """Every combination of the listed driver values (missing drivers are 0)."""
+    values = [np.atleast_1d(np.asarray(drivers.get(name, 0.0), dtype=float)).ravel() for name in DRIVERS]
+    # Check the size before building anything: a model-supplied grid can be huge
+    n = math.prod(len(v) for v in values)
+    if n > MAX_SCENARIOS:
+        raise ValueError(f"{n} scenarios; at most {MAX_SCENARIOS}")
+    # Same order as itertools.product: the last driver varies fastest
+    grids = np.meshgrid(*values, indexing="ij")
+    return {name: grid.ravel() for name, grid in zip(DRIVERS, grids)}
+
+
+def sample_scenarios(n: int, seed: int = 0, **drivers) -> dict[str, np.ndarray]:
+    """`n` scenarios drawing each driver uniformly between the min and max of its values."""
+    if not 0 < n <= MAX_SCENARIOS:
+        raise ValueError(f"samples must be between 1 and {MAX_SCENARIOS}")
+    rng = np.random.default_rng(seed)
+    sampled = {}
+    for name in DRIVERS:
+        values = np.atleast_1d(np.asarray(drivers.get(name, 0.0), dtype=float))
+        sampled[name] = rng.uniform(values.min(), values.max(), n)
+    return sampled
+
+
+def project_runway(baseline: Baseline, revenue_growth, opex_change, fx_shock, horizon: int = 120) -> np.ndarray:
+    """
+    Months of runway for each scenario (inf when cash outlasts `horizon`).
+
+    Drivers are parallel arrays in percent. Each scenario's monthly lines
+    are projected over the horizon as one (scenarios × months) array;
+    runway is the fractional month where cumulative burn exhausts the cash,
+    so with no change it equals cash / burn like `utils.cash_runway`.
+    """
+    growth, opex_change, fx = (np.asarray(a, dtype=float) / 100 for a in (revenue_growth, opex_change, fx_shock))
+    runway = np.empty(len(growth))
+    months = np.arange(1, horizon + 1)
+    for lo in range(0, len(growth), BLOCK):
+        g, o, f = (a[lo:lo + BLOCK, None] for a in (growth, opex_change, fx))
+        volume = (1 + g) ** (months - 1)
+        revenue = baseline.revenue * (1 + f * baseline.fx_share_revenue) * volume
+        cogs = baseline.cogs * (1 + f * baseline.fx_share_cogs) * volume
+        opex = baseline.opex * (1 + o) * (1 + f * baseline.fx_share_opex)
+        burn = cogs + opex - revenue
+        cash = baseline.cash - np.cumsum(burn, axis=1)
+
+        out = cash <= 0
+        hit = out.any(axis=1)
+        first = out.argmax(axis=1)
+        rows = np.arange(len(first))
+        before = np.where(first > 0, cash[rows, first - 1], baseline.cash)
+        month_burn = burn[rows, first]
+        fraction = np.divide(before, month_burn, out=np.zeros_like(before), where=month_burn > 0)
+        runway[lo:lo + BLOCK] = np.where(hit, first + np.clip(fraction, 0, 1), np.inf)
+    if baseline.cash <= 0:
+        runway[:] = 0.0
+    return runway
+
+
+def summarize(runway: np.ndarray, thresholds=(6, 12, 18, 24)) -> dict:
+    """Percentiles of a runway distribution and the share of scenarios below each threshold (months)."""
+    # "closest_observation" keeps inf runways from turning percentiles into NaN
+    quantiles = np.percentile(runway, PERCENTILES, method="closest_observation") if len(runway) else []
+    return {
+        "percentiles": {f"p{q}": float(v) for q, v in zip(PERCENTILES, quantiles)},
+        "share_below": {f"{t}m": float(np.mean(runway < t)) for t in thresholds},
+        "share_beyond_horizon": float(np.mean(np.isinf(runway))),
+    }
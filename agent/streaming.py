@@ -0,0 +1,78 @@
+import asyncio
+import time
+from typing import AsyncIterator
+
+
+def run_coroutine(coro):
+    """
+    Like `asyncio.run`, but does not join the loop's executor threads on exit:
+    a tool call abandoned after its timeout keeps running in the background
+    instead of holding up the finished turn.
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        tasks = asyncio.all_tasks(loop)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.close()
+
+
+async def astream_turn(agent_executor, inputs: dict, config: dict | None = None) -> AsyncIterator[dict]:
+    """
+    Run one agent turn with `astream_events` and yield simplified events:
+
+      {"type": "token", "text": ...}                       answer text as it streams
+      {"type": "tool_start", "name", "input", "run_id"}
+      {"type": "tool_end", "name", "output", "run_id"}
+      {"type": "final", "output": {...}, "ttft": s, "elapsed": s}
+
+    "final" carries the executor's usual result (output, intermediate_steps)
+    plus time-to-first-token and total seconds. Models that do not stream
+    still produce a single "token" event with their whole answer. `config`
+    is passed to the run (e.g. {"callbacks": [...]} for tracing).
+    """
+    started = time.perf_counter()
+    first_token_at = None
+    streamed_runs = set()
+
+    async for event in agent_executor.astream_events(inputs, config=config, version="v2"):
+        kind = event["event"]
+        text = None
+
+        if kind == "on_chat_model_stream":
+            text = event["data"]["chunk"].content
+            if text:
+                streamed_runs.add(event["run_id"])
+        elif kind == "on_chat_model_end" and event["run_id"] not in streamed_runs:
+            message = event["data"].get("output")
+            if message is not None and not getattr(message, "tool_calls", None):
+                text = message.content
+        elif kind == "on_tool_start":
+            yield {"type": "tool_start", "name": event["name"], "input": event["data"].get("input"), "run_id": event["run_id"]}
+        elif kind == "on_tool_end":
+            yield {"type": "tool_end", "name": event["name"], "output": event["data"].get("output"), "run_id": event["run_id"]}
+        elif kind == "on_chain_end" and not event.get("parent_ids"):
+            yield {
+                "type": "final",
+                "output": event["data"]["output"],
+                "ttft": first_token_at - started if first_token_at is not None else None,
+                "elapsed": time.perf_counter() - started,
+            }
+
+        if isinstance(text, str) and text:
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+            yield {"type": "token", "text": text}
+
+
+async def astream_cached(answer: dict) -> AsyncIterator[dict]:
+    """Replay a cached answer as a single "token" event plus "final"."""
+    started = time.perf_counter()
+    yield {"type": "token", "text": answer["output"]}
+    elapsed = time.perf_counter() - started
+    yield {"type": "final", "output": answer, "ttft": elapsed, "elapsed": elapsed}
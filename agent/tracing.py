@@ -0,0 +1,205 @@
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+# JSON-lines file that receives one record per finished turn ("" disables it)
+TRACE_FILE = os.environ.get("FINAI_TRACE_FILE", "traces/turns.jsonl")
+RECENT_TRACES = 500
+
+# The trace of the turn being handled; copied into tool threads with the context
+current_trace = contextvars.ContextVar("finai_trace", default=None)
+
+recent = deque(maxlen=RECENT_TRACES)
+_write_lock = threading.Lock()
+
+
+class Trace:
+    """
+    Spans, counters and token usage of one agent turn.
+
+    Spans are dicts of name, kind, start and duration (seconds relative to
+    the start of the turn) plus optional attrs; kinds are "llm", "tool",
+    "data", "chart" and "render". Counters hold cache hits and misses.
+    Safe to update from tool threads.
+    """
+
+    def __init__(self, question: str = "", **attrs):
+        self.id = uuid.uuid4().hex[:16]
+        self.question = question
+        self.attrs = attrs
+        self.started_at = datetime.now(timezone.utc)
+        self.started = time.perf_counter()
+        self.spans = []
+        self.counters = {}
+        self.tokens = {"input": 0, "output": 0, "total": 0}
+        self._lock = threading.Lock()
+
+    def now(self) -> float:
+        return time.perf_counter() - self.started
+
+    def add_span(self, name: str, kind: str, start: float, duration: float, **attrs) -> None:
+        with self._lock:
+            self.spans.append({"name": name, "kind": kind, "start": round(start, 6),
+                               "duration": round(duration, 6), **({"attrs": attrs} if attrs else {})})
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_tokens(self, input_tokens: int = 0, output_tokens: int = 0, total_tokens: int = 0) -> None:
+        with self._lock:
+            self.tokens["input"] += input_tokens
+            self.tokens["output"] += output_tokens
+            self.tokens["total"] += total_tokens or input_tokens + output_tokens
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "trace_id": self.id,
+                "started_at": self.started_at.isoformat(timespec="milliseconds"),
+                "question": self.question,
+                **self.attrs,
+                "spans": sorted(self.spans, key=lambda s: s["start"]),
+                "counters": dict(self.counters),
+                "tokens": dict(self.tokens),
+            }
+
+
+def start_trace(question: str = "", **attrs) -> Trace:
+    """Begin a turn's trace and make it current for spans recorded in this context."""
+    trace = Trace(question, **attrs)
+    current_trace.set(trace)
+    return trace
+
+
+def finish_trace(trace: Trace, file: str | None = None, **attrs) -> dict:
+    """Close `trace` (adding `attrs`, elapsed time), keep it in `recent` and append it to `file` (default TRACE_FILE)."""
+    trace.attrs.update(attrs)
+    trace.attrs.setdefault("elapsed", round(trace.now(), 6))
+    record = trace.to_dict()
+    recent.append(record)
+    if current_trace.get() is trace:
+        current_trace.set(None)
+
+    file = TRACE_FILE if file is None else file
+    if file:
+        try:
+            Path(file).parent.mkdir(parents=True, exist_ok=True)
+            line = json.dumps(record, default=str)
+            with _write_lock, open(file, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except OSError:
+            pass   # tracing must never break a turn
+    return record
+
+
+@contextmanager
+def span(name: str, kind: str, **attrs):
+    """Record a span on the current trace; a no-op outside of a traced turn."""
+    trace = current_trace.get()
+    if trace is None:
+        yield
+        return
+    start = trace.now()
+    try:
+        yield
+    finally:
+        trace.add_span(name, kind, start, trace.now() - start, **attrs)
+
+
+def count(name: str, n: int = 1) -> None:
+    """Bump a counter (e.g. "metric_cache.hit") on the current trace, if any."""
+    trace = current_trace.get()
+    if trace is not None:
+        trace.count(name, n)
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """LangChain callbacks turning model and tool runs into spans on `trace`."""
+
+    run_inline = True   # record on the event loop thread, in order
+
+    def __init__(self, trace: Trace):
+        self.trace = trace
+        self._runs = {}
+
+    def _start(self, run_id, name: str, kind: str, **attrs) -> None:
+        self._runs[run_id] = (name, kind, self.trace.now(), attrs)
+
+    def _end(self, run_id, **attrs) -> None:
+        started = self._runs.pop(run_id, None)
+        if started is not None:
+            name, kind, start, start_attrs = started
+            self.trace.add_span(name, kind, start, self.trace.now() - start, **start_attrs, **attrs)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        params = kwargs.get("invocation_params") or {}
+        model = params.get("model") or params.get("model_name") or (serialized or {}).get("name", "chat_model")
+        self._start(run_id, f"llm:{model}", "llm", messages=sum(len(m) for m in messages))
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(run_id, f"llm:{(serialized or {}).get('name', 'llm')}", "llm")
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        usage = {}
+        for generations in response.generations:
+            for generation in generations:
+                metadata = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if metadata:
+                    for key in ("input_tokens", "output_tokens", "total_tokens"):
+                        usage[key] = usage.get(key, 0) + metadata.get(key, 0)
+        if not usage:
+            token_usage = (response.llm_output or {}).get("token_usage") or {}
+            usage = {
+                "input_tokens": token_usage.get("prompt_tokens", 0),
+                "output_tokens": token_usage.get("completion_tokens", 0),
+                "total_tokens": token_usage.get("total_tokens", 0),
+            }
+        self.trace.add_tokens(**usage)
+        self._end(run_id, **{k: v for k, v in usage.items() if v})
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=repr(error))
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self._start(run_id, f"tool:{(serialized or {}).get('name', kwargs.get('name', 'tool'))}", "tool")
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=repr(error))
+
+
+def percentile(values: list[float], q: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+def summary(traces=None) -> dict:
+    """p50 / p95 of turn latency and of each span name over `traces` (default: recent turns)."""
+    traces = list(recent if traces is None else traces)
+    by_span = {}
+    for trace in traces:
+        for s in trace["spans"]:
+            by_span.setdefault(s["name"], []).append(s["duration"])
+    elapsed = [t["elapsed"] for t in traces if t.get("elapsed") is not None]
+    return {
+        "turns": len(traces),
+        "elapsed": {"p50": percentile(elapsed, 0.5), "p95": percentile(elapsed, 0.95)},
+        "spans": {
+            name: {"n": len(d), "p50": percentile(d, 0.5), "p95": percentile(d, 0.95)}
+            for name, d in sorted(by_span.items())
+        },
+    }
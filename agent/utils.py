@@ -1,98 +1,410 @@
+import os
+
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-
-# Load and prepare data
-dfs = pd.read_excel("data.xlsx", sheet_name=None)
-actuals = dfs["actuals"].copy()
-budget = dfs["budget"].copy()
-cash = dfs["cash"].copy()
-fx = dfs["fx"].copy()
-
-# Normalize month columns
-for df in (actuals, budget, cash, fx):
-    df["month"] = pd.to_datetime(df["month"]).dt.to_period("M")
-
-# Helper: convert any DataFrame with `amount` & `currency` to USD
-def convert_to_usd(df: pd.DataFrame, fx: pd.DataFrame) -> pd.DataFrame:
-    merged = df.merge(
-        fx,
-        on=["month", "currency"],
-        how="left",
-        suffixes=("", "_fx"),
+
+from . import charts, data, scenarios
+from .cache import MetricCache
+from .fx import SOURCES, FxTable, month_ordinals
+from .ledger import month_ordinal, normalize_entity, normalize_month
+
+# Sheets and derived tables are loaded lazily (see `data.get_dataset`), but stay
+# reachable as module attributes: utils.actuals, utils.cube, ...
+_DATASET_ATTRS = ("actuals", "budget", "cash", "fx", "actuals_usd", "budget_usd", "cube", "cash_by_month", "fx_fallbacks")
+
+def __getattr__(name):
+    if name in _DATASET_ATTRS:
+        value = getattr(data.get_dataset(), name)
+        # A shallow copy shares the read-only column data, but adding or dropping
+        # columns on it cannot change the frame every other session reads
+        return value.copy(deep=False) if isinstance(value, pd.DataFrame) else value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Memoized metric results, shared by all tenants and keyed on normalized
+# arguments plus the (tenant, dataset version) of the current request
+metric_cache = MetricCache(
+    version=data.current_version,
+    maxsize=int(os.environ.get("FINAI_METRIC_CACHE_SIZE", "512")),
+    ttl=float(os.environ.get("FINAI_METRIC_CACHE_TTL", "3600")),
+    pin=data.pin,
+)
+data.registry.on_reload(lambda name, dataset: metric_cache.clear())
+
+# Largest scenario grid `runway_scenarios` returns row by row
+TABLE_ROWS = 200
+
+
+def _entity_key(entity):
+    entity = normalize_entity(entity)
+    return entity.lower() if entity else None
+
+
+memoize_range = metric_cache.memoize(start_month=normalize_month, end_month=normalize_month, entity=_entity_key)
+
+# Helper: convert any DataFrame with `month`, `amount` & `currency` to USD.
+# Rates come from a dense month × currency matrix (as-of for gaps); `fx_source`
+# says which rows used a carried-over rate or had none at all (NaN amount_usd)
+def convert_to_usd(df: pd.DataFrame, fx) -> pd.DataFrame:
+    table = fx if isinstance(fx, FxTable) else FxTable(fx)
+    amount_usd, rate, source = table.convert(df["amount"].to_numpy(), month_ordinals(df["month"]), df["currency"])
+    return df.assign(
+        rate_to_usd=rate,
+        amount_usd=amount_usd,
+        fx_source=pd.Categorical.from_codes(source, categories=list(SOURCES)),
     )
-    merged["rate_to_usd"] = merged["rate_to_usd"].fillna(1.0)
-    merged["amount_usd"] = merged["amount"] * merged["rate_to_usd"]
-    return merged
 
 # 1. Revenue variance
-def revenue_variance(start_month: str, end_month: str) -> float:
-    a = convert_to_usd(actuals, fx)
-    b = convert_to_usd(budget, fx)
-    mask = lambda df: (df["month"] >= pd.Period(start_month)) & (df["month"] <= pd.Period(end_month))
-    actual_rev = a[mask(a) & (a["account_category"] == "Revenue")]["amount_usd"].sum()
-    budget_rev = b[mask(b) & (b["account_category"] == "Revenue")]["amount_usd"].sum()
+@memoize_range
+def revenue_variance(start_month: str, end_month: str, entity: str | None = None) -> float:
+    cube = data.get_dataset().cube
+    actual = cube.category_totals(cube.actual_cum, start_month, end_month, entity)
+    budget = cube.category_totals(cube.budget_cum, start_month, end_month, entity)
+    actual_rev = cube.category_total(actual, cube.revenue)
+    budget_rev = cube.category_total(budget, cube.revenue)
     return actual_rev - budget_rev, actual_rev, budget_rev
 
 # 2. Gross Margin %
-def gross_margin_pct(start_month: str, end_month: str) -> float:
-    a = convert_to_usd(actuals, fx)
-    mask = (a["month"] >= pd.Period(start_month)) & (a["month"] <= pd.Period(end_month))
-
-    result = {}
-    for m in sorted(a[mask]["month"].unique()):
-        sub = a[a["month"] == m]
-        rev = sub[sub["account_category"] == "Revenue"]["amount_usd"].sum()
-        cogs = sub[sub["account_category"] == "COGS"]["amount_usd"].sum()
-        result[str(m)] = round((rev - cogs) / rev * 100, 2) if rev != 0 else 0.0
-
-    return result
+@memoize_range
+def gross_margin_pct(start_month: str, end_month: str, entity: str | None = None) -> float:
+    cube = data.get_dataset().cube
+    month_revenue, month_cogs, _, month_has_actuals = cube.monthly_lines(entity)
+    lo, hi = cube.month_slice(start_month, end_month)
+    months = lo + np.flatnonzero(month_has_actuals[lo:hi])
+    rev = month_revenue[months]
+    cogs = month_cogs[months]
+    pct = np.divide(rev - cogs, rev, out=np.zeros_like(rev), where=rev != 0) * 100
+    return {cube.month_labels[m]: round(float(p), 2) for m, p in zip(months, pct)}
 
 # 3. Opex breakdown
-def opex_breakdown(start_month: str, end_month: str) -> dict:
-    a = convert_to_usd(actuals, fx)
-    mask = (a["month"] >= pd.Period(start_month)) & (a["month"] <= pd.Period(end_month))
-    opex = a[mask & a["account_category"].str.startswith("Opex")]
-    return opex.groupby("account_category")["amount_usd"].sum().to_dict()
+@memoize_range
+def opex_breakdown(start_month: str, end_month: str, entity: str | None = None) -> dict:
+    cube = data.get_dataset().cube
+    totals = cube.category_totals(cube.actual_cum, start_month, end_month, entity)
+    counts = cube.category_totals(cube.actual_count_cum, start_month, end_month, entity)
+    return {
+        cube.categories[i]: float(totals[i])
+        for i in cube.opex
+        if counts[i] > 0
+    }
 
 # 4. EBITDA proxy
-def ebitda_proxy(start_month: str, end_month: str) -> float:
-    a = convert_to_usd(actuals, fx)
-    mask = (a["month"] >= pd.Period(start_month)) & (a["month"] <= pd.Period(end_month))
-    rev = a[mask & (a["account_category"] == "Revenue")]["amount_usd"].sum()
-    cogs = a[mask & (a["account_category"] == "COGS")]["amount_usd"].sum()
-    opex = a[mask & a["account_category"].str.startswith("Opex")]["amount_usd"].sum()
+@memoize_range
+def ebitda_proxy(start_month: str, end_month: str, entity: str | None = None) -> float:
+    cube = data.get_dataset().cube
+    totals = cube.category_totals(cube.actual_cum, start_month, end_month, entity)
+    rev = cube.category_total(totals, cube.revenue)
+    cogs = cube.category_total(totals, cube.cogs)
+    opex = float(totals[cube.opex].sum())
     return rev - cogs - opex
 
 # 5. Cash runway
-def cash_runway(as_of_month: str = None, last_n_months: int = 3) -> float:
+def _runway_inputs(as_of_month, last_n_months: int, entity):
+    """(cash_usd, as-of ordinal, month indices of the trailing burn window, monthly lines) for `cash_runway`."""
+    ds = data.get_dataset()
+    cube, cash_by_month = ds.cube, ds.cash_by_month
+    lines = cube.monthly_lines(entity)
+    if normalize_entity(entity) is not None:
+        cash_by_month = ds.cash_by_entity.get(normalize_entity(entity).lower())
+        if cash_by_month is None:
+            names = sorted(ds.cash["entity"].astype(str).unique()) if "entity" in ds.cash else []
+            raise ValueError(f"No cash balance for entity {entity!r} in the cash sheet; "
+                             f"balances exist for {names}")
+
     # If no as_of_month specified, use most recent
     if as_of_month is None:
-        most_recent = cash["month"].max()
+        most_recent = int(cash_by_month.index.max())
     else:
-        most_recent = pd.Period(as_of_month)
+        most_recent = month_ordinal(as_of_month)
 
     # Get cash balance as of the specified/most recent month
-    cash_usd = cash[cash["month"] == most_recent]["cash_usd"].sum()
+    cash_usd = cash_by_month.get(most_recent, 0)
 
-    # Calculate net burn for each of the last N months before as_of_month
-    a = convert_to_usd(actuals, fx)
-
-    # Get months ending before as_of_month
-    available_months = sorted([m for m in a["month"].unique() if m < most_recent])
+    # The last N months with actuals before as_of_month
+    cutoff = max(most_recent - cube.first_month, 0)
+    available_months = np.flatnonzero(lines[3][:cutoff])
     months = available_months[-last_n_months:] if len(available_months) >= last_n_months else available_months
+    return cash_usd, most_recent, months, lines
+
+@metric_cache.memoize(as_of_month=normalize_month, last_n_months=int, entity=_entity_key)
+def cash_runway(as_of_month: str = None, last_n_months: int = 3, entity: str | None = None) -> float:
+    cash_usd, _, months, (month_revenue, month_cogs, month_opex, _) = _runway_inputs(as_of_month, last_n_months, entity)
 
-    burns = []
-    for m in months:
-        dfm = a[a["month"] == m]
-        rev = dfm[dfm["account_category"] == "Revenue"]["amount_usd"].sum()
-        cogs = dfm[dfm["account_category"] == "COGS"]["amount_usd"].sum()
-        opex = dfm[dfm["account_category"].str.startswith("Opex")]["amount_usd"].sum()
-        burns.append(cogs + opex - rev)
+    # Average net burn over the last N months with actuals before as_of_month
+    burns = month_cogs[months] + month_opex[months] - month_revenue[months]
 
-    avg_burn = sum(burns) / len(burns) if burns else 0
+    avg_burn = burns.sum() / len(burns) if len(burns) else 0
     return cash_usd / avg_burn if avg_burn > 0 else float('inf'), avg_burn
 
+# 5b. Runway scenarios
+def runway_baseline(as_of_month: str = None, last_n_months: int = 3, entity: str | None = None) -> scenarios.Baseline:
+    """
+    Cash as of the month and the average monthly revenue / COGS / opex of
+    the same trailing window `cash_runway` uses, plus the share of each line
+    booked in non-USD currencies (what an FX shock applies to).
+    """
+    with data.pin() as ds:   # the window and the ledger rows must come from the same version
+        cash_usd, _, months, lines = _runway_inputs(as_of_month, last_n_months, entity)
+    month_revenue, month_cogs, month_opex, _ = lines
+    n = max(len(months), 1)
+
+    ledger = ds.actuals_usd
+    rows = np.isin(ledger["month"].to_numpy(), ds.cube.first_month + months) & ledger["amount_usd"].notna().to_numpy()
+    if normalize_entity(entity) is not None:
+        rows &= (ledger["entity"].astype(str).str.lower() == normalize_entity(entity).lower()).to_numpy()
+    foreign = (ledger["currency"].astype(str) != ds.fx_table.base).to_numpy()
+    category = ledger["account_category"].astype(str).to_numpy()
+    amount = ledger["amount_usd"].to_numpy()
+
+    def fx_share(line: np.ndarray) -> float:
+        total = amount[rows & line].sum()
+        return float(amount[rows & line & foreign].sum() / total) if total else 0.0
+
+    return scenarios.Baseline(
+        cash=float(cash_usd),
+        revenue=float(month_revenue[months].sum() / n),
+        cogs=float(month_cogs[months].sum() / n),
+        opex=float(month_opex[months].sum() / n),
+        fx_share_revenue=fx_share(category == "Revenue"),
+        fx_share_cogs=fx_share(category == "COGS"),
+        fx_share_opex=fx_share(ledger["is_opex"].to_numpy()),
+    )
+
+def runway_scenarios(
+    revenue_growth=0.0,
+    opex_change=0.0,
+    fx_shock=0.0,
+    samples: int = 0,
+    as_of_month: str = None,
+    last_n_months: int = 3,
+    entity: str | None = None,
+    horizon: int = 120,
+    seed: int = 0,
+) -> dict:
+    """
+    Runway under many what-if scenarios at once (see `agent/scenarios.py`).
+
+    Drivers are percent values or lists of them: revenue_growth is monthly
+    revenue growth, opex_change a change in the opex level, fx_shock a move
+    in the USD value of non-USD currencies. Without `samples` every
+    combination of the listed values is a scenario (a sensitivity table);
+    with `samples`, that many scenarios draw each driver uniformly between
+    the min and max of its values. Returns the baseline, runway percentiles
+    and threshold shares, plus a per-scenario table for grids up to
+    TABLE_ROWS rows. Runways beyond `horizon` months are inf.
+    """
+    baseline = runway_baseline(as_of_month, last_n_months, entity)
+    drivers = {"revenue_growth": revenue_growth, "opex_change": opex_change, "fx_shock": fx_shock}
+    grid = scenarios.sample_scenarios(samples, seed, **drivers) if samples else scenarios.scenario_grid(**drivers)
+    runway = scenarios.project_runway(baseline, **grid, horizon=horizon)
+
+    result = {
+        "baseline": {
+            "cash": baseline.cash,
+            "monthly_revenue": baseline.revenue,
+            "monthly_cogs": baseline.cogs,
+            "monthly_opex": baseline.opex,
+            "monthly_burn": baseline.burn,
+            "fx_share_revenue": round(baseline.fx_share_revenue, 4),
+            "fx_share_costs": round((baseline.fx_share_cogs * baseline.cogs + baseline.fx_share_opex * baseline.opex)
+                                    / ((baseline.cogs + baseline.opex) or 1), 4),
+        },
+        "scenarios": len(runway),
+        "horizon_months": horizon,
+        **scenarios.summarize(runway),
+    }
+    if not samples and len(runway) <= TABLE_ROWS:
+        result["table"] = [
+            {**{name: float(grid[name][i]) for name in scenarios.DRIVERS}, "runway": round(float(runway[i]), 2)}
+            for i in range(len(runway))
+        ]
+    return result
+
+# 6. Multi-range metrics table
+TABLE_METRICS = (
+    "revenue", "budget_revenue", "revenue_variance", "cogs", "gross_margin_pct",
+    "opex", "ebitda", "cash_runway", "avg_burn",
+)
+GRANULARITIES = {"month": "M", "quarter": "Q", "year": "Y"}
+
+def period_ranges(start_month: str, end_month: str, granularity: str | None = None) -> list[tuple[str, str, str]]:
+    """
+    Split an inclusive month range into (label, start_month, end_month) periods.
+    `granularity` is "month", "quarter", "year" or None for the whole range;
+    partial periods at either end are clipped to the requested range.
+    """
+    start, end = pd.Period(start_month, freq="M"), pd.Period(end_month, freq="M")
+    if granularity is None:
+        return [(f"{start}..{end}" if start != end else str(start), str(start), str(end))]
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unknown granularity {granularity!r}; use one of {sorted(GRANULARITIES)}")
+
+    freq = GRANULARITIES[granularity]
+    periods = []
+    for p in pd.period_range(start.asfreq(freq), end.asfreq(freq), freq=freq):
+        lo = max(p.asfreq("M", how="start"), start)
+        hi = min(p.asfreq("M", how="end"), end)
+        periods.append((str(p), str(lo), str(hi)))
+    return periods
+
+def _month_range(start_month, end_month) -> tuple[str, str]:
+    """Normalized (start, end) of an inclusive month range; ValueError if missing, unparseable or reversed."""
+    if not start_month or not end_month:
+        raise ValueError(f"Need both start_month and end_month as YYYY-MM (got {start_month!r}, {end_month!r})")
+    try:
+        start, end = pd.Period(start_month, freq="M"), pd.Period(end_month, freq="M")
+    except (ValueError, TypeError):
+        raise ValueError(f"Cannot read month range {start_month!r}..{end_month!r}; use YYYY-MM") from None
+    if pd.isna(start) or pd.isna(end):
+        raise ValueError(f"Cannot read month range {start_month!r}..{end_month!r}; use YYYY-MM")
+    if start > end:
+        raise ValueError(f"start_month {start} is after end_month {end}")
+    return str(start), str(end)
+
+def _resolve_periods(start_month, end_month, granularity, ranges) -> list[tuple[str, str, str]]:
+    """Explicit `ranges` ([start_month, end_month] pairs or dicts) or `period_ranges(...)`, validated."""
+    if not ranges:
+        return period_ranges(*_month_range(start_month, end_month), granularity)
+    periods = []
+    for r in ranges:
+        start, end = (r["start_month"], r["end_month"]) if isinstance(r, dict) else r
+        start, end = _month_range(start, end)
+        periods.append((start if start == end else f"{start}..{end}", start, end))
+    return periods
+
+def _period_totals(cube, cum: np.ndarray, periods) -> np.ndarray:
+    """Entity × category × period totals of a prefix-sum cube, one gather per bound."""
+    bounds = np.array([cube.month_slice(s, e) for _, s, e in periods], dtype=int).reshape(-1, 2)
+    return cum[..., bounds[:, 1]] - cum[..., bounds[:, 0]]
+
+def metrics_table(
+    start_month: str | None = None,
+    end_month: str | None = None,
+    granularity: str | None = None,
+    ranges: list | None = None,
+    metrics: list[str] | None = None,
+    entity: str | None = None,
+) -> list[dict]:
+    """
+    Compute several metrics for several periods in one pass over the cube.
+
+    Periods are either explicit `ranges` ([start_month, end_month] pairs) or
+    `start_month..end_month` split by `granularity`. Returns one row per
+    period with "period", "start_month", "end_month" and one column per
+    metric (default: all of TABLE_METRICS). Gross margin % is over the whole
+    period; cash runway / avg burn are as of the period's last month. With
+    `entity`, every metric is for that entity only.
+    """
+    metrics = list(metrics or TABLE_METRICS)
+    unknown = [m for m in metrics if m not in TABLE_METRICS]
+    if unknown:
+        raise ValueError(f"Unknown metrics {unknown}; use any of {list(TABLE_METRICS)}")
+
+    periods = _resolve_periods(start_month, end_month, granularity, ranges)
+    cube = data.get_dataset().cube
+    index = cube.entity_index(entity)
+    entities = slice(None) if index is None else [index]
+    actual = _period_totals(cube, cube.actual_cum, periods)[entities].sum(axis=0)
+    budget = _period_totals(cube, cube.budget_cum, periods)[entities].sum(axis=0)
+
+    def line(totals, index):
+        return totals[index] if index is not None else np.zeros(len(periods))
+
+    rev, budget_rev, cogs = line(actual, cube.revenue), line(budget, cube.revenue), line(actual, cube.cogs)
+    opex = actual[cube.opex].sum(axis=0)
+    columns = {
+        "revenue": rev,
+        "budget_revenue": budget_rev,
+        "revenue_variance": rev - budget_rev,
+        "cogs": cogs,
+        "gross_margin_pct": np.round(np.divide(rev - cogs, rev, out=np.zeros_like(rev), where=rev != 0) * 100, 2),
+        "opex": opex,
+        "ebitda": rev - cogs - opex,
+    }
+
+    rows = []
+    for i, (label, start, end) in enumerate(periods):
+        row = {"period": label, "start_month": start, "end_month": end}
+        if "cash_runway" in metrics or "avg_burn" in metrics:
+            try:
+                runway, avg_burn = cash_runway(end, entity=entity)
+            except ValueError:
+                runway = avg_burn = None   # no cash balance reported for this entity
+        for m in metrics:
+            if m == "cash_runway":
+                row[m] = float(runway) if runway is not None else None
+            elif m == "avg_burn":
+                row[m] = float(avg_burn) if avg_burn is not None else None
+            else:
+                row[m] = float(columns[m][i])
+        rows.append(row)
+    return rows
+
+# Categories where actuals above budget are good news; every other line is a cost
+FAVORABLE_ABOVE_BUDGET = ("Revenue",)
+
+def variance_matrix(
+    start_month: str | None = None,
+    end_month: str | None = None,
+    granularity: str | None = None,
+    ranges: list | None = None,
+    categories: list[str] | None = None,
+    entity: str | None = None,
+) -> list[dict]:
+    """
+    Budget-vs-actual variance for every account category × entity × period.
+
+    Periods work as in `metrics_table`. Actuals and budget come from the same
+    cube axes, so the whole grid is one subtraction over the aligned
+    entity × category × period arrays. Without `entity` there are rows for
+    each entity plus "Consolidated"; `categories` limits the lines
+    (case-insensitive). Each row has actual, budget, variance (actual -
+    budget), variance_pct (of budget; None when there is no budget) and
+    favorable (above budget for revenue, below it for costs).
+    """
+    periods = _resolve_periods(start_month, end_month, granularity, ranges)
+    cube = data.get_dataset().cube
+
+    lines = list(range(len(cube.categories)))
+    if categories:
+        known = {c.lower(): i for i, c in enumerate(cube.categories)}
+        unknown = [c for c in categories if c.strip().lower() not in known]
+        if unknown:
+            raise ValueError(f"Unknown categories {unknown}; use any of {list(cube.categories)}")
+        lines = [known[c.strip().lower()] for c in categories]
+
+    actual = _period_totals(cube, cube.actual_cum, periods)[:, lines]
+    budget = _period_totals(cube, cube.budget_cum, periods)[:, lines]
+    index = cube.entity_index(entity)
+    if index is None:
+        names = [*cube.entities, "Consolidated"]
+        actual = np.concatenate([actual, actual.sum(axis=0, keepdims=True)])
+        budget = np.concatenate([budget, budget.sum(axis=0, keepdims=True)])
+    else:
+        names = [cube.entities[index]]
+        actual, budget = actual[[index]], budget[[index]]
+
+    variance = actual - budget
+    pct = np.round(np.divide(variance, np.abs(budget), out=np.full_like(variance, np.nan), where=budget != 0) * 100, 2)
+    sign = np.array([1 if cube.categories[i] in FAVORABLE_ABOVE_BUDGET else -1 for i in lines])[None, :, None]
+    favorable = sign * variance >= 0
+
+    rows = []
+    for e, c, p in np.ndindex(variance.shape):
+        label, start, end = periods[p]
+        rows.append({
+            "period": label,
+            "start_month": start,
+            "end_month": end,
+            "entity": names[e],
+            "category": cube.categories[lines[c]],
+            "actual": float(actual[e, c, p]),
+            "budget": float(budget[e, c, p]),
+            "variance": float(variance[e, c, p]),
+            "variance_pct": None if np.isnan(pct[e, c, p]) else float(pct[e, c, p]),
+            "favorable": bool(favorable[e, c, p]),
+        })
+    return rows
+
 def plot_chart(
     chart_type: str,
     x,
@@ -100,9 +412,10 @@ def plot_chart(
     title: str,
     x_label: str,
     y_label: str,
-    output_path: str,
-    legends: list[str] | None = None,   # ← NEW
-) -> str:
+    output_path: str | None = None,
+    legends: list[str] | None = None,
+    interactive: bool = False,
+) -> "charts.ChartArtifact | str":
     """
             Plot helper that supports single-series and multi-series
             bar, line, scatter and pie charts.
@@ -113,87 +426,23 @@ def plot_chart(
             x, y       : list-like objects.  For multi-series data,
                          use y = [[series1], [series2], …] and
                          x  = [[categories]].
+            output_path: Optional file name hint. When given, the PNG is also
+                         written to a content-addressed file under
+                         charts.CHART_DIR.
             legends    : Optional list of legend labels, one per series.
+            interactive: Return a Vega-Lite spec (rendered client-side)
+                         instead of PNG bytes.
+
+            Returns a `charts.ChartArtifact` rendered in memory, or an error
+            message for the model.
             """
     try:
-
-        plt.figure(figsize=(7, 4))
-
-        # ── MULTI-SERIES ────────────────────────────────────────────────
-        if isinstance(y[0], list) and len(y) > 1:
-            categories = x[0]  # shared x-axis
-            n_groups = len(categories)
-            n_series = len(y)
-
-            if chart_type == "bar":
-                bar_width = 0.8 / n_series
-                x_pos = np.arange(n_groups)
-                colors = ['#1f77b4', '#ff7f0e', '#2ca02c',
-                          '#d62728', '#9467bd']
-
-                for i, series in enumerate(y):
-                    offset = (i - n_series / 2 + 0.5) * bar_width
-                    plt.bar(
-                        x_pos + offset,
-                        series,
-                        bar_width,
-                        color=colors[i % len(colors)],
-                        label=(legends[i] if legends and i < len(legends)
-                               else f"Series {i + 1}")
-                    )
-
-                plt.xticks(x_pos, categories, rotation=45)
-                plt.legend()
-
-            elif chart_type == "line":
-                for i, series in enumerate(y):
-                    plt.plot(
-                        categories,
-                        series,
-                        marker="o",
-                        label=(legends[i] if legends and i < len(legends)
-                               else f"Series {i + 1}")
-                    )
-                plt.legend()
-                plt.xticks(rotation=45)
-
-        # ── SINGLE-SERIES ───────────────────────────────────────────────
-        else:
-            # flatten if wrapped
-            if isinstance(y[0], list): y = y[0]
-            if isinstance(x[0], list): x = x[0]
-
-            if chart_type == "line":
-                plt.plot(x, y, marker="o", linewidth=2, markersize=6,
-                         label=legends[0] if legends else None)
-            elif chart_type == "bar":
-                plt.bar(x, y, color="skyblue", edgecolor="navy", alpha=0.7,
-                        label=legends[0] if legends else None)
-                plt.xticks(rotation=45)
-                plt.ylim(bottom=0)
-            elif chart_type == "scatter":
-                plt.scatter(x, y, s=60, alpha=0.7,
-                            label=legends[0] if legends else None)
-            elif chart_type == "pie":
-                plt.pie(y, labels=x, autopct="%1.1f%%", startangle=90)
-                plt.axis("equal")
-
-            if legends and chart_type != "pie":
-                plt.legend()
-
-        # ── COMMON FORMATTING ──────────────────────────────────────────
-        plt.title(title, fontsize=14, fontweight="bold")
-
-        if chart_type != "pie":
-            plt.xlabel(x_label, fontsize=12)
-            plt.ylabel(y_label, fontsize=12)
-            plt.grid(True, alpha=0.3)
-
-        plt.tight_layout()
-        plt.savefig(output_path, dpi=100, bbox_inches="tight")
-        plt.close()
-        return output_path
+        spec = charts.chart_spec(chart_type, x, y, title, x_label, y_label, legends)
+        artifact = charts.render(spec, interactive=interactive)
+        if output_path:
+            charts.render_png(spec, charts.chart_path(spec, output_path))
+        return artifact
 
     except Exception as e:
-        return f'There is some problem with the data you send, I am using matplotlib to plot. Can you send a full code to other tool which could run on PythonREPLTool (should save the graph and return the filename). Here is the error: {e}'
-        # return f'There is some problem with the data you send, I am using matplotlib to plot. Can you recheck the data and send it again. May be just include the most important field to plot. Here is the error: {e}'
\ No newline at end of file
+        return f'There is some problem with the data you send, I am using matplotlib to plot. Can you send a full code to the code_analysis tool instead (should save the graph and return the filename). Here is the error: {e}'
+        # return f'There is some problem with the data you send, I am using matplotlib to plot. Can you recheck the data and send it again. May be just include the most important field to plot. Here is the error: {e}'
@@ -1,18 +1,34 @@
 # app.py
-import re
+import uuid
 
 import streamlit as st
-from langchain_core.messages import AIMessage, HumanMessage
 
 # Import the agent initializer from its new location
-from agent.agent import initialize_agent
-
-def extract_image_paths(text: str) -> list[str]:
-    """
-    Finds all image filenames (png/jpeg) in a block of text,
-    whether in quotes or bare.
-    """
-    return re.findall(r"['\"]?([A-Za-z0-9_\-]+\.(?:png|jpg|jpeg))['\"]?", text)
+from agent.agent import initialize_agent, make_llm
+from agent import charts, data, router, sandbox, tracing, utils
+from agent.history import ChatHistory, llm_summarizer
+from agent.streaming import astream_cached, astream_turn, run_coroutine
+
+def show_trace(trace: dict) -> None:
+    with st.expander(f"Trace {trace['trace_id']} · {trace['elapsed']:.2f}s · {trace['tokens']['total']} tokens"):
+        st.dataframe(
+            [{"span": s["name"], "kind": s["kind"], "start (s)": s["start"], "duration (s)": s["duration"]}
+             for s in trace["spans"]],
+            use_container_width=True,
+        )
+        st.json({"route": trace.get("route"), "counters": trace["counters"], "tokens": trace["tokens"]}, expanded=False)
+
+
+def show_chart(chart: dict) -> None:
+    if chart.get("vega_lite") is not None:
+        st.vega_lite_chart(chart["vega_lite"], use_container_width=True)
+    elif chart.get("png") is not None:
+        st.image(chart["png"])
+    else:
+        try:
+            st.image(chart["path"])
+        except Exception as e:
+            st.error(f"Failed to load image {chart['path']}: {e}")
 
 
 st.set_page_config(page_title="🤖 Smart Financial Analytics Agent", layout="wide")
@@ -21,17 +37,61 @@ st.title("🤖 CFO Copilot")
 # Initialize the agent
 agent_executor = initialize_agent()
 
-# Initialize chat history in session state
+# Data controls: the store also picks up workbook changes on its own
+with st.sidebar:
+    tenants = data.registry.names()
+    if len(tenants) > 1:
+        st.session_state.tenant = st.selectbox("Company", tenants, index=tenants.index(st.session_state.get("tenant", data.DEFAULT_TENANT)))
+    # Every dataset read of this run (tools, cache keys, sandbox) goes to the selected tenant
+    data.tenant.set(st.session_state.get("tenant", data.DEFAULT_TENANT))
+    if st.button("Reload data"):
+        data.current_store().reload(force=True)
+    # ... and to one version of it, even if another session reloads mid-answer
+    dataset = data.pin_dataset()
+    st.caption(f"Dataset version {dataset.version}")
+    fx_fallbacks = dataset.fx_fallbacks
+    if len(fx_fallbacks):
+        st.warning(f"{int(fx_fallbacks['rows'].sum())} ledger rows had no FX rate for their month "
+                   f"({', '.join(sorted(set(fx_fallbacks['currency'])))}): earlier rates were carried forward, "
+                   f"currencies without any rate are left out")
+        st.dataframe(fx_fallbacks, use_container_width=True, hide_index=True)
+    cache_stats = utils.metric_cache.stats()
+    st.caption(f"Metric cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses")
+    response_stats = router.response_cache.stats()
+    st.caption(f"Answer cache: {response_stats['hits']} hits / {response_stats['misses']} misses")
+    debug = st.toggle("Debug traces", value=False)
+    if debug and tracing.recent:
+        latency = tracing.summary()
+        st.caption(f"Last {latency['turns']} turns: p50 {latency['elapsed']['p50']:.2f}s / p95 {latency['elapsed']['p95']:.2f}s")
+        st.dataframe(
+            [{"span": name, "n": s["n"], "p50 (s)": s["p50"], "p95 (s)": s["p95"]} for name, s in latency["spans"].items()],
+            use_container_width=True,
+        )
+
+# Give each browser session its own code_analysis namespace
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+sandbox.session_id.set(st.session_state.session_id)
+
+# Initialize chat history in session state: `messages` is what we display,
+# `history` is the bounded window (recent turns + running summary) sent to the model
 if "messages" not in st.session_state:
     st.session_state.messages = []
+if "answer_llm" not in st.session_state:
+    # Plain model (no tools) for phrasing fast-path answers and summarizing history
+    st.session_state.answer_llm = make_llm(temperature=0)
+if "history" not in st.session_state:
+    st.session_state.history = ChatHistory(summarize=llm_summarizer(st.session_state.answer_llm))
 
 # Display past messages
 for message in st.session_state.messages:
     with st.chat_message(message["role"]):
 
         st.text(message["content"])
-        if "image_path" in message and message["image_path"]:
-            st.image(message["image_path"])
+        for chart in message.get("charts", []):
+            show_chart(chart)
+        if debug and message.get("trace"):
+            show_trace(message["trace"])
 
 # Get user input
 if prompt := st.chat_input("Ask a question about your financial data..."):
@@ -41,45 +101,83 @@ if prompt := st.chat_input("Ask a question about your financial data..."):
 
     # Generate and display assistant response
     with st.chat_message("assistant"):
-        with st.spinner("Thinking..."):
-            chat_history = [
-                HumanMessage(content=msg["content"]) if msg["role"] == "user" else AIMessage(content=msg["content"])
-                for msg in st.session_state.messages[:-1]
-            ]
-
-            response = agent_executor.invoke({
-                "input": prompt,
-                "chat_history": chat_history
+        chat_history = st.session_state.history.messages()
+
+        tool_status = st.status("Thinking...", expanded=False)
+        answer_placeholder = st.empty()
+
+        # Spans for this turn: model calls and tools via callbacks, data loads,
+        # chart renders and cache hits via the current trace
+        trace = tracing.start_trace(prompt, tenant=data.tenant.get(), session=st.session_state.session_id)
+        callbacks = [tracing.TracingCallbackHandler(trace)]
+
+        # Repeated questions are served from the answer cache; common single-metric
+        # questions skip the agent loop (one direct call, one model call to phrase it)
+        cached = router.response_cache.lookup(prompt)
+        fast_path = router.resolve(prompt) if cached is None else None
+        if cached is not None:
+            path, events = "cache", astream_cached(cached)
+        elif fast_path is not None:
+            path, events = "fast_path", router.astream_answer(*fast_path, prompt, st.session_state.answer_llm, callbacks)
+        else:
+            path, events = "agent", astream_turn(agent_executor, {"input": prompt, "chat_history": chat_history},
+                                                 {"callbacks": callbacks})
+
+        async def run_turn() -> dict:
+            # Stream tokens and tool progress into the message as they arrive
+            text, running, result = "", {}, {}
+            async for event in events:
+                if event["type"] == "token":
+                    text += event["text"]
+                    answer_placeholder.text(text)
+                elif event["type"] == "tool_start":
+                    running[event["run_id"]] = event["name"]
+                    tool_status.update(label=f"Running {event['name']}...")
+                    tool_status.write(f"▶ {event['name']} {event['input']}")
+                elif event["type"] == "tool_end":
+                    running.pop(event["run_id"], None)
+                    tool_status.write(f"✓ {event['name']}")
+                    tool_status.update(label=f"Running {', '.join(running.values())}..." if running else "Thinking...")
+                elif event["type"] == "final":
+                    result = event
+            return result
+
+        result = run_coroutine(run_turn())
+        response = result["output"]
+        tool_status.update(
+            label=f"Done in {result['elapsed']:.1f}s"
+                  + (f" (first token after {result['ttft']:.1f}s)" if result["ttft"] is not None else ""),
+            state="complete",
+        )
+
+        output_text = response["output"]
+        answer_placeholder.text(output_text)
+        # Only answers that stand on their own are shared: an agent answer given
+        # with chat history may depend on the conversation ("and for EMEA?")
+        if cached is None and output_text and (fast_path is not None or not chat_history):
+            router.response_cache.store(prompt, {
+                "output": output_text,
+                "intermediate_steps": response.get("intermediate_steps", []),
             })
 
-            output_text = response["output"]
-            st.text(output_text)
-
-            # Collect any image paths from intermediate steps & output
-            image_paths = []
-
-            # 1. From intermediate_steps (even if action.tool != 'plot_chart')
-            for step in response.get("intermediate_steps", []):
-                _, observation = step
-                # observation might be a filename or a descriptive text
-                if isinstance(observation, str):
-                    image_paths += extract_image_paths(observation)
-
-            # 2. From the assistant’s final output text
-            image_paths += extract_image_paths(output_text)
-
-            # 3. De-duplicate and display
-            for path in dict.fromkeys(image_paths):  # preserves order, removes dups
-                try:
-                    st.image(path)
-                    # also record for session state
-                    image_path = path
-                except Exception as e:
-                    st.error(f"Failed to load image {path}: {e}")
-
-            # Save session state
-            st.session_state.messages.append({
-                "role": "assistant",
-                "content": output_text,
-                "image_path": image_path if image_paths else None
-            })
+        # Charts travel as objects in intermediate_steps; no files to find and reload
+        message_charts = charts.collect_charts(response.get("intermediate_steps", []))
+        with tracing.span("streamlit.render", "render", charts=len(message_charts)):
+            for chart in message_charts:
+                show_chart(chart)
+
+        # After the answer is on screen: older turns may get summarized here
+        with tracing.span("history.add_turn", "llm"):
+            st.session_state.history.add_turn(prompt, output_text)
+        turn_trace = tracing.finish_trace(trace, route=path, ttft=result["ttft"], answer_chars=len(output_text))
+        if debug:
+            show_trace(turn_trace)
+
+        # Save session state
+        st.session_state.messages.append({
+            "role": "assistant",
+            "content": output_text,
+            "charts": message_charts,
+            "timings": {"ttft": result["ttft"], "elapsed": result["elapsed"]},
+            "trace": turn_trace,
+        })
@@ -0,0 +1,234 @@
+"""
+Benchmark harness: times the metric functions, cold start and an end-to-end
+agent run against a synthetic workbook, and writes comparable JSON results.
+
+    python -m benchmarks.run --preset medium --output benchmarks/results/medium.json
+    python -m benchmarks.run --preset medium --compare benchmarks/results/medium.json
+
+With --compare, exits non-zero when any median is slower than the baseline
+by more than --threshold (default 1.25×).
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from .synthetic import PRESETS, Scale, describe, write_workbook
+
+ROOT = Path(__file__).resolve().parent.parent
+
+COLD_START = """
+import time
+started = time.perf_counter()
+from agent import utils
+utils.cube
+print(time.perf_counter() - started)
+"""
+
+
+def summarize(samples: list[float]) -> dict:
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "min": ordered[0],
+        "median": statistics.median(ordered),
+        "p95": ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)],
+        "mean": statistics.fmean(ordered),
+    }
+
+
+def timeit(func, repeat: int, setup=None) -> dict:
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+def bench_cold_start(env: dict, repeat: int) -> dict:
+    """Fresh-interpreter import of agent.utils plus first dataset access."""
+    def once():
+        out = subprocess.run([sys.executable, "-c", COLD_START], cwd=ROOT, env=env,
+                             capture_output=True, text=True, check=True)
+        return float(out.stdout.strip().splitlines()[-1])
+
+    # First run parses Excel and writes the snapshot; later runs memory-map it
+    excel = once()
+    return {
+        "cold_start_excel": summarize([excel]),
+        "cold_start_snapshot": summarize([once() for _ in range(repeat)]),
+    }
+
+
+def bench_metrics(repeat: int) -> dict:
+    from agent import data, utils
+
+    cube = data.get_dataset().cube
+    first, last = cube.month_labels[0], cube.month_labels[-1]
+    mid = cube.month_labels[len(cube.month_labels) // 2]
+    entity = cube.entities[0]
+    cases = {
+        "revenue_variance": lambda f: f(first, last),
+        "revenue_variance_entity": lambda f: f(first, last, entity),
+        "gross_margin_pct": lambda f: f(first, last),
+        "opex_breakdown": lambda f: f(first, last),
+        "ebitda_proxy": lambda f: f(mid, last),
+        "cash_runway": lambda f: f(None, 3),
+        "metrics_table": lambda f: f(first, last, "month"),
+    }
+
+    results = {}
+    for name, call in cases.items():
+        func = getattr(utils, name.removesuffix("_entity"))
+        compute = getattr(func, "__wrapped__", func)
+        results[f"{name}.compute"] = timeit(lambda: call(compute), repeat)
+        if compute is not func:
+            call(func)   # prime the cache
+            results[f"{name}.cached"] = timeit(lambda: call(func), repeat)
+
+    ds = data.get_dataset()
+    results["convert_to_usd"] = timeit(lambda: utils.convert_to_usd(ds.actuals, ds.fx), repeat)
+    results["build_dataset"] = timeit(lambda: data.build_dataset(data.read_sheets(data.store.path)), max(repeat // 10, 1))
+    results["plot_chart"] = timeit(
+        lambda: utils.plot_chart("bar", cube.month_labels, list(cube.month_revenue), "Revenue", "Month", "USD"),
+        max(repeat // 10, 1),
+        setup=lambda: utils.charts._png_cache.clear(),
+    )
+    return results
+
+
+def bench_agent(repeat: int) -> dict:
+    """One agent turn (three concurrent tool calls, then the answer) with a scripted model."""
+    from langchain.agents import create_openai_tools_agent
+    from langchain_core.messages import AIMessage
+
+    from agent import agent as agent_module
+    from agent import data, utils
+    from agent.executor import ParallelAgentExecutor
+    from .scripted import PROMPT, ScriptedChatModel, tool_call
+
+    cube = data.get_dataset().cube
+    first, last = cube.month_labels[0], cube.month_labels[-1]
+    tools = [agent_module.get_revenue_variance, agent_module.get_ebitda_proxy, agent_module.get_metrics_table]
+
+    def run():
+        llm = ScriptedChatModel(responses=[
+            AIMessage(content="", tool_calls=[
+                tool_call("get_revenue_variance", "call_1", start_month=first, end_month=last),
+                tool_call("get_ebitda_proxy", "call_2", start_month=first, end_month=last),
+                tool_call("get_metrics_table", "call_3", start_month=first, end_month=last, granularity="quarter"),
+            ]),
+            AIMessage(content="Here is the summary."),
+        ])
+        executor = ParallelAgentExecutor(
+            agent=create_openai_tools_agent(llm=llm, tools=tools, prompt=PROMPT), tools=tools,
+            return_intermediate_steps=True,
+        )
+        executor.invoke({"input": "How did we do?"})
+
+    return {
+        "agent_turn.compute": timeit(run, max(repeat // 5, 1), setup=utils.metric_cache.clear),
+        "agent_turn.cached": timeit(run, max(repeat // 5, 1)),
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """Lines describing benchmarks whose median regressed beyond `threshold`."""
+    regressions = []
+    for name, stats in sorted(results["results"].items()):
+        base = baseline["results"].get(name)
+        if base is None or not base["median"]:
+            continue
+        ratio = stats["median"] / base["median"]
+        marker = "REGRESSION" if ratio > threshold else ""
+        print(f"{name:32s} {base['median'] * 1e3:10.3f}ms -> {stats['median'] * 1e3:10.3f}ms  {ratio:5.2f}x {marker}")
+        if ratio > threshold:
+            regressions.append(f"{name}: {ratio:.2f}x slower")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="small")
+    parser.add_argument("--entities", type=int)
+    parser.add_argument("--months", type=int)
+    parser.add_argument("--categories", type=int)
+    parser.add_argument("--currencies", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--skip", nargs="*", default=[], choices=["cold_start", "metrics", "agent"])
+    parser.add_argument("--workdir", help="where the synthetic workbook and snapshots go (default: a temp dir)")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--compare", help="baseline results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25)
+    args = parser.parse_args(argv)
+
+    preset = PRESETS[args.preset]
+    scale = Scale(**{
+        field: getattr(args, field) if getattr(args, field) is not None else getattr(preset, field)
+        for field in ("entities", "months", "categories", "currencies")
+    })
+
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="finai-bench-"))
+    workbook = write_workbook(workdir / "bench.xlsx", scale, args.seed)
+    # Must be set before agent.data is imported: it reads them at import time
+    os.environ.update(
+        FINAI_DATA_PATH=str(workbook),
+        FINAI_CACHE_DIR=str(workdir / "cache"),
+        FINAI_WATCH_INTERVAL="0",
+    )
+    os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+    sys.path.insert(0, str(ROOT))
+
+    results = {}
+    if "cold_start" not in args.skip:
+        results.update(bench_cold_start(dict(os.environ), max(args.repeat // 10, 3)))
+    if "metrics" not in args.skip:
+        results.update(bench_metrics(args.repeat))
+    if "agent" not in args.skip:
+        results.update(bench_agent(args.repeat))
+
+    report = {
+        "meta": {
+            "scale": describe(scale),
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "commit": subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                     capture_output=True, text=True).stdout.strip() or None,
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        },
+        "results": results,
+    }
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(json.dumps(report, indent=2))
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        if baseline["meta"]["scale"] != report["meta"]["scale"]:
+            print("warning: baseline was measured at a different scale", file=sys.stderr)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print("\n".join(regressions), file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+"""
+Scripted chat models for running the agent without a model endpoint: the
+end-to-end benchmark uses them, and so do the tests (via tests/fakes.py).
+"""
+import json
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Chat model replaying a fixed list of AIMessages (tool calls or answers), one per call."""
+
+    responses: list[AIMessage]
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        message = self.responses[min(self.calls, len(self.responses) - 1)]
+        self.calls += 1
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+class StreamingScriptedChatModel(ScriptedChatModel):
+    """
+    ScriptedChatModel that streams each message word by word, with its tool
+    calls and `usage_metadata` on the last chunk (as ChatOpenAI does with
+    stream_usage=True).
+    """
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        message = self.responses[min(self.calls, len(self.responses) - 1)]
+        self.calls += 1
+        words = message.content.split(" ") if message.content else [""]
+        for i, word in enumerate(words):
+            last = i == len(words) - 1
+            chunk = AIMessageChunk(
+                content=word if i == 0 else f" {word}",
+                tool_call_chunks=[
+                    {"name": c["name"], "args": json.dumps(c["args"]), "id": c["id"], "index": j}
+                    for j, c in enumerate(message.tool_calls)
+                ] if last else [],
+                usage_metadata=message.usage_metadata if last else None,
+            )
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
+
+
+def tool_call(name: str, call_id: str = "call_1", **args) -> dict:
+    return {"name": name, "args": args, "id": call_id}
+
+
+PROMPT = ChatPromptTemplate.from_messages([
+    ("system", "You are a test agent."),
+    MessagesPlaceholder("chat_history", optional=True),
+    ("human", "{input}"),
+    MessagesPlaceholder("agent_scratchpad"),
+])
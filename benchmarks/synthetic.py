@@ -0,0 +1,86 @@
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BASE_CATEGORIES = ["Revenue", "COGS", "Opex:Marketing", "Opex:Sales", "Opex:R&D", "Opex:Admin"]
+CURRENCIES = ["USD", "EUR", "GBP", "JPY", "CHF", "CAD", "AUD", "SEK"]
+
+
+@dataclass(frozen=True)
+class Scale:
+    """Size of a synthetic ledger: entities × months × categories × currencies."""
+
+    entities: int = 2
+    months: int = 36
+    categories: int = 6
+    currencies: int = 2
+    start: str = "2023-01"
+
+    @property
+    def rows(self) -> int:
+        return self.entities * self.months * self.categories
+
+
+PRESETS = {
+    "small": Scale(),                                            # the size of data.xlsx
+    "medium": Scale(entities=20, months=60, categories=12, currencies=4),
+    "large": Scale(entities=200, months=120, categories=24, currencies=8),
+}
+
+
+def _categories(n: int) -> list[str]:
+    # Always keep the P&L lines the metrics depend on; extra ones are more Opex:* buckets
+    extra = [f"Opex:Other{i}" for i in range(1, max(n - len(BASE_CATEGORIES), 0) + 1)]
+    return (BASE_CATEGORIES + extra)[:max(n, 3)]
+
+
+def generate_sheets(scale: Scale, seed: int = 0) -> dict[str, pd.DataFrame]:
+    """Random but plausible actuals / budget / cash / fx sheets in the workbook layout."""
+    rng = np.random.default_rng(seed)
+    months = pd.period_range(scale.start, periods=scale.months, freq="M").strftime("%Y-%m")
+    entities = [f"Entity{i:03d}" for i in range(scale.entities)]
+    categories = _categories(scale.categories)
+    currencies = CURRENCIES[:max(scale.currencies, 1)]
+
+    grid = pd.MultiIndex.from_product([months, entities, categories], names=["month", "entity", "account_category"])
+    grid = grid.to_frame(index=False)
+    entity_currency = {e: currencies[i % len(currencies)] for i, e in enumerate(entities)}
+    grid["currency"] = grid["entity"].map(entity_currency)
+
+    # Revenue dominates, COGS ~15%, each Opex bucket a few percent, with noise and a trend
+    weight = grid["account_category"].map(lambda c: 1.0 if c == "Revenue" else 0.15 if c == "COGS" else 0.05)
+    trend = 1 + 0.01 * (grid.groupby("entity").cumcount() // len(categories))   # +1% a month
+    entity_base = rng.uniform(100_000, 1_000_000, len(entities))
+    base = entity_base[grid["entity"].str[6:].astype(int)]
+    actual = (base * weight * trend * rng.normal(1, 0.05, len(grid))).round()
+    budget = (base * weight * trend * rng.normal(1.02, 0.03, len(grid))).round()
+
+    actuals = grid.assign(amount=actual.astype("int64"))[["month", "entity", "account_category", "amount", "currency"]]
+    budget = grid.assign(amount=budget.astype("int64"))[["month", "entity", "account_category", "amount", "currency"]]
+
+    fx = pd.MultiIndex.from_product([months, currencies], names=["month", "currency"]).to_frame(index=False)
+    level = {c: 1.0 if c == "USD" else rng.uniform(0.005, 1.5) for c in currencies}
+    fx["rate_to_usd"] = (fx["currency"].map(level) * rng.normal(1, 0.01, len(fx))).round(4)
+    fx.loc[fx["currency"] == "USD", "rate_to_usd"] = 1.0
+
+    cash = pd.DataFrame({
+        "month": months,
+        "entity": "Consolidated",
+        "cash_usd": (entity_base.sum() * (12 - 0.05 * np.arange(scale.months))).round().astype("int64"),
+    })
+    return {"actuals": actuals, "budget": budget, "cash": cash, "fx": fx}
+
+
+def write_workbook(path: Path | str, scale: Scale, seed: int = 0) -> Path:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with pd.ExcelWriter(path) as writer:
+        for name, df in generate_sheets(scale, seed).items():
+            df.to_excel(writer, sheet_name=name, index=False)
+    return path
+
+
+def describe(scale: Scale) -> dict:
+    return {**asdict(scale), "rows": scale.rows}
@@ -0,0 +1,5 @@
+# tests/fakes.py
+# The scripted models live with the benchmark harness, which ships without the tests
+from benchmarks.scripted import PROMPT, ScriptedChatModel, StreamingScriptedChatModel, tool_call
+
+__all__ = ["PROMPT", "ScriptedChatModel", "StreamingScriptedChatModel", "tool_call"]
@@ -69,7 +69,7 @@ class TestModuleLevelTools:
         })
 
         assert result == 5000.0
-        mock_utils_func.assert_called_once_with('2025-01', '2025-01')
+        mock_utils_func.assert_called_once_with('2025-01', '2025-01', None)
 
     @patch('agent.utils.cash_runway')
     def test_get_cash_runway_tool_execution(self, mock_utils_func):
@@ -79,7 +79,7 @@ class TestModuleLevelTools:
         # Test with default parameters
         result = get_cash_runway.invoke({})
         assert result == 12.5
-        mock_utils_func.assert_called_once_with(None, 3)
+        mock_utils_func.assert_called_once_with(None, 3, None)
 
         # Test with custom parameters
         mock_utils_func.reset_mock()
@@ -88,7 +88,7 @@ class TestModuleLevelTools:
             'last_n_months': 6
         })
         assert result == 12.5
-        mock_utils_func.assert_called_once_with('2025-01', 6)
+        mock_utils_func.assert_called_once_with('2025-01', 6, None)
 
     def test_python_repl_tool_instance(self):
         """Test that python_repl is properly initialized"""
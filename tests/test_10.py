@@ -0,0 +1,94 @@
+# tests/test_charts.py
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from agent import charts, utils
+
+
+@pytest.fixture(autouse=True)
+def chart_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(charts, "CHART_DIR", tmp_path / "charts")
+    monkeypatch.setattr(charts, "_png_cache", charts.OrderedDict())
+    return tmp_path / "charts"
+
+
+class TestPlotChart:
+
+    def test_returns_in_memory_png(self, chart_dir):
+        chart = utils.plot_chart("bar", ["Q1", "Q2"], [1.0, 2.0], "EBITDA", "Quarter", "USD")
+        assert isinstance(chart, charts.ChartArtifact)
+        assert chart.png.startswith(b"\x89PNG") and chart.vega_lite is None
+        assert "EBITDA" in str(chart) and "displayed" in str(chart)
+        assert not chart_dir.exists()
+
+    def test_identical_specs_render_once(self, monkeypatch):
+        drawn = []
+        original = charts.draw
+        monkeypatch.setattr(charts, "draw", lambda spec: drawn.append(spec) or original(spec))
+
+        args = ("bar", ["Q1", "Q2"], [1.0, 2.0], "EBITDA", "Quarter", "USD")
+        first = utils.plot_chart(*args)
+        second = utils.plot_chart(*args)
+        assert first == second
+        assert len(drawn) == 1
+
+    def test_different_specs_get_different_ids(self):
+        a = utils.plot_chart("line", ["Jan", "Feb"], [1, 2], "A", "x", "y")
+        b = utils.plot_chart("line", ["Jan", "Feb"], [1, 3], "A", "x", "y")
+        assert a.id != b.id
+
+    def test_output_path_also_writes_file(self, chart_dir):
+        chart = utils.plot_chart("bar", ["Q1", "Q2"], [1.0, 2.0], "EBITDA", "Quarter", "USD", "chart.png")
+        (path,) = chart_dir.iterdir()
+        assert path.name == f"chart-{chart.id}.png"
+        assert path.read_bytes() == chart.png
+
+    def test_concurrent_rendering(self):
+        def render(i):
+            return utils.plot_chart(
+                "bar", [["Jan", "Feb", "Mar"]], [[i, 2, 3], [3, 2, i]], f"Chart {i}", "Month", "USD",
+                legends=["Actual", "Budget"],
+            )
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            artifacts = list(pool.map(render, range(16)))
+        assert len({a.id for a in artifacts}) == 16
+        assert all(a.png.startswith(b"\x89PNG") for a in artifacts)
+
+    @pytest.mark.parametrize("chart_type", ["line", "bar", "scatter", "pie"])
+    def test_single_series_chart_types(self, chart_type):
+        chart = utils.plot_chart(chart_type, ["a", "b", "c"], [3, 2, 1], "T", "x", "y", None, ["series"])
+        assert chart.png
+
+    def test_bad_data_returns_message(self):
+        message = utils.plot_chart("bar", [], [], "T", "x", "y")
+        assert message.startswith("There is some problem with the data")
+
+
+class TestVegaLite:
+
+    def test_interactive_returns_spec_without_rendering(self, monkeypatch):
+        monkeypatch.setattr(charts, "draw", lambda spec: pytest.fail("should not draw"))
+        chart = utils.plot_chart("line", ["Jan", "Feb"], [1, 2], "Revenue", "Month", "USD", interactive=True)
+        assert chart.png is None
+        assert chart.vega_lite["mark"]["type"] == "line"
+        assert chart.vega_lite["data"]["values"] == [
+            {"x": "Jan", "y": 1, "series": None},
+            {"x": "Feb", "y": 2, "series": None},
+        ]
+        assert str(chart).startswith("interactive line chart 'Revenue'")
+
+    def test_multi_series_is_long_format(self):
+        spec = charts.chart_spec("bar", [["Jan", "Feb"]], [[1, 2], [3, 4]], "T", "x", "y", ["Actual", "Budget"])
+        vega = charts.vega_lite_spec(spec)
+        assert [(v["series"], v["x"], v["y"]) for v in vega["data"]["values"]] == [
+            ("Actual", "Jan", 1), ("Actual", "Feb", 2), ("Budget", "Jan", 3), ("Budget", "Feb", 4),
+        ]
+        assert vega["encoding"]["color"]["field"] == "series"
+        assert vega["encoding"]["xOffset"] == {"field": "series"}
+
+    def test_pie_uses_arc(self):
+        vega = charts.vega_lite_spec(charts.chart_spec("pie", ["a", "b"], [1, 3], "T", "", "", None))
+        assert vega["mark"]["type"] == "arc"
+        assert vega["encoding"]["theta"]["field"] == "y"
@@ -0,0 +1,74 @@
+# tests/test_history.py
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from agent.history import ChatHistory, count_tokens, extractive_summarizer, llm_summarizer
+from tests.fakes import ScriptedChatModel
+
+
+class TestChatHistory:
+
+    def test_short_session_is_verbatim(self):
+        history = ChatHistory(max_turns=4)
+        history.add_turn("Revenue for June 2025?", "USD 1.2M")
+        history.add_turn("And July?", "USD 1.3M")
+        assert history.messages() == [
+            HumanMessage(content="Revenue for June 2025?"), AIMessage(content="USD 1.2M"),
+            HumanMessage(content="And July?"), AIMessage(content="USD 1.3M"),
+        ]
+        assert history.summary == ""
+
+    def test_old_turns_fold_into_summary(self):
+        folded = []
+
+        def summarize(summary, turns):
+            folded.append([q for q, _, _ in turns])
+            return summary + "".join(f"[{q}]" for q, _, _ in turns)
+
+        history = ChatHistory(max_turns=2, summarize=summarize)
+        for i in range(5):
+            history.add_turn(f"q{i}", f"a{i}")
+
+        messages = history.messages()
+        assert isinstance(messages[0], SystemMessage) and messages[0].content.endswith("[q0][q1][q2]")
+        assert [m.content for m in messages[1:]] == ["q3", "a3", "q4", "a4"]
+        assert folded == [["q0"], ["q1"], ["q2"]]
+
+    def test_token_budget_evicts_but_keeps_last_turn(self):
+        history = ChatHistory(max_turns=10, max_tokens=50)
+        history.add_turn("short", "answer")
+        history.add_turn("long question", "x" * 400)
+        assert [m.content for m in history.messages()[1:]] == ["long question", "x" * 400]
+        assert "short" in history.summary
+
+    def test_window_stays_bounded(self):
+        history = ChatHistory(max_turns=3, max_tokens=200)
+        for i in range(200):
+            history.add_turn(f"question {i} " * 5, f"answer {i} " * 20)
+        assert len(history.turns) <= 3
+        assert history.tokens() <= 200 + count_tokens("x" * 2000)
+
+    def test_messages_are_cached_between_turns(self):
+        history = ChatHistory()
+        history.add_turn("q", "a")
+        first = history.messages()
+        assert history.messages()[0] is first[0]
+        history.add_turn("q2", "a2")
+        assert len(history.messages()) == 4
+
+
+class TestSummarizers:
+
+    def test_extractive_is_bounded(self):
+        summary = extractive_summarizer("", [("q" * 3000, "a", 0)])
+        assert len(summary) == 2000
+
+    def test_llm_summarizer(self):
+        llm = ScriptedChatModel(responses=[AIMessage(content=" June revenue was USD 1.2M. ")])
+        assert llm_summarizer(llm)("", [("Revenue June?", "USD 1.2M", 0)]) == "June revenue was USD 1.2M."
+
+    def test_llm_failure_falls_back(self):
+        class Broken:
+            def invoke(self, prompt):
+                raise RuntimeError("offline")
+
+        assert "Revenue June?" in llm_summarizer(Broken())("", [("Revenue June?", "USD 1.2M", 0)])
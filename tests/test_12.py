@@ -0,0 +1,150 @@
+# tests/test_router.py
+import pandas as pd
+import pytest
+from langchain_core.messages import AIMessage
+
+from agent import router, utils
+from agent.streaming import run_coroutine
+from tests.fakes import ScriptedChatModel
+
+LATEST = pd.Period("2025-12", freq="M")
+
+
+def _periods(question):
+    return [(str(s), str(e)) for s, e in router.parse_periods(question, LATEST)]
+
+
+class TestParsePeriods:
+
+    @pytest.mark.parametrize("question,expected", [
+        ("revenue for 2025-06", ("2025-06", "2025-06")),
+        ("revenue for June 2025", ("2025-06", "2025-06")),
+        ("revenue for Jun'25", ("2025-06", "2025-06")),
+        ("revenue for Jun’25", ("2025-06", "2025-06")),
+        ("revenue for Sept. 2024", ("2024-09", "2024-09")),
+        ("revenue for Q2 2024", ("2024-04", "2024-06")),
+        ("revenue for 2024", ("2024-01", "2024-12")),
+        ("revenue this year", ("2025-01", "2025-12")),
+        ("revenue for the last 3 months", ("2025-10", "2025-12")),
+        ("revenue for the last six months", ("2025-07", "2025-12")),
+        ("revenue for June", ("2025-06", "2025-06")),
+        ("revenue from March to May 2024", ("2024-03", "2024-05")),
+        ("revenue between 2024-11 and 2025-02", ("2024-11", "2025-02")),
+    ])
+    def test_single_period(self, question, expected):
+        assert _periods(question) == [expected]
+
+    def test_several_periods_in_order(self):
+        assert _periods("Q1 2025 vs Q2 2025") == [("2025-01", "2025-03"), ("2025-04", "2025-06")]
+
+    def test_no_period(self):
+        assert _periods("what is our revenue?") == []
+
+
+class TestRoute:
+
+    @pytest.mark.parametrize("query,tool,args", [
+        ("What is revenue variance for January 2025?", "get_revenue_variance",
+         {"start_month": "2025-01", "end_month": "2025-01"}),
+        ("What is our cash runway for 2025?", "get_cash_runway", {"as_of_month": "2025-12"}),
+        ("Show me gross margin percentage for July 2025", "get_gross_margin_pct",
+         {"start_month": "2025-07", "end_month": "2025-07"}),
+        ("Break down opex by category for 2025", "get_opex_breakdown",
+         {"start_month": "2025-01", "end_month": "2025-12"}),
+        ("What's our EBITDA right now for last 3 months?", "get_ebitda_proxy",
+         {"start_month": "2025-10", "end_month": "2025-12"}),
+        ("What is our cash runway?", "get_cash_runway", {}),
+        ("Cash runway based on the last 6 months", "get_cash_runway", {"last_n_months": 6}),
+        ("Gross margin for EMEA in 2025", "get_gross_margin_pct",
+         {"start_month": "2025-01", "end_month": "2025-12", "entity": "EMEA"}),
+        ("Revenue vs budget for 2024", "get_revenue_variance", {"start_month": "2024-01", "end_month": "2024-12"}),
+    ])
+    def test_common_questions(self, query, tool, args):
+        routed = router.route(query, LATEST)
+        assert (routed.tool, routed.args) == (tool, args)
+
+    @pytest.mark.parametrize("query", [
+        "Plot gross margin for 2025",
+        "Revenue variance for Q1 2025 vs Q2 2025",
+        "EBITDA and gross margin for 2025",
+        "What is EBITDA?",
+        "EBITDA for 2019",
+        "Gross margin for EMEA and ParentCo in 2025",
+        "What about that month's EBITDA?",
+        "Monthly opex for 2025",
+        "Gross margin for march 2024 to may",
+        "Revenue variance for 2025-13",
+        "EBITDA for 2025-1",
+        "Opex from Q1 2025 through the end of summer",
+        "Revenue variance for may 2025 - jun",
+        "EBITDA for H1 2025",
+        "EBITDA for the first half of 2025",
+        "Revenue variance for 2025 excluding EMEA",
+        "Gross margin without ParentCo in 2025",
+        "EBITDA margin for 2025",
+        "EBITDA budget for 2025",
+        "EBITDA for 2025 in EUR",
+        "Opex for 2025 not including marketing",
+        "Cash runway at the end of Q2 2025 in €",
+    ])
+    def test_falls_back_to_agent(self, query):
+        assert router.route(query, LATEST) is None
+
+    def test_route_calls_utils(self):
+        routed = router.route("Revenue variance for 2024", LATEST)
+        assert routed.call() == utils.revenue_variance("2024-01", "2024-12")
+
+    def test_resolve_respects_switch(self, monkeypatch):
+        assert router.resolve("EBITDA for 2024") is not None
+        monkeypatch.setattr(router, "FAST_PATH", False)
+        assert router.resolve("EBITDA for 2024") is None
+
+
+class TestQuestionKey:
+
+    @pytest.mark.parametrize("a,b", [
+        ("EBITDA this year", "what's 2025 EBITDA"),
+        ("Revenue variance for June 2025", "revenue variance for Jun'25?"),
+        ("Gross margin for EMEA in 2025", "gross margin 2025 emea"),
+    ])
+    def test_equivalent_phrasings_share_a_key(self, a, b):
+        assert router.question_key(a) == router.question_key(b)
+
+    @pytest.mark.parametrize("a,b", [
+        ("EBITDA for 2024", "EBITDA for 2025"),
+        ("Opex for 2024", "EBITDA for 2024"),
+    ])
+    def test_different_questions_differ(self, a, b):
+        assert router.question_key(a) != router.question_key(b)
+
+    @pytest.mark.parametrize("question", ["And July?", "What about the same for EMEA?", "Plot that again"])
+    def test_follow_ups_are_not_cacheable(self, question):
+        assert router.question_key(question) is None
+
+    @pytest.mark.parametrize("plain,modified", [
+        ("Revenue variance for EMEA in 2025", "Revenue variance excluding EMEA in 2025"),
+        ("EBITDA for 2025", "EBITDA margin for 2025"),
+        ("Opex for 2025", "Opex for 2025 not including marketing"),
+    ])
+    def test_questions_the_router_does_not_understand_are_not_cacheable(self, plain, modified):
+        # Same extracted entity / period, different meaning: never share an answer
+        assert router.question_key(modified) is None
+        assert router.question_key(plain) != router.question_key(modified)
+
+
+class TestAstreamAnswer:
+
+    def test_events_match_agent_stream(self):
+        routed, result = router.resolve("EBITDA for 2024")
+        llm = ScriptedChatModel(responses=[AIMessage(content="EBITDA for 2024 was positive.")])
+
+        async def collect():
+            return [event async for event in router.astream_answer(routed, result, "EBITDA for 2024", llm)]
+
+        events = run_coroutine(collect())
+        assert [e["type"] for e in events] == ["tool_start", "tool_end", "token", "final"]
+        final = events[-1]["output"]
+        assert final["output"] == "EBITDA for 2024 was positive."
+        (action, observation), = final["intermediate_steps"]
+        assert action.tool == "get_ebitda_proxy" and observation == result
+        assert llm.calls == 1
@@ -0,0 +1,36 @@
+# tests/test_benchmarks.py
+import pytest
+
+from agent import data
+from benchmarks.run import compare, summarize
+from benchmarks.synthetic import Scale, generate_sheets
+
+
+def test_synthetic_sheets_build_a_dataset():
+    scale = Scale(entities=3, months=14, categories=8, currencies=3)
+    sheets = generate_sheets(scale, seed=1)
+    assert len(sheets["actuals"]) == len(sheets["budget"]) == scale.rows
+    assert sheets["actuals"]["currency"].nunique() == 3
+
+    ds = data.build_dataset(sheets)
+    assert ds.cube.actual.shape == (3, 8, 14)
+    assert ds.cube.revenue is not None and len(ds.cube.opex) == 6
+    assert (ds.cube.month_revenue > ds.cube.month_cogs).all()
+
+
+def test_generation_is_deterministic():
+    a, b = generate_sheets(Scale(), seed=3), generate_sheets(Scale(), seed=3)
+    assert a["actuals"].equals(b["actuals"]) and a["fx"].equals(b["fx"])
+
+
+def test_compare_flags_regressions(capsys):
+    baseline = {"results": {"fast": summarize([1.0, 1.0]), "slow": summarize([1.0])}}
+    current = {"results": {"fast": summarize([1.1]), "slow": summarize([2.0]), "new": summarize([5.0])}}
+    assert compare(current, baseline, threshold=1.25) == ["slow: 2.00x slower"]
+    assert "REGRESSION" in capsys.readouterr().out
+
+
+def test_summarize():
+    stats = summarize([3.0, 1.0, 2.0])
+    assert (stats["min"], stats["median"], stats["n"]) == (1.0, 2.0, 3)
+    assert stats["mean"] == pytest.approx(2.0)
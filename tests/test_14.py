@@ -0,0 +1,87 @@
+# tests/test_tracing.py
+import asyncio
+import json
+
+from langchain.agents import create_openai_tools_agent
+from langchain_core.messages import AIMessage
+
+from agent import agent as agent_module, tracing, utils
+from agent.agent import get_ebitda_proxy, plot_chart
+from agent.executor import ParallelAgentExecutor
+from agent.streaming import astream_turn
+from tests.fakes import PROMPT, ScriptedChatModel, StreamingScriptedChatModel, tool_call
+
+
+def _executor(model=ScriptedChatModel):
+    tools = [get_ebitda_proxy, plot_chart]
+    llm = model(responses=[
+        AIMessage(content="", tool_calls=[
+            tool_call("get_ebitda_proxy", "call_1", start_month="2024-01", end_month="2024-03"),
+            tool_call("plot_chart", "call_2", chart_type="bar", x=["a", "b"], y=[1, 2],
+                      title="Traced", x_label="x", y_label="y"),
+        ]),
+        AIMessage(content="Done.", usage_metadata={"input_tokens": 120, "output_tokens": 8, "total_tokens": 128}),
+    ])
+    agent = create_openai_tools_agent(llm=llm, tools=tools, prompt=PROMPT)
+    return ParallelAgentExecutor(agent=agent, tools=tools, return_intermediate_steps=True)
+
+
+def test_turn_records_llm_tool_chart_and_cache_spans(tmp_path):
+    utils.metric_cache.clear()
+    trace = tracing.start_trace("How was Q1?", tenant="default")
+    callbacks = [tracing.TracingCallbackHandler(trace)]
+
+    async def run():
+        return [e async for e in astream_turn(_executor(), {"input": "How was Q1?"}, {"callbacks": callbacks})]
+
+    asyncio.run(run())
+    record = tracing.finish_trace(trace, file=str(tmp_path / "turns.jsonl"), route="agent")
+
+    names = [s["name"] for s in record["spans"]]
+    assert names.count("llm:ScriptedChatModel") == 2
+    assert {"tool:get_ebitda_proxy", "tool:plot_chart", "chart.render"} <= set(names)
+    assert record["counters"]["metric_cache.miss"] == 1
+    assert record["tokens"] == {"input": 120, "output": 8, "total": 128}
+    assert record["route"] == "agent" and record["elapsed"] > 0
+    assert all(s["start"] >= 0 and s["duration"] >= 0 for s in record["spans"])
+
+    (line,) = (tmp_path / "turns.jsonl").read_text().splitlines()
+    assert json.loads(line)["trace_id"] == trace.id
+    assert tracing.current_trace.get() is None
+
+
+def test_streamed_turn_records_token_usage(tmp_path):
+    trace = tracing.start_trace("How was Q1?")
+    callbacks = [tracing.TracingCallbackHandler(trace)]
+
+    async def run():
+        return [e async for e in astream_turn(_executor(StreamingScriptedChatModel), {"input": "How was Q1?"},
+                                              {"callbacks": callbacks})]
+
+    events = asyncio.run(run())
+    assert [e["text"] for e in events if e["type"] == "token"] == ["Done."]
+    record = tracing.finish_trace(trace, file=str(tmp_path / "turns.jsonl"))
+    assert record["tokens"] == {"input": 120, "output": 8, "total": 128}
+
+
+def test_app_model_reports_usage_when_streaming(monkeypatch):
+    monkeypatch.setattr(agent_module, "GEMINI_API_KEY", "test-key")
+    assert agent_module.make_llm().stream_usage is True
+
+
+def test_spans_are_noops_outside_a_turn():
+    with tracing.span("data.load", "data"):
+        pass
+    tracing.count("metric_cache.hit")
+    assert tracing.current_trace.get() is None
+
+
+def test_summary_percentiles():
+    traces = [
+        {"elapsed": float(i), "spans": [{"name": "tool:x", "duration": i / 10}]}
+        for i in range(1, 101)
+    ]
+    summary = tracing.summary(traces)
+    assert summary["turns"] == 100
+    assert summary["elapsed"]["p50"] == 51.0 and summary["elapsed"]["p95"] == 96.0
+    assert summary["spans"]["tool:x"]["n"] == 100
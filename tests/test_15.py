@@ -0,0 +1,108 @@
+# tests/test_ingest.py
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from agent import data, ingest
+
+FIXTURE = Path(__file__).resolve().parent.parent / "fixtures" / "data.xlsx"
+
+
+def _postings(sheet: pd.DataFrame) -> pd.DataFrame:
+    """Split every monthly row into three dated postings, the way a raw GL export looks."""
+    rows = sheet.loc[sheet.index.repeat(3)].reset_index(drop=True)
+    part = np.tile([0.5, 0.3, 0.2], len(sheet))
+    rows["amount"] = rows["amount"] * part
+    day = np.tile([1, 14, 28], len(sheet))
+    rows["month"] = pd.to_datetime(rows["month"]).dt.to_period("M").dt.to_timestamp() + pd.to_timedelta(day - 1, unit="D")
+    rows["month"] = rows["month"].dt.strftime("%Y-%m-%d")
+    return rows.sample(frac=1, random_state=0)   # exports are not sorted
+
+
+@pytest.fixture
+def workbook_sheets():
+    return pd.read_excel(FIXTURE, sheet_name=list(data.SHEETS))
+
+
+@pytest.fixture
+def export_dir(tmp_path, workbook_sheets, monkeypatch):
+    root = tmp_path / "export"
+    root.mkdir()
+    actuals = _postings(workbook_sheets["actuals"])
+    half = len(actuals) // 2
+    actuals.iloc[:half].to_csv(root / "actuals-0001.csv", index=False)
+    actuals.iloc[half:].to_csv(root / "actuals-0002.csv", index=False)
+    (root / "budget").mkdir()
+    _postings(workbook_sheets["budget"]).to_parquet(root / "budget" / "part-0.parquet", index=False)
+    workbook_sheets["cash"].to_csv(root / "cash.csv", index=False)
+    workbook_sheets["fx"].to_csv(root / "fx.csv", index=False)
+    monkeypatch.setattr(data, "CACHE_DIR", str(tmp_path / "cache"))
+    return root
+
+
+class TestStreamingIngest:
+
+    def test_finds_parts_and_subdirectories(self, export_dir):
+        assert [p.name for p in ingest.export_files(export_dir, "actuals")] == ["actuals-0001.csv", "actuals-0002.csv"]
+        assert [p.name for p in ingest.export_files(export_dir, "budget")] == ["part-0.parquet"]
+
+    def test_chunks_are_bounded(self, export_dir):
+        chunks = list(ingest.iter_chunks(export_dir / "actuals-0001.csv", ingest.COLUMNS["actuals"], chunksize=50))
+        assert len(chunks) > 1
+        assert max(len(c) for c in chunks) <= 50
+
+    def test_aggregates_to_one_row_per_key(self, export_dir, workbook_sheets):
+        sheets = ingest.read_export(export_dir, chunksize=37)
+        actuals = sheets["actuals"]
+        assert len(actuals) == len(workbook_sheets["actuals"])
+        assert not actuals.duplicated(ingest.LEDGER_KEYS).any()
+        assert actuals["amount"].sum() == pytest.approx(workbook_sheets["actuals"]["amount"].sum())
+
+    def test_metrics_match_the_workbook(self, export_dir, workbook_sheets):
+        expected = data.build_dataset(workbook_sheets).cube
+        cube = data.build_dataset(ingest.read_export(export_dir, chunksize=37)).cube
+        assert cube.entities == expected.entities
+        assert cube.month_labels == expected.month_labels
+        np.testing.assert_allclose(cube.actual, expected.actual)
+        np.testing.assert_allclose(cube.budget, expected.budget)
+        np.testing.assert_array_equal(cube.month_has_actuals, expected.month_has_actuals)
+
+    def test_missing_sheet_is_reported(self, export_dir):
+        (export_dir / "fx.csv").unlink()
+        with pytest.raises(FileNotFoundError, match="fx"):
+            ingest.read_export(export_dir)
+
+
+class TestExportDataStore:
+
+    def test_store_loads_and_snapshots_directory(self, export_dir, tmp_path, monkeypatch):
+        store = data.DataStore(export_dir, watch_interval=None)
+        ds = store.current()
+        assert ds.cube.n_months == 36
+        assert [s.name for s in (tmp_path / "cache").iterdir()] == [f"export-{ingest.source_key(export_dir)}"]
+
+        def fail(*args, **kwargs):
+            raise AssertionError("export was re-read")
+
+        monkeypatch.setattr(ingest, "read_export", fail)
+        store.unload()
+        assert store.current().key == ds.key
+
+    def test_changed_part_reloads(self, export_dir):
+        store = data.DataStore(export_dir, watch_interval=None)
+        first = store.current()
+        extra = pd.read_csv(export_dir / "actuals-0002.csv")
+        extra.to_csv(export_dir / "actuals-0003.csv", index=False)
+        second = store.reload()
+        assert store.version == 2
+        assert second.cube.actual.sum() > first.cube.actual.sum()
+
+    def test_source_key_ignores_unrelated_files(self, export_dir):
+        key = ingest.source_key(export_dir)
+        (export_dir / "README.txt").write_text("notes")
+        assert ingest.source_key(export_dir) == key
+        shutil.copy(export_dir / "cash.csv", export_dir / "cash-2.csv")
+        assert ingest.source_key(export_dir) != key
@@ -0,0 +1,99 @@
+# tests/test_fx.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from agent import data, utils
+from agent.fx import CARRIED, EXACT, MISSING, FxTable, month_ordinals
+from agent.ledger import LedgerCube, build_usd_ledger
+
+
+@pytest.fixture
+def fx():
+    # EUR has no rate for 2025-02; GBP starts in 2025-02
+    return pd.DataFrame({
+        "month": pd.PeriodIndex(["2025-01", "2025-03", "2025-02", "2025-03", "2025-01"], freq="M"),
+        "currency": ["EUR", "EUR", "GBP", "GBP", "USD"],
+        "rate_to_usd": [1.10, 1.20, 1.30, 1.25, 1.0],
+    })
+
+
+def _ledger(rows):
+    return pd.DataFrame(rows, columns=["month", "entity", "account_category", "amount", "currency"])
+
+
+class TestFxTable:
+
+    def test_exact_rates(self, fx):
+        table = FxTable(fx)
+        rate, source = table.lookup(month_ordinals(["2025-01", "2025-03"]), ["EUR", "GBP"])
+        np.testing.assert_allclose(rate, [1.10, 1.25])
+        assert list(source) == [0, 0]
+
+    def test_gaps_use_the_latest_earlier_rate(self, fx):
+        table = FxTable(fx)
+        rate, source = table.lookup(month_ordinals(["2025-02", "2025-06"]), ["EUR", "EUR"])
+        np.testing.assert_allclose(rate, [1.10, 1.20])
+        assert list(source) == [1, 1]
+
+    def test_months_before_the_first_rate_use_it(self, fx):
+        rate, source = FxTable(fx).lookup(month_ordinals(["2025-01", "2024-11"]), ["GBP", "EUR"])
+        np.testing.assert_allclose(rate, [1.30, 1.10])
+        assert list(source) == [1, 1]
+
+    def test_unknown_currency_is_missing_not_usd(self, fx):
+        rate, source = FxTable(fx).lookup(month_ordinals(["2025-01", "2025-01"]), ["JPY", "USD"])
+        assert np.isnan(rate[0]) and rate[1] == 1.0
+        assert list(source) == [2, 0]
+
+    def test_categorical_currencies(self, fx):
+        currencies = pd.Series(["GBP", "EUR", "GBP"], dtype="category")
+        rate, _ = FxTable(fx).lookup(month_ordinals(["2025-03"] * 3), currencies)
+        np.testing.assert_allclose(rate, [1.25, 1.20, 1.25])
+
+    def test_empty_sheet(self):
+        table = FxTable(pd.DataFrame({"month": pd.PeriodIndex([], freq="M"), "currency": [], "rate_to_usd": []}))
+        rate, source = table.lookup(month_ordinals(["2025-01", "2025-01"]), ["USD", "EUR"])
+        assert rate[0] == 1.0 and np.isnan(rate[1])
+        assert list(source) == [0, 2]
+
+
+class TestFxConversion:
+
+    def test_ledger_records_sources(self, fx):
+        ledger = build_usd_ledger(_ledger([
+            ("2025-01", "A", "Revenue", 100, "EUR"),
+            ("2025-02", "A", "Revenue", 100, "EUR"),
+            ("2025-02", "A", "Revenue", 100, "JPY"),
+        ]), fx)
+        assert list(ledger["fx_source"]) == [EXACT, CARRIED, MISSING]
+        np.testing.assert_allclose(ledger["amount_usd"][:2], [110.0, 110.0])
+        assert np.isnan(ledger["amount_usd"][2])
+
+    def test_cube_leaves_out_rows_without_a_rate(self, fx):
+        ledger = build_usd_ledger(_ledger([
+            ("2025-01", "A", "Revenue", 100, "EUR"),
+            ("2025-01", "A", "Revenue", 100, "JPY"),
+        ]), fx)
+        cube = LedgerCube(ledger, ledger.iloc[:0])
+        assert cube.month_revenue.tolist() == pytest.approx([110.0])
+
+    def test_dataset_reports_fallbacks(self, fx):
+        sheets = {
+            "actuals": _ledger([("2025-02", "A", "Revenue", 100, "EUR"), ("2025-01", "A", "Revenue", 5, "USD")]),
+            "budget": _ledger([("2025-02", "A", "Revenue", 50, "JPY")]),
+            "cash": pd.DataFrame({"month": ["2025-02"], "entity": ["Consolidated"], "cash_usd": [1000]}),
+            "fx": fx.assign(month=fx["month"].astype(str)),
+        }
+        report = data.build_dataset(sheets).fx_fallbacks
+        assert report.to_dict("records") == [
+            {"ledger": "actuals", "month": "2025-02", "currency": "EUR", "source": CARRIED, "rows": 1, "amount": 100.0},
+            {"ledger": "budget", "month": "2025-02", "currency": "JPY", "source": MISSING, "rows": 1, "amount": 50.0},
+        ]
+
+    def test_complete_fixture_has_no_fallbacks(self):
+        assert utils.fx_fallbacks.empty
+        converted = utils.convert_to_usd(utils.actuals, utils.fx)
+        assert (converted["fx_source"] == EXACT).all()
+        merged = utils.actuals.merge(utils.fx, on=["month", "currency"], how="left")
+        np.testing.assert_allclose(converted["amount_usd"], merged["amount"] * merged["rate_to_usd"])
@@ -0,0 +1,153 @@
+# tests/test_incremental.py
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from agent import data, ingest
+from agent.ledger import build_usd_ledger
+
+FIXTURE = Path(__file__).resolve().parent.parent / "fixtures" / "data.xlsx"
+CUBE_ARRAYS = ("actual", "actual_count", "budget", "budget_count", "actual_cum", "budget_cum", "actual_count_cum",
+               "month_revenue", "month_cogs", "month_opex", "month_has_actuals")
+
+
+@pytest.fixture(scope="module")
+def sheets():
+    sheets = pd.read_excel(FIXTURE, sheet_name=list(data.SHEETS))
+    for df in sheets.values():
+        df["month"] = pd.to_datetime(df["month"]).dt.to_period("M")
+    return sheets
+
+
+def _split(sheets, month):
+    """(history, delta): every sheet's rows before `month`, and those of `month` on."""
+    before = {name: df[df["month"] < pd.Period(month)] for name, df in sheets.items()}
+    after = {name: df[df["month"] >= pd.Period(month)] for name, df in sheets.items()}
+    return before, after
+
+
+def assert_same_dataset(incremental, full):
+    a, b = incremental.cube, full.cube
+    assert (a.entities, a.categories, a.first_month, a.n_months, a.month_labels) == \
+        (b.entities, b.categories, b.first_month, b.n_months, b.month_labels)
+    assert (a.revenue, a.cogs, list(a.opex)) == (b.revenue, b.cogs, list(b.opex))
+    for name in CUBE_ARRAYS:
+        np.testing.assert_allclose(getattr(a, name), getattr(b, name), err_msg=name)
+    pd.testing.assert_series_equal(incremental.cash_by_month, full.cash_by_month)
+    assert incremental.cash_by_entity.keys() == full.cash_by_entity.keys()
+    assert len(incremental.actuals_usd) == len(full.actuals_usd) == len(incremental.actuals)
+    assert incremental.actuals_usd["amount_usd"].sum() == pytest.approx(full.actuals_usd["amount_usd"].sum())
+
+
+class TestCubeDelta:
+
+    def test_appended_month_matches_full_build(self, sheets):
+        history, delta = _split(sheets, "2025-12")
+        full = data.build_dataset(sheets)
+        base = data.build_dataset(history)
+        assert base.cube.n_months == full.cube.n_months - 1
+        assert_same_dataset(data.apply_delta(base, delta), full)
+
+    def test_several_months_and_new_axes(self, sheets):
+        history, delta = _split(sheets, "2025-07")
+        extra = pd.DataFrame({
+            "month": pd.PeriodIndex(["2025-08", "2025-09"], freq="M"),
+            "entity": ["NewCo", "ParentCo"],
+            "account_category": ["Revenue", "Opex:Travel"],
+            "amount": [1000.0, 250.0],
+            "currency": ["USD", "EUR"],
+        })
+        delta["actuals"] = pd.concat([delta["actuals"], extra], ignore_index=True)
+        full = data.build_dataset({**sheets, "actuals": pd.concat([sheets["actuals"], extra], ignore_index=True)})
+        incremental = data.apply_delta(data.build_dataset(history), delta)
+        assert "NewCo" in incremental.cube.entities and "Opex:Travel" in incremental.cube.categories
+        assert_same_dataset(incremental, full)
+
+    def test_source_cube_is_untouched(self, sheets):
+        history, delta = _split(sheets, "2025-12")
+        base = data.build_dataset(history)
+        before = {name: getattr(base.cube, name).copy() for name in CUBE_ARRAYS}
+        data.apply_delta(base, delta)
+        for name in CUBE_ARRAYS:
+            np.testing.assert_array_equal(getattr(base.cube, name), before[name])
+
+    def test_prefix_sums_before_the_delta_are_reused(self, sheets):
+        history, delta = _split(sheets, "2025-12")
+        base = data.build_dataset(history)
+        added = build_usd_ledger(delta["actuals"], base.fx_table)
+        cube = base.cube.apply_delta((added, added.iloc[:0]))
+        np.testing.assert_array_equal(cube.actual_cum[..., :base.cube.n_months + 1], base.cube.actual_cum)
+
+
+class TestDatasetDelta:
+
+    def test_restated_month_replaces_rows(self, sheets):
+        restated = sheets["actuals"][sheets["actuals"]["month"] == pd.Period("2025-06")].assign(
+            amount=lambda df: df["amount"] * 1.1)
+        others = sheets["actuals"][sheets["actuals"]["month"] != pd.Period("2025-06")]
+        full = data.build_dataset({**sheets, "actuals": pd.concat([others, restated], ignore_index=True)})
+        incremental = data.apply_delta(data.build_dataset(sheets), {"actuals": restated}, restate=True)
+        assert_same_dataset(incremental, full)
+
+    def test_late_postings_add_to_a_month(self, sheets):
+        late = sheets["actuals"][sheets["actuals"]["month"] == pd.Period("2025-06")].head(3)
+        full = data.build_dataset({**sheets, "actuals": pd.concat([sheets["actuals"], late], ignore_index=True)})
+        assert_same_dataset(data.apply_delta(data.build_dataset(sheets), {"actuals": late}), full)
+
+    def test_new_fx_rate_reconverts_carried_rows(self, sheets):
+        # The last month's EUR rate arrives after its actuals
+        late_rate = sheets["fx"]["month"] == pd.Period("2025-12")
+        base = data.build_dataset({**sheets, "fx": sheets["fx"][~late_rate]})
+        assert (base.fx_fallbacks["month"] == "2025-12").all() and len(base.fx_fallbacks)
+
+        incremental = data.apply_delta(base, {"fx": sheets["fx"][late_rate]})
+        assert incremental.fx_fallbacks.empty
+        assert_same_dataset(incremental, data.build_dataset(sheets))
+
+    def test_cash_balances_are_replaced(self, sheets):
+        cash = sheets["cash"].tail(1).assign(cash_usd=123.0)
+        incremental = data.apply_delta(data.build_dataset(sheets), {"cash": cash})
+        assert incremental.cash_by_month.iloc[-1] == 123.0
+        assert len(incremental.cash) == len(sheets["cash"])
+
+
+class TestStoreDelta:
+
+    def test_append_swaps_in_new_version(self, tmp_path, monkeypatch, sheets):
+        monkeypatch.setattr(data, "CACHE_DIR", str(tmp_path / "cache"))
+        store = data.DataStore(FIXTURE, watch_interval=None)
+        first = store.current()
+        seen = []
+        store.on_reload(seen.append)
+        late = sheets["actuals"].tail(2)
+        second = store.append({"actuals": late})
+        assert store.version == 2 and seen == [second]
+        assert store.current() is second
+        added = build_usd_ledger(late, first.fx_table)["amount_usd"].sum()
+        assert second.cube.actual.sum() == pytest.approx(first.cube.actual.sum() + added)
+        # The workbook itself did not change, so a reload keeps the appended rows
+        assert store.reload() is second
+
+    def test_new_export_part_is_applied_incrementally(self, tmp_path, monkeypatch, sheets):
+        monkeypatch.setattr(data, "CACHE_DIR", str(tmp_path / "cache"))
+        history, delta = _split(sheets, "2025-12")
+        root = tmp_path / "export"
+        root.mkdir()
+        for name, df in history.items():
+            df.assign(month=df["month"].astype(str)).to_csv(root / f"{name}-0001.csv", index=False)
+        store = data.DataStore(root, watch_interval=None)
+        store.current()
+
+        for name, df in delta.items():
+            df.assign(month=df["month"].astype(str)).to_csv(root / f"{name}-0002.csv", index=False)
+
+        def fail(*args, **kwargs):
+            raise AssertionError("export was rebuilt from scratch")
+
+        monkeypatch.setattr(data, "build_dataset", fail)
+        updated = store.reload()
+        monkeypatch.undo()
+        assert updated.key == ingest.source_key(root)
+        assert_same_dataset(updated, data.build_dataset(sheets))
@@ -0,0 +1,115 @@
+# tests/test_scenarios.py
+import itertools
+
+import numpy as np
+import pytest
+
+from agent import scenarios, utils
+from agent.agent import get_runway_scenarios
+
+BURNING = scenarios.Baseline(cash=1_200_000, revenue=100_000, cogs=30_000, opex=170_000,
+                             fx_share_revenue=0.5, fx_share_cogs=0.0, fx_share_opex=0.2)
+
+
+def _loop_runway(baseline, growth, opex_change, fx, horizon=120):
+    """Month-by-month reference projection for one scenario."""
+    cash = baseline.cash
+    for t in range(horizon):
+        volume = (1 + growth / 100) ** t
+        revenue = baseline.revenue * (1 + fx / 100 * baseline.fx_share_revenue) * volume
+        cogs = baseline.cogs * (1 + fx / 100 * baseline.fx_share_cogs) * volume
+        opex = baseline.opex * (1 + opex_change / 100) * (1 + fx / 100 * baseline.fx_share_opex)
+        burn = cogs + opex - revenue
+        if cash - burn <= 0:
+            return t + cash / burn
+        cash -= burn
+    return float("inf")
+
+
+class TestProjection:
+
+    def test_no_change_matches_cash_over_burn(self):
+        (runway,) = scenarios.project_runway(BURNING, [0], [0], [0])
+        assert runway == pytest.approx(BURNING.cash / BURNING.burn)
+
+    def test_matches_month_by_month_loop(self):
+        grid = scenarios.scenario_grid(revenue_growth=[-3, 0, 4], opex_change=[-20, 0, 10], fx_shock=[-15, 15])
+        runway = scenarios.project_runway(BURNING, **grid)
+        expected = [_loop_runway(BURNING, *combo) for combo in zip(*(grid[n] for n in scenarios.DRIVERS))]
+        np.testing.assert_allclose(runway, expected)
+        assert np.isinf(runway).any() and np.isfinite(runway).any()
+
+    def test_blocks_give_the_same_answer(self, monkeypatch):
+        grid = scenarios.sample_scenarios(1000, seed=1, revenue_growth=[-3, 3], opex_change=[-20, 10])
+        whole = scenarios.project_runway(BURNING, **grid)
+        monkeypatch.setattr(scenarios, "BLOCK", 7)
+        np.testing.assert_array_equal(scenarios.project_runway(BURNING, **grid), whole)
+
+    def test_no_cash_means_no_runway(self):
+        broke = scenarios.Baseline(cash=0, revenue=1, cogs=0, opex=0)
+        assert scenarios.project_runway(broke, [5], [0], [0]).tolist() == [0.0]
+
+
+class TestScenarioSets:
+
+    def test_grid_is_the_cartesian_product(self):
+        grid = scenarios.scenario_grid(revenue_growth=[1, 2], fx_shock=[-5, 0, 5])
+        assert len(grid["revenue_growth"]) == 6
+        assert set(grid["opex_change"]) == {0.0}
+
+    def test_samples_stay_in_range_and_are_reproducible(self):
+        a = scenarios.sample_scenarios(500, seed=3, revenue_growth=[-2, 4], opex_change=[-10])
+        b = scenarios.sample_scenarios(500, seed=3, revenue_growth=[-2, 4], opex_change=[-10])
+        np.testing.assert_array_equal(a["revenue_growth"], b["revenue_growth"])
+        assert a["revenue_growth"].min() >= -2 and a["revenue_growth"].max() <= 4
+        assert set(a["opex_change"]) == {-10.0}
+
+    def test_limits(self):
+        with pytest.raises(ValueError):
+            scenarios.sample_scenarios(scenarios.MAX_SCENARIOS + 1)
+        with pytest.raises(ValueError):
+            scenarios.scenario_grid(revenue_growth=range(100), opex_change=range(100), fx_shock=range(11))
+        # Rejected from the sizes alone; building this grid would need terabytes
+        with pytest.raises(ValueError, match="1000000000000 scenarios"):
+            scenarios.scenario_grid(revenue_growth=range(10_000), opex_change=range(10_000), fx_shock=range(10_000))
+
+    def test_grid_order_matches_product(self):
+        grid = scenarios.scenario_grid(revenue_growth=[1, 2], fx_shock=[-5, 0, 5])
+        combos = list(itertools.product([1, 2], [0], [-5, 0, 5]))
+        assert list(zip(*(grid[name].tolist() for name in scenarios.DRIVERS))) == combos
+
+    def test_summary_handles_infinite_runways(self):
+        summary = scenarios.summarize(np.array([3.0, 10.0, np.inf, np.inf]))
+        assert summary["percentiles"]["p5"] == 3.0 and summary["percentiles"]["p95"] == np.inf
+        assert summary["share_below"]["6m"] == 0.25
+        assert summary["share_beyond_horizon"] == 0.5
+
+
+class TestRunwayScenarios:
+
+    def test_baseline_matches_cash_runway(self):
+        baseline = utils.runway_baseline("2025-06")
+        _, avg_burn = utils.cash_runway("2025-06")
+        assert baseline.burn == pytest.approx(avg_burn)
+        assert 0 < baseline.fx_share_revenue < 1
+
+    def test_sensitivity_table(self):
+        result = utils.runway_scenarios(revenue_growth=[-5, 0], opex_change=[0, 50], as_of_month="2025-06")
+        assert result["scenarios"] == 4 and len(result["table"]) == 4
+        worst = min(result["table"], key=lambda r: r["runway"])
+        assert (worst["revenue_growth"], worst["opex_change"]) == (-5.0, 50.0)
+
+    def test_sampled_distribution_via_tool(self):
+        result = get_runway_scenarios.invoke({
+            "revenue_growth": [-5, 2], "opex_change": [-10, 40], "fx_shock": [-20, 20], "samples": 5000,
+        })
+        assert result["scenarios"] == 5000 and "table" not in result
+        p = result["percentiles"]
+        assert p["p5"] <= p["p25"] <= p["p50"] <= p["p75"] <= p["p95"]
+
+    def test_tool_returns_scenario_limits_to_the_model(self):
+        observation = get_runway_scenarios.invoke({"samples": scenarios.MAX_SCENARIOS + 1})
+        assert observation.startswith("Error: samples must be between 1 and")
+        observation = get_runway_scenarios.invoke({"revenue_growth": list(range(100)), "opex_change": list(range(100)),
+                                                   "fx_shock": list(range(11))})
+        assert "at most" in observation
@@ -0,0 +1,139 @@
+# tests/test_shared_dataset.py
+import contextvars
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from agent import data, utils
+
+FIXTURE = Path(__file__).resolve().parent.parent / "fixtures" / "data.xlsx"
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    workbook = tmp_path / "data.xlsx"
+    shutil.copy(FIXTURE, workbook)
+    monkeypatch.setattr(data, "CACHE_DIR", str(tmp_path / "cache"))
+    registry = data.DatasetRegistry({data.DEFAULT_TENANT: workbook}, watch_interval=None)
+    registry.on_reload(lambda name, dataset: utils.metric_cache.clear())
+    monkeypatch.setattr(data, "registry", registry)
+    return registry
+
+
+class TestReadOnlyDataset:
+
+    def test_arrays_and_frames_are_read_only(self, registry):
+        ds = registry.get()
+        with pytest.raises(ValueError, match="read-only"):
+            ds.cube.actual_cum[0, 0, 1] = 0
+        with pytest.raises(ValueError, match="read-only"):
+            ds.actuals_usd.loc[0, "amount_usd"] = 0
+        with pytest.raises(ValueError, match="read-only"):
+            ds.actuals.iloc[0, 3] = 0
+        with pytest.raises(ValueError, match="read-only"):
+            ds.cash_by_month.iloc[0] = 0
+        with pytest.raises(ValueError, match="read-only"):
+            ds.fx_table.rates[0, 0] = 0
+        with pytest.raises(TypeError):
+            ds.cash_by_entity["emea"] = ds.cash_by_month
+        with pytest.raises(AttributeError):
+            ds.cube.entities.append("X")
+        assert isinstance(ds.cube.categories, tuple) and isinstance(ds.cube.month_labels, tuple)
+
+    def test_module_attributes_share_data_without_sharing_columns(self, registry):
+        ds = registry.get()
+        frame = utils.actuals_usd
+        assert np.shares_memory(frame["amount_usd"].to_numpy(), ds.actuals_usd["amount_usd"].to_numpy())
+        frame["doubled"] = frame["amount_usd"] * 2
+        assert "doubled" not in ds.actuals_usd.columns
+
+    def test_deltas_produce_frozen_datasets(self, registry):
+        ds = registry.store().append({"actuals": registry.get().actuals.head(2)})
+        with pytest.raises(ValueError, match="read-only"):
+            ds.cube.actual[0, 0, 0] = 0
+
+
+class TestPinnedReads:
+
+    def test_pin_survives_a_reload(self, registry):
+        with data.pin() as pinned:
+            registry.store().append({"actuals": pinned.actuals.head(2)})
+            assert registry.get().version == pinned.version + 1
+            assert data.get_dataset() is pinned
+            assert data.current_version() == (data.DEFAULT_TENANT, pinned.version)
+        assert data.get_dataset().version == pinned.version + 1
+
+    def test_nested_pins_share_one_dataset(self, registry):
+        with data.pin() as outer:
+            registry.store().append({"actuals": outer.actuals.head(2)})
+            with data.pin() as inner:
+                assert inner is outer
+
+    def test_tool_threads_see_the_pin(self, registry):
+        with data.pin() as pinned, ThreadPoolExecutor(2) as pool:
+            registry.store().append({"actuals": pinned.actuals.head(2)})
+            context = contextvars.copy_context()
+            seen = pool.submit(context.run, data.get_dataset).result()
+        assert seen is pinned
+
+    def test_memoized_call_reads_one_version(self, registry, monkeypatch):
+        store, base = registry.store(), registry.get()
+        utils.metric_cache.clear()
+        before = utils.ebitda_proxy("2023-01", "2025-12")
+        utils.metric_cache.clear()
+        original = data.current_version
+
+        def version_then_reload():
+            version = original()
+            if registry.get().version == base.version:
+                store.append({"actuals": base.actuals.head(2)})   # lands between the key and the computation
+            return version
+
+        monkeypatch.setattr(utils.metric_cache, "version", version_then_reload)
+        assert utils.ebitda_proxy("2023-01", "2025-12") == before
+        assert registry.get().version == base.version + 1
+
+    def test_concurrent_readers_see_consistent_versions(self, registry):
+        store = registry.store()
+        base = registry.get()
+        late = base.actuals[base.actuals["month"] == base.actuals["month"].max()].head(4)
+        expected = {}   # version -> EBITDA, filled in by the writer before each swap is visible
+        ready = threading.Lock()
+        stop = threading.Event()
+        errors = []
+
+        def reader():
+            while not stop.is_set():
+                with data.pin() as ds:
+                    first = utils.ebitda_proxy("2023-01", "2025-12")
+                    table = utils.metrics_table("2023-01", "2025-12", metrics=["ebitda"])
+                    with ready:
+                        want = expected.get(ds.version)
+                    if want is not None and not (first == pytest.approx(want) == table[0]["ebitda"]):
+                        errors.append((ds.version, first, table[0]["ebitda"], want))
+
+        def ebitda(ds):
+            totals = ds.cube.category_totals(ds.cube.actual_cum, "2023-01", "2025-12")
+            return float(totals[ds.cube.revenue] - totals[ds.cube.cogs] - totals[ds.cube.opex].sum())
+
+        expected[base.version] = ebitda(base)
+        threads = [threading.Thread(target=reader) for _ in range(8)]
+        for t in threads:
+            t.start()
+        try:
+            dataset = base
+            for _ in range(8):
+                new = data.apply_delta(dataset, {"actuals": late})
+                with ready:
+                    expected[new.version] = ebitda(new)
+                dataset = store.append({"actuals": late})
+                assert dataset.version == new.version
+        finally:
+            stop.set()
+            for t in threads:
+                t.join()
+        assert not errors
@@ -21,6 +21,9 @@ class TestAgentToolSelectionUpdated:
             "get_opex_breakdown",
             "get_ebitda_proxy",
             "get_cash_runway",
+            "get_runway_scenarios",
+            "get_metrics_table",
+            "get_variance_matrix",
             "plot_chart"
         }
         actual = {tool.name for tool in self.agent.tools}
@@ -0,0 +1,129 @@
+# tests/test_batch.py
+import json
+import threading
+import urllib.request
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from agent import batch, router, tracing
+from agent.agent import build_agent
+from tests.fakes import ScriptedChatModel, tool_call
+
+
+@pytest.fixture(autouse=True)
+def isolated(monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_FILE", "")
+    router.response_cache.clear()
+    yield
+    router.response_cache.clear()
+
+
+def _runner(responses, workers=4, **kwargs):
+    llm = ScriptedChatModel(responses=responses)
+    answer_llm = ScriptedChatModel(responses=[AIMessage(content="Gross margin was 61.2%.")])
+    return batch.BatchRunner(build_agent(llm, start_sandbox=False), answer_llm, workers, **kwargs)
+
+
+class TestLoadQuestions:
+
+    def test_text_skips_blanks_and_comments(self, tmp_path):
+        path = tmp_path / "pack.txt"
+        path.write_text("# June pack\nWhat is the cash runway?\n\n  Show opex by entity  \n")
+        assert batch.load_questions(path) == [
+            {"id": "q001", "question": "What is the cash runway?", "tenant": None},
+            {"id": "q002", "question": "Show opex by entity", "tenant": None},
+        ]
+
+    def test_json_lines_keep_ids_and_tenants(self, tmp_path):
+        path = tmp_path / "pack.jsonl"
+        path.write_text('{"id": "rev", "question": "Revenue vs budget?", "tenant": "acme"}\n"Plain question"\n')
+        questions = batch.load_questions(path)
+        assert questions[0] == {"id": "rev", "question": "Revenue vs budget?", "tenant": "acme"}
+        assert questions[1]["id"] == "q002"
+
+    def test_entry_without_question_is_rejected(self, tmp_path):
+        path = tmp_path / "pack.json"
+        path.write_text('[{"id": "x"}]')
+        with pytest.raises(ValueError, match="no question"):
+            batch.load_questions(path)
+
+
+class TestBatchRunner:
+
+    def test_answers_concurrently_in_question_order(self, tmp_path):
+        runner = _runner([AIMessage(content="Done.")])
+        questions = batch.normalize([f"Explain the trend of entity {i}" for i in range(12)])
+        output = tmp_path / "answers.jsonl"
+        try:
+            with open(output, "w") as f:
+                records = runner.run(questions, f)
+        finally:
+            runner.shutdown()
+
+        assert [r["id"] for r in records] == [q["id"] for q in questions]
+        assert all(r["route"] == "agent" and r["answer"] == "Done." and r["error"] is None for r in records)
+        assert all(r["timings"]["total"] >= r["timings"]["elapsed"] >= 0 for r in records)
+        assert len({r["trace_id"] for r in records}) == 12
+        lines = [json.loads(line) for line in output.read_text().splitlines()]
+        assert sorted(line["id"] for line in lines) == sorted(q["id"] for q in questions)
+
+    def test_routes_fast_path_then_cache(self):
+        runner = _runner([AIMessage(content="unused")], workers=1)
+        try:
+            first = runner.ask("What was gross margin for 2024-06?")
+            second = runner.ask("What was gross margin for 2024-06?")
+        finally:
+            runner.shutdown()
+        assert first["route"] == "fast_path" and first["answer"] == "Gross margin was 61.2%."
+        assert second["route"] == "cache" and second["answer"] == first["answer"]
+
+    def test_charts_are_written_to_disk(self, tmp_path):
+        runner = _runner([
+            AIMessage(content="", tool_calls=[tool_call("plot_chart", chart_type="bar", x=["a", "b"], y=[1, 2],
+                                                        title="Opex", x_label="x", y_label="y")]),
+            AIMessage(content="Chart is displayed."),
+        ], workers=1, charts_dir=tmp_path / "charts")
+        try:
+            record = runner.ask("Plot opex by entity")
+        finally:
+            runner.shutdown()
+        (chart,) = record["charts"]
+        assert chart["title"] == "Opex" and chart["spec"]["chart_type"] == "bar"
+        with open(chart["path"], "rb") as f:
+            assert f.read(8) == b"\x89PNG\r\n\x1a\n"
+        json.dumps(record)
+
+    def test_unknown_tenant_is_reported_per_question(self):
+        runner = _runner([AIMessage(content="Done.")])
+        questions = batch.normalize([{"question": "Explain opex", "tenant": "nope"}, "Explain revenue"])
+        try:
+            bad, good = runner.run(questions)
+        finally:
+            runner.shutdown()
+        assert bad["route"] is None and "Unknown tenant" in bad["error"]
+        assert good["error"] is None and good["answer"] == "Done."
+        assert batch.summary([bad, good], 1.0)["errors"] == 1
+
+
+def test_http_api():
+    runner = _runner([AIMessage(content="Done.")], workers=2)
+    server = batch.serve(runner, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+
+    def post(path, body):
+        request = urllib.request.Request(base + path, data=json.dumps(body).encode(), method="POST")
+        with urllib.request.urlopen(request) as response:
+            return json.loads(response.read())
+
+    try:
+        with urllib.request.urlopen(base + "/health") as response:
+            assert json.loads(response.read())["status"] == "ok"
+        assert post("/ask", {"question": "Explain the opex trend"})["answer"] == "Done."
+        answers = post("/batch", {"questions": ["Explain revenue", "Explain cash"]})["answers"]
+        assert [a["id"] for a in answers] == ["q001", "q002"]
+    finally:
+        server.shutdown()
+        server.server_close()
+        runner.shutdown()
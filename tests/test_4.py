@@ -0,0 +1,259 @@
+# tests/test_metrics.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from agent import utils
+from agent.ledger import LedgerCube, month_ordinal
+
+
+RANGES = [
+    ("2023-01", "2025-12"),
+    ("2025-01", "2025-01"),
+    ("2024-03", "2024-08"),
+    ("2020-01", "2022-12"),   # before the data
+    ("2025-06", "2026-06"),   # runs past the data
+]
+
+
+def _masked_total(ledger, start_month, end_month, category):
+    month = ledger["month"]
+    mask = (month >= month_ordinal(start_month)) & (month <= month_ordinal(end_month))
+    return ledger[mask & (ledger["account_category"] == category)]["amount_usd"].sum()
+
+
+class TestLedgerCube:
+
+    @pytest.mark.parametrize("start_month,end_month", RANGES)
+    def test_range_totals_match_masked_sums(self, start_month, end_month):
+        cube = utils.cube
+        actual = cube.category_totals(cube.actual_cum, start_month, end_month)
+        budget = cube.category_totals(cube.budget_cum, start_month, end_month)
+        for i, category in enumerate(cube.categories):
+            assert actual[i] == pytest.approx(_masked_total(utils.actuals_usd, start_month, end_month, category))
+            assert budget[i] == pytest.approx(_masked_total(utils.budget_usd, start_month, end_month, category))
+
+    def test_cube_shape_and_opex_axis(self):
+        cube = utils.cube
+        assert cube.actual.shape == (len(cube.entities), len(cube.categories), cube.n_months)
+        assert cube.actual_cum.shape[-1] == cube.n_months + 1
+        assert all(cube.categories[i].startswith("Opex") for i in cube.opex)
+
+    def test_empty_ledgers(self):
+        empty = utils.actuals_usd.iloc[:0]
+        cube = LedgerCube(empty, empty)
+        assert cube.n_months == 0
+        assert np.all(cube.category_totals(cube.actual_cum, "2025-01", "2025-12") == 0)
+
+
+# Reference (pre-vectorization) implementations, kept verbatim apart from the
+# module prefixes, to check the cube-based metrics stay equivalent.
+def _reference_gross_margin_pct(start_month, end_month):
+    a = utils.convert_to_usd(utils.actuals, utils.fx)
+    mask = (a["month"] >= pd.Period(start_month)) & (a["month"] <= pd.Period(end_month))
+
+    result = {}
+    for m in sorted(a[mask]["month"].unique()):
+        sub = a[a["month"] == m]
+        rev = sub[sub["account_category"] == "Revenue"]["amount_usd"].sum()
+        cogs = sub[sub["account_category"] == "COGS"]["amount_usd"].sum()
+        result[str(m)] = round((rev - cogs) / rev * 100, 2) if rev != 0 else 0.0
+
+    return result
+
+
+def _reference_cash_runway(as_of_month=None, last_n_months=3):
+    cash = utils.cash
+    if as_of_month is None:
+        most_recent = cash["month"].max()
+    else:
+        most_recent = pd.Period(as_of_month)
+
+    cash_usd = cash[cash["month"] == most_recent]["cash_usd"].sum()
+    a = utils.convert_to_usd(utils.actuals, utils.fx)
+    available_months = sorted([m for m in a["month"].unique() if m < most_recent])
+    months = available_months[-last_n_months:] if len(available_months) >= last_n_months else available_months
+
+    burns = []
+    for m in months:
+        dfm = a[a["month"] == m]
+        rev = dfm[dfm["account_category"] == "Revenue"]["amount_usd"].sum()
+        cogs = dfm[dfm["account_category"] == "COGS"]["amount_usd"].sum()
+        opex = dfm[dfm["account_category"].str.startswith("Opex")]["amount_usd"].sum()
+        burns.append(cogs + opex - rev)
+
+    avg_burn = sum(burns) / len(burns) if burns else 0
+    return cash_usd / avg_burn if avg_burn > 0 else float('inf'), avg_burn
+
+
+class TestVectorizedMetricsEquivalence:
+
+    @pytest.mark.parametrize("start_month,end_month", RANGES)
+    def test_gross_margin_pct_matches_reference(self, start_month, end_month):
+        expected = _reference_gross_margin_pct(start_month, end_month)
+        result = utils.gross_margin_pct(start_month, end_month)
+        assert list(result) == list(expected)
+        for month, pct in expected.items():
+            assert result[month] == pytest.approx(pct, abs=0.01)
+
+    @pytest.mark.parametrize("as_of_month,last_n_months", [
+        (None, 3),
+        ("2025-06", 3),
+        ("2024-01", 6),
+        ("2023-02", 3),
+        ("2023-01", 3),   # no prior months
+        ("2026-06", 2),   # after the data
+        ("2025-12", 36),
+    ])
+    def test_cash_runway_matches_reference(self, as_of_month, last_n_months):
+        expected_runway, expected_burn = _reference_cash_runway(as_of_month, last_n_months)
+        runway, burn = utils.cash_runway(as_of_month, last_n_months)
+        assert burn == pytest.approx(expected_burn)
+        assert runway == pytest.approx(expected_runway)
+
+
+class TestMetricsTable:
+
+    def test_quarters_match_single_range_metrics(self):
+        rows = utils.metrics_table("2025-01", "2025-06", granularity="quarter")
+        assert [(r["period"], r["start_month"], r["end_month"]) for r in rows] == [
+            ("2025Q1", "2025-01", "2025-03"),
+            ("2025Q2", "2025-04", "2025-06"),
+        ]
+        for row in rows:
+            variance, actual, budget = utils.revenue_variance(row["start_month"], row["end_month"])
+            assert row["revenue"] == pytest.approx(actual)
+            assert row["budget_revenue"] == pytest.approx(budget)
+            assert row["revenue_variance"] == pytest.approx(variance)
+            assert row["ebitda"] == pytest.approx(utils.ebitda_proxy(row["start_month"], row["end_month"]))
+            assert row["opex"] == pytest.approx(sum(utils.opex_breakdown(row["start_month"], row["end_month"]).values()))
+            runway, burn = utils.cash_runway(row["end_month"])
+            assert row["cash_runway"] == pytest.approx(runway)
+            assert row["avg_burn"] == pytest.approx(burn)
+
+    def test_explicit_ranges_and_metric_subset(self):
+        rows = utils.metrics_table(ranges=[["2024-01", "2024-12"], ["2025-1", "2025-1"]], metrics=["ebitda"])
+        assert [r["period"] for r in rows] == ["2024-01..2024-12", "2025-01"]
+        assert set(rows[0]) == {"period", "start_month", "end_month", "ebitda"}
+        assert rows[1]["ebitda"] == pytest.approx(utils.ebitda_proxy("2025-01", "2025-01"))
+
+    def test_partial_periods_are_clipped(self):
+        periods = utils.period_ranges("2024-11", "2025-02", "year")
+        assert periods == [("2024", "2024-11", "2024-12"), ("2025", "2025-01", "2025-02")]
+        assert utils.period_ranges("2025-03", "2025-03") == [("2025-03", "2025-03", "2025-03")]
+
+    def test_unknown_metric_or_granularity(self):
+        with pytest.raises(ValueError):
+            utils.metrics_table("2025-01", "2025-03", metrics=["net_income"])
+        with pytest.raises(ValueError):
+            utils.metrics_table("2025-01", "2025-03", granularity="week")
+
+    def test_tool_returns_argument_errors_to_the_model(self):
+        from agent.agent import get_metrics_table
+        observation = get_metrics_table.invoke({"start_month": "2025-01", "end_month": "2025-03", "granularity": "week"})
+        assert observation.startswith("Error: Unknown granularity 'week'")
+        observation = get_metrics_table.invoke({"start_month": "2025-01", "end_month": "2025-03", "metrics": ["net_income"]})
+        assert "Unknown metrics ['net_income']" in observation
+
+    @pytest.mark.parametrize("args,message", [
+        ({}, "Need both start_month and end_month"),
+        ({"start_month": "2025-01"}, "Need both start_month and end_month"),
+        ({"start_month": "2025-01", "end_month": "sometime"}, "Cannot read month range"),
+        ({"start_month": "2025-06", "end_month": "2025-01"}, "is after end_month"),
+        ({"ranges": [["2025-03", "2025-01"]]}, "is after end_month"),
+    ])
+    def test_tool_returns_bad_ranges_to_the_model(self, args, message):
+        from agent.agent import get_metrics_table
+        observation = get_metrics_table.invoke(args)
+        assert observation.startswith("Error: ") and message in observation
+
+
+class TestEntityFilter:
+
+    @pytest.mark.parametrize("entity", ["ParentCo", "EMEA"])
+    def test_entity_totals_match_masked_sums(self, entity):
+        ledger = utils.actuals_usd[utils.actuals_usd["entity"] == entity]
+        var, actual, budget = utils.revenue_variance("2024-01", "2024-12", entity)
+        assert actual == pytest.approx(_masked_total(ledger, "2024-01", "2024-12", "Revenue"))
+        opex = utils.opex_breakdown("2024-01", "2024-12", entity.lower())
+        for category, value in opex.items():
+            assert value == pytest.approx(_masked_total(ledger, "2024-01", "2024-12", category))
+
+    def test_entities_add_up_to_consolidated(self):
+        total = utils.ebitda_proxy("2025-01", "2025-06")
+        parts = sum(utils.ebitda_proxy("2025-01", "2025-06", e) for e in utils.cube.entities)
+        assert parts == pytest.approx(total)
+        assert utils.ebitda_proxy("2025-01", "2025-06", "Consolidated") == total
+
+    def test_metrics_table_for_entity(self):
+        (row,) = utils.metrics_table("2025-01", "2025-03", metrics=["revenue", "ebitda", "cash_runway"], entity="EMEA")
+        assert row["revenue"] == pytest.approx(utils.revenue_variance("2025-01", "2025-03", "EMEA")[1])
+        assert row["ebitda"] == pytest.approx(utils.ebitda_proxy("2025-01", "2025-03", "EMEA"))
+        assert row["cash_runway"] is None   # the cash sheet only has a consolidated balance
+
+    def test_unknown_entity(self):
+        with pytest.raises(ValueError, match="Unknown entity"):
+            utils.ebitda_proxy("2025-01", "2025-03", "APAC")
+        with pytest.raises(ValueError, match="No cash balance"):
+            utils.cash_runway(entity="EMEA")
+
+    def test_tools_return_entity_errors_to_the_model(self):
+        from agent.agent import get_cash_runway, get_ebitda_proxy
+        observation = get_cash_runway.invoke({"entity": "EMEA"})
+        assert observation.startswith("Error: No cash balance for entity 'EMEA'")
+        assert "['Consolidated']" in observation
+        observation = get_ebitda_proxy.invoke({"start_month": "2025-01", "end_month": "2025-03", "entity": "Europe"})
+        assert "Unknown entity 'Europe'" in observation and "EMEA" in observation
+
+
+class TestVarianceMatrix:
+
+    def test_revenue_rows_match_revenue_variance(self):
+        rows = utils.variance_matrix("2025-01", "2025-06", granularity="quarter", categories=["revenue"])
+        assert {(r["period"], r["entity"]) for r in rows} == {
+            (q, e) for q in ("2025Q1", "2025Q2") for e in [*utils.cube.entities, "Consolidated"]}
+        for r in rows:
+            entity = None if r["entity"] == "Consolidated" else r["entity"]
+            variance, actual, budget = utils.revenue_variance(r["start_month"], r["end_month"], entity)
+            assert (r["variance"], r["actual"], r["budget"]) == pytest.approx((variance, actual, budget))
+            assert r["favorable"] == (variance >= 0)
+
+    def test_every_category_and_consolidated_totals(self):
+        rows = utils.variance_matrix("2024-01", "2024-12")
+        assert {r["category"] for r in rows} == set(utils.cube.categories)
+        consolidated = {r["category"]: r for r in rows if r["entity"] == "Consolidated"}
+        for category, total in consolidated.items():
+            parts = [r for r in rows if r["category"] == category and r["entity"] != "Consolidated"]
+            assert sum(r["variance"] for r in parts) == pytest.approx(total["variance"])
+        for category, value in utils.opex_breakdown("2024-01", "2024-12").items():
+            assert consolidated[category]["actual"] == pytest.approx(value)
+
+    def test_costs_are_favorable_below_budget(self):
+        rows = utils.variance_matrix("2025-01", "2025-03", categories=["COGS", "Opex:Marketing"], entity="EMEA")
+        assert len(rows) == 2 and {r["entity"] for r in rows} == {"EMEA"}
+        for r in rows:
+            assert r["favorable"] == (r["actual"] <= r["budget"])
+            assert r["variance_pct"] == pytest.approx(round(r["variance"] / abs(r["budget"]) * 100, 2))
+
+    def test_period_without_budget(self):
+        (row,) = utils.variance_matrix("2030-01", "2030-01", categories=["Revenue"], entity="EMEA")
+        assert row["budget"] == 0 and row["variance_pct"] is None
+
+    def test_unknown_category(self):
+        with pytest.raises(ValueError, match="Unknown categories"):
+            utils.variance_matrix("2025-01", "2025-03", categories=["Travel"])
+
+    def test_tool_returns_unknown_category_to_the_model(self):
+        from agent.agent import get_variance_matrix
+        observation = get_variance_matrix.invoke({"start_month": "2025-01", "end_month": "2025-03", "categories": ["Marketing"]})
+        assert observation.startswith("Error: Unknown categories ['Marketing']")
+        assert "Opex:Marketing" in observation
+
+    @pytest.mark.parametrize("args,message", [
+        ({}, "Need both start_month and end_month"),
+        ({"start_month": "2025-06", "end_month": "2025-01"}, "is after end_month"),
+    ])
+    def test_tool_returns_bad_ranges_to_the_model(self, args, message):
+        from agent.agent import get_variance_matrix
+        observation = get_variance_matrix.invoke(args)
+        assert observation.startswith("Error: ") and message in observation
@@ -0,0 +1,147 @@
+# tests/test_data_loading.py
+import shutil
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from agent import data
+
+FIXTURE = Path(__file__).resolve().parent.parent / "fixtures" / "data.xlsx"
+
+
+@pytest.fixture
+def workbook(tmp_path, monkeypatch):
+    path = tmp_path / "data.xlsx"
+    shutil.copy(FIXTURE, path)
+    monkeypatch.setattr(data, "CACHE_DIR", str(tmp_path / "cache"))
+    return path
+
+
+class TestSnapshotLoading:
+
+    def test_first_read_writes_snapshot(self, workbook, tmp_path):
+        sheets = data.read_sheets(workbook)
+        assert set(sheets) == set(data.SHEETS)
+        snapshots = list((tmp_path / "cache").iterdir())
+        assert [s.name for s in snapshots] == [f"data-{data.workbook_key(workbook)}"]
+
+    def test_second_read_uses_snapshot(self, workbook, monkeypatch):
+        expected = data.read_sheets(workbook)
+
+        def fail(*args, **kwargs):
+            raise AssertionError("workbook was re-parsed")
+
+        monkeypatch.setattr(pd, "read_excel", fail)
+        sheets = data.read_sheets(workbook)
+        for name in data.SHEETS:
+            pd.testing.assert_frame_equal(sheets[name], expected[name])
+
+    def test_changed_workbook_replaces_snapshot(self, workbook, tmp_path):
+        data.read_sheets(workbook)
+        old_key = data.workbook_key(workbook)
+        with open(workbook, "ab") as f:
+            f.write(b"\0")   # openpyxl ignores trailing bytes after the zip directory
+        data.read_sheets(workbook)
+        names = [s.name for s in (tmp_path / "cache").iterdir()]
+        assert names == [f"data-{data.workbook_key(workbook)}"]
+        assert data.workbook_key(workbook) != old_key
+
+    def test_workbooks_sharing_a_stem_prefix_keep_their_snapshots(self, workbook, tmp_path):
+        emea = tmp_path / "data-emea.xlsx"
+        shutil.copy(FIXTURE, emea)
+        data.read_sheets(emea)
+        data.read_sheets(workbook)
+        names = sorted(s.name for s in (tmp_path / "cache").iterdir())
+        assert names == [f"data-{data.workbook_key(workbook)}", f"data-emea-{data.workbook_key(emea)}"]
+
+    def test_build_dataset_normalizes_months(self, workbook):
+        ds = data.build_dataset(data.read_sheets(workbook))
+        assert isinstance(ds.actuals["month"].dtype, pd.PeriodDtype)
+        assert ds.cube.n_months == 36
+
+
+def _write_workbook(path, sheets):
+    with pd.ExcelWriter(path) as writer:
+        for name, df in sheets.items():
+            df.to_excel(writer, sheet_name=name, index=False)
+
+
+class TestDataStore:
+
+    def test_reload_swaps_in_new_version(self, workbook):
+        store = data.DataStore(workbook, watch_interval=None)
+        first = store.current()
+        assert store.version == 1
+
+        sheets = data.read_sheets(workbook)
+        sheets["actuals"]["amount"] *= 2
+        _write_workbook(workbook, sheets)
+
+        seen = []
+        store.on_reload(seen.append)
+        second = store.reload()
+        assert store.version == 2
+        assert seen == [second]
+        assert second.cube.actual.sum() == pytest.approx(2 * first.cube.actual.sum())
+        # readers holding the old dataset keep a consistent view
+        assert first.version == 1 and first.cube.actual.sum() > 0
+
+    def test_reload_without_changes_keeps_version(self, workbook):
+        store = data.DataStore(workbook, watch_interval=None)
+        dataset = store.current()
+        assert store.reload() is dataset
+        assert store.reload(force=True).version == 2
+
+    def test_watch_picks_up_changes(self, workbook, monkeypatch):
+        store = data.DataStore(workbook, watch_interval=0.01)
+        store.current()
+        sheets = data.read_sheets(workbook)
+        sheets["cash"]["cash_usd"] += 1
+        _write_workbook(workbook, sheets)
+        monkeypatch.setattr(store, "_checked_at", 0.0)
+        assert store.current().version == 2
+
+    def test_watch_keeps_serving_on_broken_workbook(self, workbook, monkeypatch):
+        store = data.DataStore(workbook, watch_interval=0.01)
+        dataset = store.current()
+        workbook.write_bytes(b"not a workbook")
+        monkeypatch.setattr(store, "_checked_at", 0.0)
+        assert store.current() is dataset
+
+
+class TestDatasetRegistry:
+
+    @pytest.fixture
+    def registry(self, workbook, tmp_path):
+        other = tmp_path / "other.xlsx"
+        sheets = data.read_sheets(workbook)
+        sheets["actuals"]["amount"] *= 3
+        _write_workbook(other, sheets)
+        return data.DatasetRegistry({"a": workbook, "b": other}, watch_interval=None)
+
+    def test_tenants_are_isolated(self, registry):
+        a, b = registry.get("a"), registry.get("b")
+        assert b.cube.actual.sum() == pytest.approx(3 * a.cube.actual.sum())
+        with pytest.raises(KeyError):
+            registry.get("missing")
+
+    def test_tenant_context_selects_dataset(self, registry, monkeypatch):
+        monkeypatch.setattr(data, "registry", registry)
+        token = data.tenant.set("b")
+        try:
+            assert data.get_dataset() is registry.get("b")
+            assert data.current_version() == ("b", 1)
+        finally:
+            data.tenant.reset(token)
+
+    def test_memory_budget_evicts_least_recently_used(self, registry):
+        a = registry.get("a")
+        registry.memory_budget = a.nbytes * 1.5
+        registry.get("b")
+        assert not registry.store("a").loaded and registry.store("b").loaded
+        # reloading evicted, unchanged data keeps its version and does not notify listeners
+        seen = []
+        registry.on_reload(lambda name, dataset: seen.append(name))
+        assert registry.get("a").version == 1
+        assert seen == [] and not registry.store("b").loaded
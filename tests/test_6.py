@@ -0,0 +1,108 @@
+# tests/test_metric_cache.py
+import pytest
+
+from agent import utils
+from agent.cache import MetricCache, ResponseCache
+from agent.ledger import normalize_month
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def version():
+    return {"value": 1}
+
+
+@pytest.fixture
+def cache(version):
+    return MetricCache(version=lambda: version["value"], maxsize=2, ttl=10, clock=FakeClock())
+
+
+def _counting(cache):
+    calls = []
+
+    @cache.memoize(start_month=normalize_month, end_month=normalize_month)
+    def metric(start_month, end_month, scale=1):
+        calls.append((start_month, end_month, scale))
+        return {"total": len(calls) * scale}
+
+    return metric, calls
+
+
+class TestMetricCache:
+
+    def test_equivalent_arguments_share_an_entry(self, cache):
+        metric, calls = _counting(cache)
+        first = metric("2025-01", "2025-12")
+        assert metric("2025-1", end_month="2025-12-31") == first
+        assert metric("2025-01", "2025-12", 1) == first
+        assert len(calls) == 1
+        assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 1
+
+    def test_dataset_version_is_part_of_the_key(self, cache, version):
+        metric, calls = _counting(cache)
+        metric("2025-01", "2025-03")
+        version["value"] = 2
+        metric("2025-01", "2025-03")
+        assert len(calls) == 2
+
+    def test_ttl_and_lru_eviction(self, cache):
+        metric, calls = _counting(cache)
+        metric("2025-01", "2025-01")
+        cache.clock.now = 11
+        metric("2025-01", "2025-01")   # expired
+        metric("2025-02", "2025-02")
+        metric("2025-03", "2025-03")   # evicts 2025-01
+        assert len(calls) == 4
+        metric("2025-03", "2025-03")   # still cached
+        metric("2025-01", "2025-01")   # evicted, recomputed
+        assert len(calls) == 5
+        assert cache.stats()["size"] == 2
+
+    def test_cached_results_are_copies(self, cache):
+        metric, _ = _counting(cache)
+        metric("2025-01", "2025-01")["total"] = -1
+        assert metric("2025-01", "2025-01")["total"] == 1
+
+    def test_invalid_arguments_bypass_the_cache(self, cache):
+        metric, calls = _counting(cache)
+        with pytest.raises(TypeError):
+            metric("2025-01")
+        assert cache.stats()["misses"] == 0
+
+
+def test_utils_metrics_are_memoized():
+    utils.metric_cache.clear()
+    before = utils.metric_cache.stats()["hits"]
+    first = utils.ebitda_proxy("2025-01", "2025-06")
+    assert utils.ebitda_proxy("2025-1", "2025-6") == first
+    assert utils.metric_cache.stats()["hits"] == before + 1
+
+
+class TestResponseCache:
+
+    @pytest.fixture
+    def responses(self, version):
+        key = lambda question: None if question.startswith("and") else tuple(sorted(question.lower().split()))
+        return ResponseCache(version=lambda: version["value"], key=key, maxsize=4)
+
+    def test_equivalent_questions_hit(self, responses):
+        responses.store("EBITDA 2025", {"output": "USD 1M", "intermediate_steps": []})
+        assert responses.lookup("2025 ebitda") == {"output": "USD 1M", "intermediate_steps": []}
+        assert responses.lookup("EBITDA 2024") is None
+
+    def test_reload_invalidates(self, responses, version):
+        responses.store("EBITDA 2025", {"output": "USD 1M"})
+        version["value"] += 1
+        assert responses.lookup("EBITDA 2025") is None
+
+    def test_uncacheable_questions_are_skipped(self, responses):
+        responses.store("and July?", {"output": "USD 1M"})
+        assert responses.lookup("and July?") is None
+        assert responses.stats()["size"] == 0
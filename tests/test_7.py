@@ -0,0 +1,50 @@
+# tests/test_streaming.py
+import asyncio
+
+from langchain.agents import AgentExecutor, create_openai_tools_agent
+from langchain_core.messages import AIMessage
+
+from agent.agent import get_ebitda_proxy, get_revenue_variance
+from agent.streaming import astream_cached, astream_turn
+from tests.fakes import PROMPT, ScriptedChatModel, tool_call
+
+
+def _executor(responses):
+    tools = [get_ebitda_proxy, get_revenue_variance]
+    llm = ScriptedChatModel(responses=responses)
+    agent = create_openai_tools_agent(llm=llm, tools=tools, prompt=PROMPT)
+    return AgentExecutor(agent=agent, tools=tools, return_intermediate_steps=True)
+
+
+async def _collect(executor, inputs):
+    return [event async for event in astream_turn(executor, inputs)]
+
+
+def test_stream_reports_tools_tokens_and_final_output():
+    executor = _executor([
+        AIMessage(content="", tool_calls=[
+            tool_call("get_ebitda_proxy", "call_1", start_month="2025-01", end_month="2025-03"),
+            tool_call("get_revenue_variance", "call_2", start_month="2025-01", end_month="2025-03"),
+        ]),
+        AIMessage(content="EBITDA was solid in Q1."),
+    ])
+    events = asyncio.run(_collect(executor, {"input": "How was Q1?"}))
+    kinds = [e["type"] for e in events]
+
+    assert kinds.count("tool_start") == 2 and kinds.count("tool_end") == 2
+    assert kinds[-1] == "final"
+    assert "".join(e["text"] for e in events if e["type"] == "token") == "EBITDA was solid in Q1."
+
+    final = events[-1]
+    assert final["output"]["output"] == "EBITDA was solid in Q1."
+    assert [a.tool for a, _ in final["output"]["intermediate_steps"]] == ["get_ebitda_proxy", "get_revenue_variance"]
+    assert 0 <= final["ttft"] <= final["elapsed"]
+
+
+def test_cached_answer_replays_as_token_and_final():
+    async def collect():
+        return [event async for event in astream_cached({"output": "USD 1M", "intermediate_steps": []})]
+
+    events = asyncio.run(collect())
+    assert [e["type"] for e in events] == ["token", "final"]
+    assert events[0]["text"] == "USD 1M" and events[1]["output"]["output"] == "USD 1M"
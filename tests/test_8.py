@@ -0,0 +1,55 @@
+# tests/test_parallel_tools.py
+import time
+
+from langchain_core.messages import AIMessage
+from langchain_core.tools import tool
+from langchain.agents import create_openai_tools_agent
+
+from agent.executor import ParallelAgentExecutor
+from agent.streaming import run_coroutine
+from tests.fakes import PROMPT, ScriptedChatModel, tool_call
+
+
+@tool
+def slow_echo(text: str, delay: float) -> str:
+    """Sleep for `delay` seconds, then return `text`."""
+    time.sleep(delay)
+    return text
+
+
+def _executor(calls, **kwargs):
+    llm = ScriptedChatModel(responses=[
+        AIMessage(content="", tool_calls=[
+            tool_call("slow_echo", f"call_{i}", text=text, delay=delay) for i, (text, delay) in enumerate(calls)
+        ]),
+        AIMessage(content="done"),
+    ])
+    agent = create_openai_tools_agent(llm=llm, tools=[slow_echo], prompt=PROMPT)
+    return ParallelAgentExecutor(agent=agent, tools=[slow_echo], return_intermediate_steps=True, **kwargs)
+
+
+class TestParallelAgentExecutor:
+
+    def test_sync_step_runs_tools_concurrently_in_order(self):
+        executor = _executor([("a", 0.4), ("b", 0.1), ("c", 0.2)], max_workers=3)
+        started = time.perf_counter()
+        result = executor.invoke({"input": "go"})
+        assert time.perf_counter() - started < 0.8
+        assert [obs for _, obs in result["intermediate_steps"]] == ["a", "b", "c"]
+
+    def test_sync_timeout_is_reported_to_the_model(self):
+        executor = _executor([("slow", 1.0), ("fast", 0.0)], tool_timeout=0.2)
+        result = executor.invoke({"input": "go"})
+        slow, fast = [obs for _, obs in result["intermediate_steps"]]
+        assert "did not finish within 0.2s" in slow
+        assert fast == "fast"
+
+    def test_async_step_respects_worker_limit_and_timeout(self):
+        executor = _executor([("a", 0.3), ("b", 0.3), ("c", 2.0)], max_workers=2, tool_timeout=0.5)
+        started = time.perf_counter()
+        result = run_coroutine(executor.ainvoke({"input": "go"}))
+        elapsed = time.perf_counter() - started
+        observations = [obs for _, obs in result["intermediate_steps"]]
+        assert observations[:2] == ["a", "b"]
+        assert "did not finish" in observations[2]
+        assert 0.5 <= elapsed < 1.5
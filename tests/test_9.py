@@ -0,0 +1,65 @@
+# tests/test_sandbox.py
+import threading
+import time
+
+import pytest
+
+from agent import data
+from agent.sandbox import SandboxPool, session_id
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = SandboxPool(workers=1, timeout=30, store=data.DataStore(watch_interval=None))
+    yield pool
+    pool.shutdown()
+
+
+def _run_as(pool, session, code):
+    token = session_id.set(session)
+    try:
+        return pool.run(code)
+    finally:
+        session_id.reset(token)
+
+
+class TestSandboxPool:
+
+    def test_ledger_and_libraries_are_preloaded(self, pool):
+        output = _run_as(pool, "s1", "```python\nprint(len(actuals), type(np.zeros(1)).__name__, pd.__name__)\n```")
+        assert output.strip() == "396 ndarray pandas"
+
+    def test_namespaces_are_per_session(self, pool):
+        _run_as(pool, "s1", "x = 41\nactuals['amount'] = 0")
+        assert _run_as(pool, "s1", "print(x + 1)").strip() == "42"
+        assert "NameError" in _run_as(pool, "s2", "print(x)")
+        assert _run_as(pool, "s2", "print(actuals['amount'].sum() > 0)").strip() == "True"
+
+    def test_errors_are_returned_as_text(self, pool):
+        assert _run_as(pool, "s3", "print('before'); 1 / 0") == "before\nZeroDivisionError('division by zero')"
+        assert "SystemExit" in _run_as(pool, "s3", "import sys; sys.exit(3)")
+
+    def test_runaway_snippet_is_stopped_and_worker_replaced(self, pool):
+        pool.timeout = 5
+        try:
+            assert "TimeoutError" in _run_as(pool, "s4", "while True: pass")
+        finally:
+            pool.timeout = 30
+        assert _run_as(pool, "s4", "print('alive')").strip() == "alive"
+
+    def test_timeout_starts_when_the_snippet_starts(self, pool):
+        pool.timeout = 3
+        try:
+            first = threading.Thread(target=_run_as, args=(pool, "s5", "import time; time.sleep(2)"))
+            first.start()
+            time.sleep(0.2)
+            # Queued behind s5 on the only worker: 2s waiting + 1.5s running > timeout
+            assert _run_as(pool, "s6", "import time; time.sleep(1.5); print('done')").strip() == "done"
+            first.join()
+        finally:
+            pool.timeout = 30
+
+    def test_appended_version_is_visible(self, pool):
+        before = int(_run_as(pool, "s7", "print(len(actuals))"))
+        pool.store.append({"actuals": pool.store.current().actuals.tail(2)})
+        assert int(_run_as(pool, "s7", "print(len(actuals))")) == before + 2